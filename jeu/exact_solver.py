@@ -0,0 +1,191 @@
+"""
+Calcul exact des chances d'un combat par programmation dynamique sur la chaîne de Markov.
+
+Etat au début d'un tour : (PV joueur, PV ennemi, charge de l'ennemi, potions). Les transitions
+reprennent GameEngine.player_attack, GameEngine.enemy_turn et Enemy.attack (rpg_core). Chaque tour
+retire au moins 1 PV à l'ennemi (attaque ou riposte sur une attaque chargée défendue), la table
+se remplit donc par PV ennemi croissants, vectorisée sur les PV du joueur.
+
+Exemple :
+    python exact_solver.py --class Tank --level 12 --stage 5 --boss-type Golem --policy defend_charge
+"""
+import argparse, functools, sys
+from typing import NamedTuple, List, Tuple
+
+import numpy as np
+
+from rpg_core import BOSS_TYPES, Character, Enemy, GameEngine, ensure_content
+
+# Tables exactes gardées en mémoire (une par jeu de stats / politique)
+SOLVER_CACHE_SIZE = 128
+
+# Probabilités des boss et du blocage (Enemy.attack / GameEngine.enemy_turn)
+BOSS_CHARGE_CHANCE = 0.15
+BOSS_HEAVY_CHANCE = 0.30
+BOSS_CHARGE_MIN_HP_RATIO = 0.20
+BLOCK_CHANCE = 1 / 3
+
+# Indices des grandeurs calculées dans les tables
+WIN, TURNS, HP_LOST = 0, 1, 2
+
+class FightOdds(NamedTuple):
+    win_prob: float
+    expected_turns: float     # actions du joueur hors potions
+    expected_hp_lost: float   # dégâts subis par le joueur (avant soins)
+
+# -----------------------
+# Distributions d'un tour
+# -----------------------
+def player_damage_outcomes(atk: int, crit: float, enemy_def: int) -> List[Tuple[float, int]]:
+    """(probabilité, dégâts) de player_attack : jet ±2 uniforme, critique x2."""
+    outcomes = {}
+    for roll in range(-2, 3):
+        dmg = max(1, atk + roll - enemy_def)
+        outcomes[dmg] = outcomes.get(dmg, 0.0) + 0.2 * (1 - crit)
+        outcomes[dmg * 2] = outcomes.get(dmg * 2, 0.0) + 0.2 * crit
+    return [(p, dmg) for dmg, p in sorted(outcomes.items()) if p > 0]
+
+def enemy_outcomes(charging: bool, defending: bool, is_boss: bool, can_charge: bool,
+                   enemy_atk: int, player_def: int) -> List[Tuple[float, int, bool]]:
+    """(probabilité, dégâts au joueur avant plafonnement, charge au tour suivant) de enemy_turn."""
+    temp_def = player_def * 2 if defending else player_def
+    if charging:
+        raw = max(1, enemy_atk * 2 - int(player_def * 2 / 3))
+        dmg = max(1, raw - temp_def * 2) if defending else max(1, raw - player_def // 4)
+        return [(1.0, dmg, False)] # le blocage n'a pas d'effet sur l'attaque chargée
+
+    hits = [(1.0, max(1, enemy_atk))]
+    outcomes = []
+    if is_boss:
+        heavy = max(1, int(enemy_atk * 1.6))
+        if can_charge:
+            outcomes.append((BOSS_CHARGE_CHANCE, 0, True))
+            hits = [(BOSS_HEAVY_CHANCE - BOSS_CHARGE_CHANCE, heavy), (1 - BOSS_HEAVY_CHANCE, max(1, enemy_atk))]
+        else:
+            hits = [(BOSS_HEAVY_CHANCE, heavy), (1 - BOSS_HEAVY_CHANCE, max(1, enemy_atk))]
+
+    block = BLOCK_CHANCE if defending else 0.0
+    for p, raw in hits:
+        if block:
+            outcomes.append((p * block, 0, False))
+        outcomes.append((p * (1 - block), max(1, raw - temp_def), False))
+    return outcomes
+
+# -----------------------
+# Résolution
+# -----------------------
+@functools.lru_cache(maxsize=SOLVER_CACHE_SIZE)
+def solve_table(max_hp: int, atk: int, player_def: int, crit: float, potions: int, potion_heal: int,
+                potion_below: float, defend_on_charge: bool,
+                enemy_hp: int, enemy_max_hp: int, enemy_atk: int, enemy_def: int, is_boss: bool) -> np.ndarray:
+    """Table exacte au début d'un tour avec enemy_hp PV ennemis.
+
+    Forme (3, 2, potions + 1, max_hp + 1) : [grandeur, charge, potions restantes, PV joueur].
+    """
+    attacks = player_damage_outcomes(atk, crit, enemy_def)
+    php = np.arange(max_hp + 1)
+    drinks = php < max_hp * potion_below
+    after_drink = np.minimum(php + potion_heal, max_hp)
+    shape = (3, 2, potions + 1, max_hp + 1)
+
+    # Seules les couches récentes sont nécessaires : un tour retire au plus window PV à l'ennemi
+    max_enemy_hit = max(dmg for charging in (False, True) for defending in (False, True)
+                        for _, dmg, _ in enemy_outcomes(charging, defending, is_boss, True, enemy_atk, player_def))
+    window = attacks[-1][1] + max(1, max_enemy_hit // 4) + 1
+    start_layers = {}
+    phases = {} # (PV ennemi après l'attaque, charge, défense) -> valeurs, partagées entre les jets d'attaque
+
+    def enemy_phase(ehp: int, charging: bool, defending: bool) -> np.ndarray:
+        """Valeurs après l'action du joueur (ennemi vivant à ehp PV), en comptant le tour en cours."""
+        key = (ehp, charging, defending)
+        if key not in phases:
+            phases[key] = compute_enemy_phase(ehp, charging, defending)
+        return phases[key]
+
+    def compute_enemy_phase(ehp: int, charging: bool, defending: bool) -> np.ndarray:
+        values = np.zeros((3, potions + 1, max_hp + 1))
+        values[TURNS] = 1.0
+        can_charge = ehp / enemy_max_hp > BOSS_CHARGE_MIN_HP_RATIO
+        for p, dmg, next_charging in enemy_outcomes(charging, defending, is_boss, can_charge, enemy_atk, player_def):
+            if dmg == 0:
+                nxt = start_layers[ehp][:, int(next_charging)]
+                values[WIN] += p * nxt[WIN]
+                values[TURNS] += p * nxt[TURNS]
+                values[HP_LOST] += p * nxt[HP_LOST]
+                continue
+            # PV <= dégâts : mort du joueur (les dégâts subis sont plafonnés aux PV restants)
+            dead = min(dmg, max_hp) + 1
+            values[HP_LOST, :, :dead] += p * php[:dead]
+            if dead > max_hp:
+                continue
+            riposte = max(1, dmg // 4) if defending else 0
+            nxt = start_layers[max(0, ehp - riposte)][:, int(next_charging), :, 1:max_hp + 1 - dmg]
+            values[WIN, :, dead:] += p * nxt[WIN]
+            values[TURNS, :, dead:] += p * nxt[TURNS]
+            values[HP_LOST, :, dead:] += p * (dmg + nxt[HP_LOST])
+        return values
+
+    for ehp in range(enemy_hp + 1):
+        layer = np.zeros(shape)
+        for charging in (False, True):
+            if ehp == 0:
+                # Ennemi tué par une riposte : l'action suivante donne la victoire
+                layer[WIN, int(charging)] = 1.0
+                layer[TURNS, int(charging)] = 1.0
+                continue
+            defending = defend_on_charge and charging
+            if defending:
+                layer[:, int(charging)] = enemy_phase(ehp, charging, True)
+            else:
+                for p, dmg in attacks:
+                    if dmg >= ehp:
+                        layer[WIN, int(charging)] += p
+                        layer[TURNS, int(charging)] += p
+                    else:
+                        layer[:, int(charging)] += p * enemy_phase(ehp - dmg, charging, False)
+
+            # Potions (sans fin de tour) : tant que PV < seuil, l'état se ramène à potions - 1 après soin
+            for k in range(1, potions + 1):
+                layer[:, int(charging), k, drinks] = layer[:, int(charging), k - 1, after_drink[drinks]]
+        layer[:, :, :, 0] = 0.0 # PV joueur nul : état impossible en début de tour
+        start_layers[ehp] = layer
+        start_layers.pop(ehp - window, None)
+        for charging in (False, True):
+            for defending in (False, True):
+                phases.pop((ehp - window, charging, defending), None)
+    table = start_layers[enemy_hp]
+    table.flags.writeable = False # partagée par le cache
+    return table
+
+def solve_fight(player: Character, enemy: Enemy, defend_on_charge: bool = False,
+                potion_below: float = 0.0) -> FightOdds:
+    """Chances exactes du combat player contre enemy dans leur état actuel, pour la politique donnée."""
+    potions = player.inventory.get("potion", 0) if potion_below > 0 else 0
+    table = solve_table(player.max_hp, player.attack, player.defense, player.current_crit_chance,
+                        potions, player.potion_heal_amount(), potion_below, defend_on_charge,
+                        enemy.hp, enemy.max_hp, enemy.attack_power, enemy.defense, enemy.is_boss)
+    win, turns, hp_lost = table[:, int(enemy.charging), potions, player.hp]
+    return FightOdds(float(win), float(turns), float(hp_lost))
+
+def main(argv=None):
+    from batch_combat import make_player
+
+    ensure_content() # types de boss proposés
+    parser = argparse.ArgumentParser(description="Chances exactes d'un combat (programmation dynamique).")
+    parser.add_argument("--class", dest="char_class", default="Guerrier")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--stage", type=int, default=1)
+    parser.add_argument("--boss-type", choices=BOSS_TYPES, default=None)
+    parser.add_argument("--policy", choices=["attack", "defend_charge"], default="attack")
+    parser.add_argument("--potions", type=int, default=0)
+    parser.add_argument("--potion-below", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    player = make_player(args.char_class, args.level, args.potions)
+    enemy = GameEngine().generate_enemy(args.stage, args.boss_type or BOSS_TYPES[0])
+    odds = solve_fight(player, enemy, args.policy == "defend_charge", args.potion_below)
+    print(f"{player.char_class} niv. {player.level} contre {enemy.name} (étage {args.stage}) : "
+          f"victoire {odds.win_prob:.4%} | tours {odds.expected_turns:.3f} | PV perdus {odds.expected_hp_lost:.2f}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+"""
+Rechargement à chaud du contenu (content/*.json) et des images (assets/) pendant le jeu.
+
+Un thread relève les dates de modification (mtime) toutes les POLL_INTERVAL secondes. Le travail
+lourd se fait sur ce thread : lecture, validation et compilation du pack, décodage des images.
+La boucle de rendu appelle apply_pending() une fois par frame ; elle n'y fait que brancher les
+résultats prêts (rpg_core.reload_content, remplacement des surfaces en cache).
+
+Mode de développement : une partie rechargée en cours de route ne se rejoue plus à l'identique.
+
+Le thread de surveillance ne lit jamais les caches de l'interface : les tailles d'image à préparer
+lui sont transmises par un instantané (asset_sizes) pris sur le thread de rendu.
+
+Exemple :
+    reloader = HotReloader(decode_asset=decode_asset, asset_sizes=cached_sizes, on_asset=reload_image, on_content=on_reload)
+    reloader.start()
+    ...
+    reloader.apply_pending() # dans la boucle principale
+"""
+import os, queue, threading, time
+from typing import Optional, Dict, Any, List, Callable, Tuple, FrozenSet
+
+from content import CONTENT_DIR, CONTENT_FILES, ContentPack, load_pack
+from rpg_core import reload_content
+
+# Intervalle de relevé des fichiers (secondes)
+POLL_INTERVAL = 0.5
+
+# Fichiers surveillés dans le dossier d'assets
+ASSET_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Signature d'un fichier : (mtime en ns, taille)
+FileStamp = Tuple[int, int]
+
+# Tailles déjà en cache par nom d'image (instantané pris sur le thread de rendu)
+AssetSizes = Dict[str, FrozenSet[Tuple[int, int]]]
+
+def scan(paths: List[str]) -> Dict[str, FileStamp]:
+    """Signatures des fichiers existants parmi paths."""
+    stamps = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps[path] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+def list_assets(directory: str) -> List[str]:
+    try:
+        return [entry.path for entry in os.scandir(directory)
+                if entry.is_file() and entry.name.lower().endswith(ASSET_EXTENSIONS)]
+    except OSError:
+        return []
+
+class HotReloader(threading.Thread):
+    """Surveille le pack de contenu et le dossier d'assets ; prépare les rechargements hors du thread de rendu.
+
+    - decode_asset(path, tailles) : décode une image sur le thread de surveillance et la prépare aux tailles données
+    - asset_sizes() : tailles en cache par image ; appelé sur le thread de rendu (constructeur, apply_pending)
+    - on_asset(nom, résultat) / on_content(pack) : appelés par apply_pending, sur le thread de rendu
+    - on_error(message) : contenu invalide (l'ancien contenu reste en place)
+    """
+    def __init__(self, content_dir: str = CONTENT_DIR, assets_dir: Optional[str] = None,
+                 decode_asset: Optional[Callable[[str, FrozenSet[Tuple[int, int]]], Any]] = None,
+                 asset_sizes: Optional[Callable[[], AssetSizes]] = None,
+                 on_asset: Optional[Callable[[str, Any], None]] = None,
+                 on_content: Optional[Callable[[ContentPack], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None,
+                 interval: float = POLL_INTERVAL):
+        super().__init__(name="hot-reload", daemon=True)
+        self.content_dir = content_dir
+        self.assets_dir = assets_dir
+        self.decode_asset = decode_asset
+        self.asset_sizes = asset_sizes
+        # Remplacé en bloc par le thread de rendu, seulement lu par le thread de surveillance
+        self.sizes: AssetSizes = asset_sizes() if asset_sizes else {}
+        self.next_snapshot = 0.0
+        self.on_asset = on_asset
+        self.on_content = on_content
+        self.on_error = on_error
+        self.interval = interval
+
+        self.ready: "queue.SimpleQueue[Tuple[str, Any, Any]]" = queue.SimpleQueue()
+        self.stopping = threading.Event()
+        self.content_paths = [os.path.join(content_dir, name) for name in CONTENT_FILES]
+        self.content_stamps = scan(self.content_paths)
+        self.asset_stamps = scan(list_assets(assets_dir)) if assets_dir else {}
+        self.content_reloads = 0
+        self.asset_reloads = 0
+
+    # -----------------------
+    # Thread de surveillance
+    # -----------------------
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.poll()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stopping.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def poll(self):
+        """Un relevé : recompile le pack et décode les images modifiées, puis les met en file pour apply_pending."""
+        stamps = scan(self.content_paths)
+        if stamps != self.content_stamps:
+            self.content_stamps = stamps
+            try:
+                self.ready.put(("content", None, load_pack(self.content_dir)))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Fichier invalide ou en cours d'écriture : l'ancien contenu reste en place
+                self.ready.put(("error", None, f"Contenu invalide ({type(e).__name__}: {e})"))
+
+        if not self.assets_dir:
+            return
+        stamps = scan(list_assets(self.assets_dir))
+        for path, stamp in list(stamps.items()):
+            if self.asset_stamps.get(path) == stamp:
+                continue
+            try:
+                sizes = self.sizes.get(os.path.basename(path), frozenset())
+                decoded = self.decode_asset(path, sizes) if self.decode_asset else None
+            except Exception:
+                stamps.pop(path) # illisible (écriture en cours ?) : nouvel essai au prochain relevé
+                continue
+            self.ready.put(("asset", os.path.basename(path), decoded))
+        self.asset_stamps = stamps
+
+    # -----------------------
+    # Thread de rendu
+    # -----------------------
+    def apply_pending(self) -> int:
+        """Branche les rechargements prêts ; retourne leur nombre. À appeler entre deux frames."""
+        if self.asset_sizes and time.monotonic() >= self.next_snapshot:
+            self.sizes = self.asset_sizes()
+            self.next_snapshot = time.monotonic() + self.interval
+        applied = 0
+        while True:
+            try:
+                kind, name, payload = self.ready.get_nowait()
+            except queue.Empty:
+                return applied
+            applied += 1
+            if kind == "content":
+                reload_content(payload)
+                self.content_reloads += 1
+                if self.on_content:
+                    self.on_content(payload)
+            elif kind == "asset":
+                self.asset_reloads += 1
+                if self.on_asset:
+                    self.on_asset(name, payload)
+            elif self.on_error:
+                self.on_error(payload)
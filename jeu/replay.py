@@ -0,0 +1,168 @@
+"""
+Rejoue sans affichage une partie enregistrée (GameEngine.export_run) et vérifie l'empreinte finale.
+
+Le journal contient la graine de la partie, son point de départ (nouvelle partie ou sauvegarde
+chargée) et la suite des actions du joueur (tours de combat, boutique, inventaire, retour au menu).
+
+Exemple :
+    python replay.py replays/last_run.json
+    python replay.py --self-check
+"""
+import argparse, json, os, sys, time
+from typing import Dict, Any, Tuple
+
+from rpg_core import RUN_LOG_VERSION, SHOP_ITEMS_ALL, GameEngine
+
+# Dossier des journaux de partie écrits par l'interface
+REPLAY_DIR = "replays"
+
+def save_run(engine: GameEngine, filename: str = "last_run.json") -> str:
+    """Ecrit le journal de la partie en cours dans REPLAY_DIR."""
+    path = os.path.join(REPLAY_DIR, filename)
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(engine.export_run(), f, separators=(",", ":"))
+    return path
+
+def load_run(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+def replay(run: Dict[str, Any]) -> GameEngine:
+    """Reconstruit l'état final d'une partie à partir de son journal."""
+    if run.get("version") != RUN_LOG_VERSION:
+        raise ValueError(f"Version de journal non supportée: {run.get('version')}")
+
+    engine = GameEngine()
+    shop_items = {item["name"]: item for item in SHOP_ITEMS_ALL}
+    kind, *args = run["start"]
+    if kind == "new_game":
+        name, char_class, avatar = args
+        engine.new_game(name, char_class, chosen_avatar=avatar, seed=run["seed"])
+    elif kind == "load":
+        engine.load_data(args[0], seed=run["seed"])
+    else:
+        raise ValueError(f"Départ de partie inconnu: {kind}")
+
+    for action, *params in run["actions"]:
+        if action == "turn":
+            engine.take_turn(params[0])
+        elif action == "spawn":
+            engine.spawn_enemy()
+        elif action == "buy":
+            engine.buy_item(shop_items[params[0]])
+        elif action == "sell":
+            engine.sell_item(params[0])
+        elif action == "sell_potion":
+            engine.sell_potion(base_cost=params[0])
+        elif action == "equip":
+            engine.equip_item(params[0])
+        elif action == "unequip":
+            engine.unequip_item(params[0])
+        elif action == "unlock":
+            engine.unlock_shop_items()
+        elif action == "menu":
+            engine.return_to_menu()
+        else:
+            raise ValueError(f"Action inconnue dans le journal: {action}")
+    return engine
+
+def verify(run: Dict[str, Any]) -> Tuple[bool, GameEngine]:
+    """Rejoue la partie ; True si l'empreinte finale correspond à celle enregistrée."""
+    engine = replay(run)
+    return engine.state_hash() == run["hash"], engine
+
+def verify_export(engine: GameEngine) -> bool:
+    """Rejoue le journal de engine tel qu'il serait écrit sur le disque."""
+    ok, _ = verify(json.loads(json.dumps(engine.export_run())))
+    return ok
+
+def check_load_in_battle(seed: int) -> bool:
+    """Partie chargée alors que l'ennemi de la partie précédente est encore en vie (pause -> menu -> charger)."""
+    engine = GameEngine()
+    engine.new_game("Check", "Tank", chosen_avatar="hero2.png", seed=seed)
+    engine.take_turn("attack")
+    saved = engine.save_data()
+    for action in ("attack", "defend"):
+        engine.take_turn(action)
+    if not (engine.current_enemy and engine.current_enemy.is_alive()):
+        raise RuntimeError("self_check : l'ennemi devrait encore être en vie avant le chargement")
+
+    engine.load_data(saved, seed=seed + 1)
+    for action in ("attack", "defend", "potion", "attack"):
+        if engine.state != "battle":
+            break
+        engine.take_turn(action)
+    return verify_export(engine)
+
+def check_menu_exit(seed: int) -> bool:
+    """Partie quittée comme dans l'interface : écrans inventaire et boutique, fuite -> menu, puis défaite -> menu."""
+    engine = GameEngine()
+    engine.new_game("Check", "Mage", chosen_avatar="hero1.png", seed=seed)
+    engine.state = "inventory"
+    engine.state = "shop"
+    engine.unlock_shop_items()
+    engine.state = "battle"
+    for _ in range(100):
+        if engine.state != "battle":
+            break
+        engine.take_turn("flee")
+    if engine.state != "flee_success":
+        raise RuntimeError("self_check : la fuite aurait dû réussir")
+    engine.return_to_menu()
+    if not verify_export(engine):
+        return False
+
+    engine.new_game("Check", "Mage", chosen_avatar="hero1.png", seed=seed)
+    for _ in range(10_000):
+        if engine.state == "victory_screen":
+            engine.spawn_enemy()
+        elif engine.state != "battle":
+            break
+        engine.take_turn("attack")
+    if engine.state != "gameover":
+        raise RuntimeError("self_check : la partie aurait dû se terminer par une défaite")
+    engine.state = "menu" # l'interface revient au menu sans passer par le moteur
+    return verify_export(engine)
+
+# Chemins délicats vérifiés par --self-check
+SELF_CHECKS = (("chargement en combat", check_load_in_battle), ("retour au menu", check_menu_exit))
+
+def self_check(seed: int = 1) -> Dict[str, bool]:
+    """Rejoue les chemins de SELF_CHECKS sans journal enregistré : {nom: rejeu identique}."""
+    return {name: check(seed) for name, check in SELF_CHECKS}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejoue une partie enregistrée et vérifie l'état final.")
+    parser.add_argument("path", nargs="?", default=os.path.join(REPLAY_DIR, "last_run.json"))
+    parser.add_argument("--log", action="store_true", help="Affiche les dernières lignes du journal de combat")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Vérifie le rejeu des chemins délicats (chargement en combat, retour au menu) sans journal enregistré")
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        results = self_check()
+        for name, ok in results.items():
+            print(f"Rejeu ({name}) : {'OK' if ok else 'ÉCHEC'}")
+        return 0 if all(results.values()) else 1
+
+    run = load_run(args.path)
+    start = time.perf_counter()
+    try:
+        ok, engine = verify(run)
+    except (IndexError, KeyError) as e:
+        # Une action impossible à rejouer : la partie a divergé avant la fin du journal
+        print(f"Rejeu interrompu ({type(e).__name__}: {e}) : la partie ne se rejoue pas à l'identique")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    player = engine.player
+    print(f"{len(run['actions'])} actions rejouées en {elapsed * 1000:.1f} ms | "
+          f"{player.name} ({player.char_class}) niv. {player.level}, étage {engine.stage}, état {engine.state}")
+    if args.log:
+        print("\n".join(engine.log_lines))
+    print("Empreinte OK" if ok else "EMPREINTE DIFFÉRENTE : la partie ne se rejoue pas à l'identique")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,1164 @@
+"""
+Cœur du jeu (combat, progression, loot, boutique, sauvegardes) sans dépendance à Pygame.
+
+Ce module peut être importé sans effet de bord (pas de fenêtre, pas de police, pas d'image) :
+il sert à l'interface Pygame (RPGV18.py) comme aux simulations headless. Les effets visuels
+(popups de dégâts, messages d'info) sont publiés sous forme d'événements via GameEngine.events,
+auxquels l'interface s'abonne.
+
+Tout l'aléatoire d'une partie passe par GameEngine.rng (injectable, réensemencé à chaque
+nouvelle partie) et les actions du joueur sont journalisées (GameEngine.export_run) : une
+partie se rejoue à l'identique sans affichage (voir replay.py). Le contenu des étages
+(ennemi, type de boss, bonus de boss, loot) vient de flux indépendants indexés par
+(graine, étage, usage) : il ne dépend pas des étages précédents (voir stage_stream).
+"""
+import os, json, random, hashlib, bisect
+from typing import Optional, Dict, Any, List, Callable, NamedTuple, Tuple
+
+import numpy as np
+
+import combat_log as cl
+from combat_log import LOG_CAPACITY, LOG_VISIBLE_LINES, CombatLog
+from content import ANY_BOSS, ARMOR_SLOTS, CONTENT, ITEMS, AliasTable, ContentPack, Item, intern_item, load_pack
+from save_writer import write_save
+
+SAVE_DIR = "saves"
+
+# Version du format des journaux de partie (export_run / replay.py)
+# 2 : loot tiré dans les tables de loot (les journaux v1 ne se rejouent plus à l'identique)
+RUN_LOG_VERSION = 2
+
+# Mode debug des stats dérivées : chaque lecture vérifie le cache contre un recalcul complet
+STATS_DEBUG = os.environ.get("RPG_STATS_DEBUG", "") not in ("", "0")
+
+def clamp(v, a, b): return max(a, min(b, v))
+
+# -----------------------
+# Flux aléatoires par compteur
+# -----------------------
+MASK64 = (1 << 64) - 1
+
+class CounterRng:
+    """Générateur sans état partagé : le n-ième tirage ne dépend que de (clé, n) (mélange SplitMix64).
+
+    Propose le sous-ensemble de random.Random utilisé par le moteur (random, randint, choice).
+    """
+    def __init__(self, key: int):
+        self.key = key & MASK64
+        self.counter = 0
+
+    def next64(self) -> int:
+        self.counter += 1
+        z = (self.key + self.counter * 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self) -> float:
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def randint(self, a: int, b: int) -> int:
+        return a + (self.next64() * (b - a + 1) >> 64)
+
+    def choice(self, seq):
+        return seq[self.next64() * len(seq) >> 64]
+
+def stage_stream(seed, stage: int, purpose: str) -> CounterRng:
+    """Flux de l'usage purpose ("enemy", "loot", "boss_bonus"...) à l'étage stage d'une partie de graine seed."""
+    digest = hashlib.blake2b(f"{seed}:{stage}:{purpose}".encode("utf-8"), digest_size=8).digest()
+    return CounterRng(int.from_bytes(digest, "little"))
+
+# -----------------------
+# Événements du moteur
+# -----------------------
+class EventBus:
+    """Diffuse de façon synchrone les événements du moteur à ses abonnés (interface, télémétrie...).
+
+    Un abonné est appelé avec (kind, data) ; data est un dict propre à chaque type d'événement :
+      - "damage": target ("player"/"enemy"), amount, crit
+      - "heal": target, amount
+      - "riposte": amount
+      - "info": message, style ("boss_bonus", "boss_tip", "loot")
+    """
+    def __init__(self):
+        self._subscribers: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def subscribe(self, callback: Callable[[str, Dict[str, Any]], None]):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def emit(self, kind: str, **data):
+        for callback in self._subscribers:
+            callback(kind, data)
+
+# -----------------------
+# Loot & Shop data (pack de contenu, voir content.py)
+# -----------------------
+
+ARMOR_TYPES = ARMOR_SLOTS 
+
+# Types de boss tirés aux étages multiples de 5 (remplis au chargement du pack, voir ensure_content)
+BOSS_TYPES = CONTENT.boss_types
+BOSS_AVATARS: Dict[str, str] = {}
+MINION_NAMES = CONTENT.minion_names
+
+# -----------------------
+# Tables de loot (fichier de contenu, tirage par alias)
+# -----------------------
+class LootTables:
+    """Tables de loot pondérées par tranche d'étages et par type de boss (tables d'alias compilées par le pack)."""
+    def __init__(self, pack: ContentPack):
+        self.pack = pack
+        self.rebuild()
+
+    def rebuild(self):
+        """Relit les tables du pack (après un rechargement du contenu)."""
+        self.bands = self.pack.loot_bands()
+        # Tranches triées par premier étage, sans chevauchement : recherche par bisect
+        self.starts: Dict[str, List[int]] = {key: [first for first, _, _ in key_bands] for key, key_bands in self.bands.items()}
+
+    def find(self, key: str, stage: int) -> Optional[AliasTable]:
+        starts = self.starts.get(key)
+        if not starts:
+            return None
+        i = bisect.bisect_right(starts, stage) - 1
+        if i < 0:
+            return None
+        _, last, table = self.bands[key][i]
+        return table if stage <= last else None
+
+    def table_for(self, stage: int, boss_type: str = "") -> AliasTable:
+        """Table du boss (sinon "*"), puis celle des sbires de la tranche d'étages."""
+        keys = (boss_type, ANY_BOSS, "") if boss_type else ("",)
+        for key in keys:
+            table = self.find(key, stage)
+            if table is not None:
+                return table
+        raise KeyError(f"Aucune table de loot pour l'étage {stage} ({boss_type or 'sbire'})")
+
+    def draw(self, stage: int, boss_type: str = "", rng=random) -> Item:
+        return self.pack.item(self.table_for(stage, boss_type).sample(rng))
+
+    def draw_many(self, k: int, stage: int, boss_type: str, rng: "np.random.Generator") -> List[Item]:
+        """k drops d'un coup (simulateur)."""
+        table = self.table_for(stage, boss_type)
+        item = self.pack.item
+        return [item(table.items[i]) for i in table.sample_indices(k, rng).tolist()]
+
+    def all_bands(self) -> List[Tuple[str, int, float]]:
+        """(clé, premier étage, dernier étage) de chaque table."""
+        return [(key, first, last) for key, key_bands in self.bands.items() for first, last, _ in key_bands]
+
+LOOT_TABLES = LootTables(CONTENT)
+POSSIBLE_LOOT = CONTENT.loot_items
+
+def generate_loot(rng=random, stage: int = 1, boss_type: str = "") -> Item:
+    """Tire le loot d'un ennemi vaincu dans la table de son étage (et de son type de boss)."""
+    return LOOT_TABLES.draw(stage, boss_type, rng)
+
+SHOP_ITEMS_ALL = CONTENT.shop_items
+
+# --- Helper Stats (Inchangé) ---
+def get_base_stats_for_class(char_class: str) -> Dict[str, int]:
+    """Retourne les stats de base (initiales) pour une classe."""
+    return ensure_content().base_stats(char_class)
+
+# -----------------------
+# Game classes (Inchangé)
+# -----------------------
+class Character:
+    __slots__ = ("name", "char_class", "max_hp", "hp", "base_attack", "base_defense", "crit_chance",
+                 "xp", "level", "gold", "inventory", "equipment", "avatar_file", "temp_bonus", "_stats")
+
+    def __init__(self, name: str, char_class: str, max_hp=100, base_attack=12, base_defense=5, crit_chance=0.1, avatar_file="hero1.png", gold=0):
+        # Stats initiales
+        base_stats = get_base_stats_for_class(char_class)
+        self.name = name
+        self.char_class = char_class
+        self.max_hp = base_stats["HP"]
+        self.hp = self.max_hp
+        self.base_attack = base_stats["ATK"]
+        self.base_defense = base_stats["DEF"]
+        self.crit_chance = crit_chance
+        self.xp = 0
+        self.level = 1
+        self.gold = gold
+
+        self.inventory = {"potion": 2, "items": []} # items: liste d'Item (partagés)
+        
+        self.equipment = {
+            "weapon": None, 
+            "chest": None, 
+            "helmet": None,
+            "greaves": None,
+            "boots": None
+        } # stocke des Item (ou None)
+        
+        self.avatar_file = avatar_file
+        
+        # --- NOUVEAU : Bonus temporaire du boss ---
+        self.temp_bonus = {"attack": 0, "defense": 0, "crit_chance": 0.0} 
+        self._stats = None # (attaque, défense, critique) en cache, voir derived_stats
+
+    # -----------------------
+    # Stats dérivées (cache)
+    # -----------------------
+    def compute_stats(self) -> Tuple[int, int, float]:
+        """Recalcule attaque, défense et critique : base + équipement + bonus temporaires."""
+        weapon = self.equipment["weapon"]
+        attack = self.base_attack + (weapon.attack if weapon else 0) + self.temp_bonus["attack"]
+        defense = self.base_defense + self.temp_bonus["defense"]
+        for slot in ARMOR_SLOTS: # Utilisation de ARMOR_SLOTS
+            if self.equipment[slot]:
+                defense += self.equipment[slot].defense
+        crit = clamp(self.crit_chance + self.temp_bonus["crit_chance"], 0.1, 0.5)
+        return attack, defense, crit
+
+    def derived_stats(self) -> Tuple[int, int, float]:
+        """Stats dérivées en cache ; toute méthode qui modifie leurs entrées appelle invalidate_stats()."""
+        stats = self._stats
+        if stats is None:
+            stats = self._stats = self.compute_stats()
+        elif STATS_DEBUG:
+            assert stats == self.compute_stats(), f"Cache de stats périmé pour {self.name}: {stats} != {self.compute_stats()}"
+        return stats
+
+    def invalidate_stats(self):
+        self._stats = None
+
+    @property
+    def attack(self):
+        return self.derived_stats()[0]
+
+    @property
+    def defense(self):
+        return self.derived_stats()[1]
+        
+    @property
+    def current_crit_chance(self):
+        return self.derived_stats()[2]
+
+    def set_temp_bonus(self, stat: str, value):
+        """Bonus temporaire (boss) sur "attack", "defense" ou "crit_chance"."""
+        self.temp_bonus[stat] = value
+        self.invalidate_stats()
+        
+    def clear_temp_bonus(self):
+        """Réinitialise les bonus temporaires."""
+        self.temp_bonus = {"attack": 0, "defense": 0, "crit_chance": 0.0}
+        self.invalidate_stats()
+
+    def is_alive(self):
+        return self.hp > 0
+
+    def take_damage(self, dmg: int):
+        old = self.hp
+        self.hp = clamp(self.hp - dmg, 0, self.max_hp)
+        return old - self.hp
+
+    def heal(self, amount: int):
+        old = self.hp
+        self.hp = clamp(self.hp + amount, 0, self.max_hp)
+        return self.hp - old
+        
+    def potion_heal_amount(self, base_heal_amount=35) -> int:
+        """Soin (avant plafonnement aux PV max) d'une potion pour ce personnage."""
+        base_heal = base_heal_amount + self.level * 2
+        
+        if self.char_class == "Mage":
+            return int(base_heal * 1.5)
+        return base_heal
+
+    def use_potion(self, base_heal_amount=35):
+        if self.inventory.get("potion", 0) <= 0:
+            return 0
+        
+        self.inventory["potion"] -= 1
+        
+        healed = self.heal(self.potion_heal_amount(base_heal_amount))
+        return healed
+    
+    def equip_item(self, item: Item, index_in_inventory: Optional[int] = None):
+        item = intern_item(item)
+        item_type = item.get("type")
+        
+        valid_slots = ["weapon"] + ARMOR_SLOTS
+        
+        if item_type not in valid_slots:
+            return "Item non equipable (type non reconnu)."
+
+        old_item = self.equipment[item_type]
+        self.equipment[item_type] = item
+        self.invalidate_stats()
+        
+        if index_in_inventory is not None:
+            if index_in_inventory < len(self.inventory["items"]):
+                self.inventory["items"].pop(index_in_inventory)
+        
+        if old_item:
+            self.inventory["items"].append(old_item)
+            return f"{item['name']} equipe dans le slot {item_type}. L'ancien objet est dans l'inventaire."
+        
+        return f"{item['name']} equipe dans le slot {item_type}."
+
+    def unequip_item(self, item_type: str):
+        valid_slots = ["weapon"] + ARMOR_SLOTS
+        
+        if item_type not in valid_slots or not self.equipment[item_type]:
+            return f"Emplacement {item_type.upper()} vide ou non reconnu."
+            
+        old_item = self.equipment[item_type]
+        self.equipment[item_type] = None
+        self.invalidate_stats()
+        self.inventory["items"].append(old_item)
+        
+        return f"{old_item['name']} desequipe et remis dans l'inventaire."
+
+    def apply_level_up_stats(self):
+        self.max_hp += 10
+        self.base_defense += 1
+        self.crit_chance = clamp(self.crit_chance + 0.01, 0.1, 0.5)
+        
+        if self.char_class == "Tank":
+            self.max_hp += 10
+            self.base_defense += 2
+        elif self.char_class == "Guerrier":
+            self.base_attack += 3
+            self.crit_chance = clamp(self.crit_chance + 0.02, 0.1, 0.5)
+        else: # Mage
+             self.base_attack += 2
+             self.max_hp += 5
+             
+        self.hp = self.max_hp
+        self.invalidate_stats()
+
+    def check_level_up(self):
+        leveled = False
+        
+        xp_needed_base = 80 
+        
+        while self.xp >= xp_needed_base * self.level:
+            self.xp -= xp_needed_base * self.level
+            self.level += 1
+            self.apply_level_up_stats()
+            leveled = True
+            
+        return leveled
+
+    def to_dict(self):
+        return {
+            "name": self.name, "char_class": self.char_class, "max_hp": self.max_hp, 
+            "hp": self.hp, "base_attack": self.base_attack, "base_defense": self.base_defense,
+            "crit_chance": self.crit_chance, "xp": self.xp, "level": self.level, 
+            "inventory": dict(self.inventory, items=[dict(item) for item in self.inventory["items"]]), 
+            "equipment": {slot: dict(item) if item else None for slot, item in self.equipment.items()}, 
+            "avatar_file": self.avatar_file,
+            "gold": self.gold
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        base_stats = get_base_stats_for_class(d.get("char_class", "Heros"))
+        
+        c = cls(d.get("name","Héros"), d.get("char_class", "Heros"), 
+                 max_hp=base_stats["HP"], base_attack=base_stats["ATK"], base_defense=base_stats["DEF"], 
+                 crit_chance=d.get("crit_chance", 0.1), avatar_file=d.get("avatar_file","hero1.png"), 
+                 gold=d.get("gold", 0))
+        
+        c.max_hp = d.get("max_hp", c.max_hp)
+        c.base_attack = d.get("base_attack", c.base_attack)
+        c.base_defense = d.get("base_defense", c.base_defense)
+
+        c.hp = d.get("hp", c.max_hp)
+        c.xp = d.get("xp", 0)
+        c.level = d.get("level", 1)
+        c.inventory = dict(d.get("inventory", {"potion": 0, "items": []}))
+        c.inventory["items"] = [intern_item(item) for item in c.inventory.get("items", [])]
+        
+        loaded_eq = d.get("equipment", {})
+        
+        if "armor" in loaded_eq:
+            if loaded_eq["armor"] and not loaded_eq.get("chest"):
+                c.equipment["chest"] = intern_item(loaded_eq["armor"])
+        
+        for slot in c.equipment.keys():
+            if slot in loaded_eq:
+                c.equipment[slot] = intern_item(loaded_eq[slot])
+
+        # S'assure que le bonus temp est réinitialisé au chargement
+        c.clear_temp_bonus() 
+        return c
+
+class Enemy:
+    __slots__ = ("name", "max_hp", "hp", "attack_power", "defense", "xp_reward", "is_boss", "boss_type",
+                 "charging", "avatar_file")
+
+    def __init__(self, name: str, max_hp: int, attack: int, defense: int, xp_reward: int = 10, avatar_file="goblin.png", is_boss=False, boss_type=""):
+        self.name = name
+        self.max_hp = max_hp
+        self.hp = max_hp
+        self.attack_power = attack
+        self.defense = defense
+        self.xp_reward = xp_reward
+        self.is_boss = is_boss
+        self.boss_type = boss_type
+        self.charging = False
+        self.avatar_file = BOSS_AVATARS.get(boss_type, avatar_file) if is_boss else avatar_file
+        
+    def is_alive(self):
+        return self.hp > 0
+
+    def take_damage(self, dmg: int):
+        old = self.hp
+        self.hp = clamp(self.hp - dmg, 0, self.max_hp)
+        return old - self.hp
+    
+    def attack(self, target: Character, rng=random):
+        """Détermine le type d'attaque et les dégâts bruts."""
+        
+        if self.charging:
+            # L'attaque chargée ignore une partie de la défense (2/3 de la défense totale)
+            def_reduction = int(target.defense * 2 / 3) 
+            dmg = max(1, self.attack_power * 2 - def_reduction)
+            self.charging = False
+            return ("charged", dmg)
+
+        if self.is_boss:
+            r = rng.random()
+            
+            # Chance de charger si la vie est au-dessus de 20%
+            if r < 0.15 and not self.charging and self.hp / self.max_hp > 0.20: 
+                self.charging = True
+                return ("charge_prepare", 0)
+                
+            elif r < 0.30: 
+                dmg = max(1, int(self.attack_power * 1.6))
+                return ("heavy", dmg)
+
+        dmg = max(1, self.attack_power) 
+        return ("normal", dmg)
+
+
+# -----------------------
+# Gabarits d'ennemis et tables de stats par étage
+# -----------------------
+# Étages par bloc de table (construit à la première demande d'un étage du bloc)
+ENEMY_TABLE_BLOCK = 1024
+
+# Colonnes des tables de stats
+HP, ATK, DEF, XP = 0, 1, 2, 3
+
+class EnemyTemplate(NamedTuple):
+    """Archétype d'ennemi : stats de base + croissance par étage, multiplicateurs et avatar."""
+    name: str
+    is_boss: bool
+    boss_type: str
+    avatar_file: str
+    base: Tuple[int, int, int, int]      # PV, ATK, DEF, XP à l'étage 0
+    growth: Tuple[int, int, int, int]    # gain par étage
+    multipliers: Tuple[float, float, float] = (1.0, 1.0, 1.0) # PV, ATK, DEF
+
+def enemy_templates(pack: ContentPack) -> Dict[str, EnemyTemplate]:
+    """Archétypes du pack de contenu : "minion" puis un gabarit par type de boss."""
+    minion, boss = pack.data["minion"], pack.data["boss"]
+    templates = {"minion": EnemyTemplate(minion["name"], False, "", minion["avatar"], tuple(minion["base"]), tuple(minion["growth"]))}
+    for boss_type, spec in pack.data["bosses"].items():
+        templates[boss_type] = EnemyTemplate(f"Boss {boss_type}", True, boss_type, spec["avatar"], tuple(boss["base"]),
+                                             tuple(boss["growth"]), tuple(spec.get("multipliers", (1.0, 1.0, 1.0))))
+    return templates
+
+# Remplis au chargement du pack (voir ensure_content)
+ENEMY_TEMPLATES: Dict[str, EnemyTemplate] = {}
+MINION_TEMPLATE: Optional[EnemyTemplate] = None
+BOSS_MULTIPLIERS: Dict[str, Tuple[float, float, float]] = {}
+
+class EnemyRegistry:
+    """Stats précalculées (PV, ATK, DEF, XP) par archétype et par étage, en blocs NumPy construits à la demande.
+
+    Les valeurs sont identiques à l'ancien calcul de generate_enemy (multiplicateurs flottants puis troncature).
+    """
+    def __init__(self, templates: Dict[str, EnemyTemplate] = ENEMY_TEMPLATES, block_size: int = ENEMY_TABLE_BLOCK):
+        self.templates = templates
+        self.block_size = block_size
+        self.blocks: Dict[Tuple[str, int], np.ndarray] = {}
+        self.rows: Dict[Tuple[str, int], List[Tuple[int, int, int, int]]] = {} # mêmes blocs en tuples Python
+
+    def clear(self):
+        """Oublie les tables déjà construites (gabarits modifiés)."""
+        self.blocks.clear()
+        self.rows.clear()
+
+    def block(self, archetype: str, index: int) -> np.ndarray:
+        """Table (4, block_size) des étages [index * block_size, (index + 1) * block_size)."""
+        key = (archetype, index)
+        table = self.blocks.get(key)
+        if table is None:
+            template = self.templates[archetype]
+            stages = np.arange(index * self.block_size, (index + 1) * self.block_size, dtype=np.int64)
+            table = np.empty((4, self.block_size), dtype=np.int64)
+            for column in (HP, ATK, DEF, XP):
+                table[column] = template.base[column] + stages * template.growth[column]
+            for column, multiplier in zip((HP, ATK, DEF), template.multipliers):
+                if multiplier != 1.0:
+                    table[column] = (table[column] * multiplier).astype(np.int64)
+            table.flags.writeable = False
+            self.blocks[key] = table
+            self.rows[key] = list(zip(*table.tolist()))
+        return table
+
+    def stats(self, archetype: str, stage: int) -> Tuple[int, int, int, int]:
+        """(PV, ATK, DEF, XP) d'un archétype à un étage."""
+        index, offset = divmod(stage, self.block_size)
+        rows = self.rows.get((archetype, index))
+        if rows is None:
+            self.block(archetype, index)
+            rows = self.rows[(archetype, index)]
+        return rows[offset]
+
+    def bulk(self, archetype: str, stages) -> np.ndarray:
+        """Stats (4, n) d'un archétype pour un tableau d'étages."""
+        stages = np.asarray(stages, dtype=np.int64)
+        indices, offsets = np.divmod(stages, self.block_size)
+        out = np.empty((4, stages.size), dtype=np.int64)
+        for index in np.unique(indices):
+            mask = indices == index
+            out[:, mask] = self.block(archetype, int(index))[:, offsets[mask]]
+        return out
+
+    def spawn(self, archetype: str, stage: int, name: Optional[str] = None) -> Enemy:
+        template = self.templates[archetype]
+        hp, atk, defense, xp = self.stats(archetype, stage)
+        return Enemy(name or template.name, hp, atk, defense, xp, template.avatar_file,
+                     is_boss=template.is_boss, boss_type=template.boss_type)
+
+ENEMY_REGISTRY = EnemyRegistry()
+
+def reload_content(pack: ContentPack):
+    """Remplace le contenu en cours par pack (rechargement à chaud, voir hot_reload.py).
+
+    Les noms exportés (BOSS_TYPES, CLASSES, SHOP_ITEMS_ALL, ENEMY_TEMPLATES...) restent les mêmes
+    objets, modifiés sur place. Les objets déjà possédés et l'ennemi en cours ne changent pas ;
+    les tables d'ennemis sont recalculées à la demande.
+    """
+    global MINION_TEMPLATE
+    CONTENT.swap(pack)
+    LOOT_TABLES.rebuild()
+    BOSS_AVATARS.clear()
+    BOSS_AVATARS.update({boss_type: spec["avatar"] for boss_type, spec in CONTENT.data["bosses"].items()})
+    ENEMY_TEMPLATES.clear()
+    ENEMY_TEMPLATES.update(enemy_templates(CONTENT))
+    MINION_TEMPLATE = ENEMY_TEMPLATES["minion"]
+    BOSS_MULTIPLIERS.clear()
+    BOSS_MULTIPLIERS.update({boss_type: template.multipliers for boss_type, template in ENEMY_TEMPLATES.items() if template.is_boss})
+    ENEMY_REGISTRY.clear()
+
+def ensure_content() -> ContentPack:
+    """Charge le pack de contenu au premier besoin (moteur, outils) : importer rpg_core ne lit ni n'écrit aucun fichier."""
+    if not CONTENT.source_hash:
+        reload_content(load_pack())
+    return CONTENT
+
+# -----------------------
+# Game engine (Correction du plantage victoire)
+# -----------------------
+class GameEngine:
+    
+    def __init__(self, seed=None, rng: Optional[random.Random] = None, log_capacity: int = LOG_CAPACITY):
+        ensure_content()
+        # Effets visuels et notifications publiés vers l'interface (voir EventBus)
+        self.events = EventBus()
+        # Source d'aléatoire séquentielle (combat) ; seed est la graine de la partie en cours,
+        # qui indexe aussi les flux par étage (stream)
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.seed = seed if seed is not None else self.rng.getrandbits(63)
+        # Journal de la partie : point de départ + actions du joueur (voir export_run)
+        self.run_start: Optional[List[Any]] = None
+        self.action_log: List[List[Any]] = []
+        self.player: Optional[Character] = None
+        self.current_enemy: Optional[Enemy] = None
+        self.stage = 1
+        # Journal de combat : événements typés, formatés seulement à l'affichage (0 = pas d'historique)
+        self.combat_log = CombatLog(log_capacity)
+        # Export optionnel des tours et combats (telemetry.CombatTelemetry) ; dernier coup de l'ennemi
+        self.telemetry = None
+        self.last_enemy_move = ""
+        # Ecriture des sauvegardes sur un thread (save_writer.SaveWriter) ; None = écriture immédiate
+        self.saver = None
+        self.state = "menu" 
+        self.defending = False
+        
+        self.last_loot: Optional[Dict[str,Any]] = None
+        self.last_xp: int = 0
+        self.leveled_up: bool = False
+        self.discovered_shop_items: List[str] = [item['name'] for item in SHOP_ITEMS_ALL if item.get("level_required", 1) == 1]
+        
+        # Nouvel attribut pour le tip de boss affiché
+        self.boss_tip_shown = False 
+
+    def log(self, text: str):
+        """Message libre (sauvegarde, boutique...) ; les événements de combat passent par log_event."""
+        self.combat_log.add((cl.MESSAGE, text))
+
+    def log_event(self, kind: int, *values):
+        """Evénement de combat typé (voir combat_log.TEMPLATES) : aucun texte n'est formaté ici."""
+        self.combat_log.add((kind,) + values)
+
+    @property
+    def log_lines(self) -> List[str]:
+        """Dernières lignes du journal, telles qu'affichées dans la boîte de combat."""
+        return self.combat_log.lines(LOG_VISIBLE_LINES)
+
+    # --- ALÉATOIRE ET JOURNAL DE PARTIE ---
+    def reseed(self, seed=None):
+        """Réensemence self.rng ; sans graine, elle est tirée du flux courant (donc reproductible)."""
+        self.seed = seed if seed is not None else self.rng.getrandbits(63)
+        self.rng.seed(self.seed)
+
+    def stream(self, purpose: str, stage: Optional[int] = None) -> CounterRng:
+        """Flux indépendant pour (graine de la partie, étage, usage) ; accès direct à n'importe quel étage."""
+        return stage_stream(self.seed, self.stage if stage is None else stage, purpose)
+
+    def start_run(self, start: List[Any]):
+        """Ouvre un nouveau journal de partie (après new_game / load_game)."""
+        self.run_start = start
+        self.action_log = []
+
+    def record(self, *entry):
+        if self.run_start is not None:
+            self.action_log.append(list(entry))
+
+    def state_hash(self) -> str:
+        """Empreinte de l'état de jeu (joueur, étage, ennemi, boutique, aléatoire).
+
+        L'écran affiché (self.state) n'en fait pas partie : l'interface en change (inventaire, pause,
+        menu...) sans passer par le journal de la partie.
+        """
+        enemy = self.current_enemy
+        state = {
+            "player": self.player.to_dict() if self.player else None,
+            "stage": self.stage,
+            "enemy": [enemy.name, enemy.hp, enemy.max_hp, enemy.charging] if enemy else None,
+            "shop": self.discovered_shop_items,
+            "rng": repr(self.rng.getstate()) if hasattr(self.rng, "getstate") else None,
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def export_run(self) -> Dict[str, Any]:
+        """Journal compact de la partie : graine, départ, actions et empreinte de l'état final."""
+        return {
+            "version": RUN_LOG_VERSION,
+            "seed": self.seed,
+            "start": self.run_start,
+            "actions": self.action_log,
+            "hash": self.state_hash(),
+        }
+    
+    # --- MÉTHODES DE SAUVEGARDE ET CHARGEMENT (Inchangées) ---
+    def save_data(self) -> Dict[str, Any]:
+        """Retourne les données de sauvegarde (joueur + étage)."""
+        data = self.player.to_dict()
+        data["stage"] = self.stage
+        return data
+
+    def save_game(self):
+        """Sauvegarde l'état du jeu (instantané en mémoire, écrit par self.saver s'il y en a un)."""
+        if not self.player:
+            self.log("Erreur: Impossible de sauvegarder. Aucun joueur actif.")
+            return False
+            
+        data = self.save_data()
+        
+        save_file = os.path.join(SAVE_DIR, f"save_{self.player.name.replace(' ', '_')}.json")
+        if self.saver is not None:
+            self.saver.submit(save_file, data)
+            self.log("Sauvegarde en cours...")
+            return True
+        try:
+            write_save(save_file, data)
+        except Exception as e:
+            self.save_finished(save_file, e)
+            return False
+        self.save_finished(save_file, None)
+        return True
+
+    def save_finished(self, save_file: str, error: Optional[Exception]):
+        """Fin d'écriture d'une sauvegarde (immédiate ou signalée par SaveWriter.apply_pending)."""
+        if error is None:
+            self.log(f"Partie sauvegardee sous {save_file}")
+        else:
+            self.log(f"Erreur de sauvegarde: {error}")
+
+    def load_game(self, filename: str):
+        """Charge une partie à partir d'un fichier."""
+        save_file = os.path.join(SAVE_DIR, filename)
+        try:
+            with open(save_file, 'r') as f:
+                data = json.load(f)
+                
+            self.load_data(data)
+            return True
+        except Exception as e:
+            self.log(f"Erreur de chargement: {e}")
+            return False
+
+    def load_data(self, data: Dict[str, Any], seed=None):
+        """Reprend une partie à partir des données de sauvegarde (voir save_data)."""
+        self.reseed(seed)
+        self.player = Character.from_dict(data)
+        self.stage = data.get("stage", 1)
+        self.state = "battle"
+        self.log(f"Partie chargee: {self.player.name} (Etage {self.stage})")
+        
+        # La sauvegarde ne contient pas l'ennemi : l'ennemi encore en vie de la partie précédente
+        # est abandonné, sinon le départ ["load", data] ne suffirait plus à rejouer la partie
+        self.current_enemy = None
+        self.spawn_enemy()
+        # Copie pour le journal : le joueur chargé partage son inventaire avec data
+        self.start_run(["load", json.loads(json.dumps(data))])
+            
+    def delete_save(self, filename: str):
+        """Supprime un fichier de sauvegarde."""
+        save_file = os.path.join(SAVE_DIR, filename)
+        try:
+            os.remove(save_file)
+            self.log(f"Sauvegarde {filename} supprimee.")
+            return True
+        except Exception as e:
+            self.log(f"Erreur de suppression: {e}")
+            return False
+
+    def new_game(self, name: str, char_class: str, chosen_avatar: str = "hero1.png", seed=None):
+        """Initialise une nouvelle partie et crée le personnage (seed : graine de la partie, sinon dérivée de self.rng)."""
+        # Réinitialisation de l'état du jeu
+        self.reseed(seed)
+        self.stage = 1
+        self.combat_log.clear()
+        self.state = "battle" 
+        self.defending = False
+        self.last_loot = None
+        self.last_xp = 0
+        self.leveled_up = False
+        self.discovered_shop_items = [item['name'] for item in SHOP_ITEMS_ALL if item.get("level_required", 1) == 1]
+        
+        # Création du nouveau personnage avec 50 Or de départ
+        self.player = Character(name, char_class, avatar_file=chosen_avatar, gold=50)
+        
+        self.log(f"Nouvelle Partie: {name} ({char_class}) commence son aventure!")
+        
+        # Lance le premier combat
+        self.spawn_enemy()
+        self.start_run(["new_game", name, char_class, chosen_avatar])
+        
+    def get_boss_tip(self, boss_type: str) -> str:
+        """Retourne un conseil pour battre le boss."""
+        return CONTENT.boss_tip(boss_type)
+    
+    def generate_enemy(self, stage: int, boss_type: Optional[str] = None) -> Enemy:
+        """Génère un ennemi ou un boss basé sur le stage actuel (boss_type force le type de boss).
+
+        Le tirage ne dépend que de (graine, étage) : on peut prévisualiser n'importe quel étage.
+        """
+        rng = self.stream("enemy", stage)
+        is_boss = (stage % 5 == 0) and (stage > 0)
+        
+        # Stats lues dans les tables précalculées (ENEMY_REGISTRY / ENEMY_TEMPLATES)
+        if is_boss:
+            return ENEMY_REGISTRY.spawn(boss_type or rng.choice(BOSS_TYPES), stage)
+        return ENEMY_REGISTRY.spawn("minion", stage, name=rng.choice(MINION_NAMES))
+    
+    def apply_boss_bonus(self):
+        """Donne un bonus aléatoire au joueur au début d'un combat de boss."""
+        if not self.player or not self.current_enemy or not self.current_enemy.is_boss:
+            return
+
+        rng = self.stream("boss_bonus")
+        bonus_choices = ["ATK", "DEF", "HEAL"]
+        choice = rng.choice(bonus_choices)
+        
+        bonus_value = 0
+        message = ""
+        
+        if choice == "ATK":
+            bonus_value = self.player.level + rng.randint(3, 7)
+            self.player.set_temp_bonus("attack", bonus_value)
+            message = f"Bonus de Boss: +{bonus_value} ATK (Attaque Temporaire)."
+            
+        elif choice == "DEF":
+            bonus_value = self.player.level + rng.randint(1, 4)
+            self.player.set_temp_bonus("defense", bonus_value)
+            message = f"Bonus de Boss: +{bonus_value} DEF (Defense Temporaire)."
+            
+        elif choice == "HEAL":
+            # Soin initial basé sur la vie max du joueur
+            heal_amount = int(self.player.max_hp * (0.10 + rng.random() * 0.15)) 
+            healed = self.player.heal(heal_amount)
+            if healed > 0:
+                self.events.emit("heal", target="player", amount=healed)
+            message = f"Bonus de Boss: Soin initial ! +{healed} PV restaurés."
+            # Aucun bonus temporel n'est appliqué ici, seulement un soin ponctuel.
+
+        # Popup pour le bonus de boss
+        self.events.emit("info", message=message, style="boss_bonus")
+        self.log(message)
+
+
+    def return_to_menu(self):
+        """Retour au menu après une fuite : l'ennemi est abandonné (action enregistrée pour le rejeu)."""
+        self.record("menu")
+        self.current_enemy = None
+        self.state = "menu"
+
+    def spawn_enemy(self):
+        # Réinitialiser l'état de la bataille
+        self.record("spawn")
+        self.current_enemy = self.generate_enemy(self.stage)
+        self.log_event(cl.SPAWN, self.current_enemy.name, self.stage)
+        self.state = "battle"
+        self.defending = False
+        self.boss_tip_shown = False # Réinitialiser le tip
+        self.player.clear_temp_bonus() # Réinitialiser les bonus temporaires
+
+        
+        # Appliquer et afficher le bonus de boss immédiatement
+        if self.current_enemy.is_boss:
+             self.apply_boss_bonus()
+             self.show_boss_tip()
+
+
+    def show_boss_tip(self):
+         """Affiche un popup d'information sur la faiblesse du boss."""
+         if self.current_enemy and self.current_enemy.is_boss and not self.boss_tip_shown:
+             tip = self.get_boss_tip(self.current_enemy.boss_type)
+             full_message = f"BOSS: {self.current_enemy.name} - {tip}"
+             
+             # Message d'info central (popup côté interface)
+             self.events.emit("info", message=full_message, style="boss_tip")
+             self.boss_tip_shown = True
+             self.log(f"Conseil Boss : {tip}") # Log également pour la persistance dans le log box
+             
+    def sell_item(self, item_index: int):
+        """Vend un objet de l'inventaire et donne de l'or."""
+        if not self.player: return 0, "Erreur: Joueur introuvable."
+        
+        if item_index < 0 or item_index >= len(self.player.inventory["items"]):
+            return 0, "Erreur: Index d'objet invalide."
+            
+        item = self.player.inventory["items"][item_index]
+        self.record("sell", item_index)
+        
+        # Le prix de vente est une fraction du prix d'achat ou du coût de base (ici 40%)
+        # Si 'cost' n'est pas dans l'item de loot, on prend une base de 50.
+        base_cost = item.get("cost", 50) 
+        sell_price = max(1, int(base_cost * 0.40)) 
+
+        item_name = item['name']
+        
+        self.player.inventory["items"].pop(item_index)
+        self.player.gold += sell_price
+        
+        self.log(f"Vendu {item_name} pour {sell_price} Gold. Total: {self.player.gold}.")
+        return sell_price, f"Vendu {item_name} pour {sell_price} Gold."
+        
+    def sell_potion(self, base_cost=30):
+        """Vend une potion de l'inventaire."""
+        if not self.player or self.player.inventory.get("potion", 0) <= 0:
+            return 0, "Pas de potions a vendre."
+            
+        self.record("sell_potion", base_cost)
+        sell_price = max(1, int(base_cost * 0.40))
+        
+        self.player.inventory["potion"] -= 1
+        self.player.gold += sell_price
+        
+        self.log(f"Vendu 1 Potion Standard pour {sell_price} Gold. Total: {self.player.gold}.")
+        return sell_price, f"Vendu 1 Potion Standard pour {sell_price} Gold."
+
+    def unlock_shop_items(self):
+        """Débloque les articles du magasin accessibles au niveau actuel du joueur."""
+        if not self.player: return
+        
+        self.record("unlock")
+        for item in CONTENT.query(max_level=self.player.level, shop_only=True):
+            if item['name'] not in self.discovered_shop_items:
+                self.discovered_shop_items.append(item['name'])
+                self.log(f"MAGASIN: Nouvel article debloque (Lvl {self.player.level}): {item['name']} !")
+
+    def can_buy(self, item: Dict[str, Any]) -> bool:
+        return (self.player is not None and self.player.gold >= item['cost']
+                and self.player.level >= item.get("level_required", 1))
+
+    def buy_item(self, item: Dict[str, Any]) -> bool:
+        """Achète un article du magasin si le joueur a le niveau et l'or nécessaires."""
+        if not self.can_buy(item):
+            return False
+        
+        self.record("buy", item['name'])
+        player = self.player
+        player.gold -= item['cost']
+        
+        if item['type'] == 'potion':
+            player.inventory['potion'] += item.get('amount', 1)
+            self.log(f"Achete {item['name']}. Total: {player.inventory['potion']} potions.")
+        else:
+            player.inventory['items'].append(intern_item(item)) 
+            self.log(f"Achete {item['name']} et place dans l'inventaire.")
+        return True
+
+
+    def player_attack(self):
+        if not self.player or not self.current_enemy: return
+            
+        is_crit = self.rng.random() < self.player.current_crit_chance # Utilisation du taux critique actuel
+        
+        raw = self.player.attack + self.rng.randint(-2,2)
+        dmg = max(1, raw - self.current_enemy.defense)
+        
+        if is_crit:
+            dmg = int(dmg * 2)
+        
+        dealt = self.current_enemy.take_damage(dmg)
+        if dealt > 0:
+            self.events.emit("damage", target="enemy", amount=dealt, crit=is_crit)
+        
+        self.log_event(cl.CRIT if is_crit else cl.ATTACK, self.player.name, dealt)
+
+    def enemy_turn(self):
+        if not self.player or not self.current_enemy: return
+            
+        temp_defense_bonus = self.player.defense if self.defending else 0
+        temp_defense = self.player.defense + temp_defense_bonus
+        
+        action_type, raw_dmg = self.current_enemy.attack(self.player, self.rng)
+        self.last_enemy_move = action_type
+        
+        if action_type == "charge_prepare":
+            self.log_event(cl.CHARGE, self.current_enemy.name)
+            self.defending = False
+            return
+            
+        # NOUVEAU: Si l'attaque est 'charged' et que le joueur ne défend pas, les dégâts ne sont pas réduits par la défense.
+        if action_type == "charged":
+            if not self.defending:
+                # Dégâts non réduits (ou très peu) par la défense
+                dmg = max(1, raw_dmg - (self.player.defense // 4)) 
+                self.log_event(cl.UNDEFENDED_CHARGE)
+            else:
+                # Si défendu, l'attaque chargée est contrée efficacement
+                dmg = max(1, raw_dmg - temp_defense * 2) 
+        else:
+            # Attaque normale ou lourde : réduction par la défense (normale ou double si défendu)
+            dmg = max(1, raw_dmg - temp_defense)
+        
+        
+        # Vérification du blocage/contre-attaque
+        is_blocked = self.defending and self.rng.random() < 1/3
+        
+        dealt = 0
+        if is_blocked and action_type != "charged":
+            self.log_event(cl.BLOCK, self.player.name)
+            dealt = 0
+        else:
+            dealt = self.player.take_damage(dmg) 
+            if dealt > 0:
+                self.events.emit("damage", target="player", amount=dealt, crit=False)
+        
+        # Contre-attaque
+        if self.defending and dealt > 0:
+            riposte_dmg = max(1, dealt // 4) 
+            riposte_dealt = self.current_enemy.take_damage(riposte_dmg) 
+            
+            if riposte_dealt > 0:
+                 self.events.emit("damage", target="enemy", amount=riposte_dealt, crit=True)
+                 self.events.emit("riposte", amount=riposte_dealt)
+            
+            self.log_event(cl.RIPOSTE, riposte_dealt)
+        
+        # Log des actions
+        if is_blocked and action_type != "charged":
+             pass 
+        elif self.defending:
+            self.log_event(cl.DEFEND_HIT, self.current_enemy.name, dealt)
+        elif action_type == "charged":
+            self.log_event(cl.CHARGED_HIT, self.current_enemy.name, dealt)
+        elif action_type == "heavy":
+            self.log_event(cl.HEAVY_HIT, self.current_enemy.name, dealt)
+        else:
+            self.log_event(cl.ENEMY_HIT, self.current_enemy.name, dealt)
+            
+        self.defending = False
+    
+    def apply_loot(self, loot: Dict[str, Any]):
+        if not self.player: return
+        
+        item_type = loot.get("type")
+        item_name = loot["name"]
+        amount = loot.get("amount", 1)
+        
+        # --- NOUVEAU : Message d'info pour le loot (popup côté interface) ---
+        self.events.emit("info", message=f"Objet trouve: {item_name}!", style="loot")
+        
+        if item_type == "potion":
+            self.player.inventory["potion"] = self.player.inventory.get("potion", 0) + amount
+            self.log_event(cl.LOOT_POTION, item_name, self.player.inventory["potion"])
+        elif item_type == "gold":
+            self.player.gold += amount
+            self.log_event(cl.LOOT_GOLD, amount, self.player.gold)
+        elif item_type in ["weapon"] + ARMOR_SLOTS: 
+            # Objet partagé (immuable) : pas de copie par drop
+            self.player.inventory["items"].append(intern_item(loot)) 
+            self.log_event(cl.LOOT_ITEM, item_name)
+
+    def handle_victory(self):
+        """
+        Gère la fin du combat après la victoire. 
+        """
+        if not self.player or not self.current_enemy: return
+            
+        self.last_xp = self.current_enemy.xp_reward
+        self.player.xp += self.last_xp
+        self.log_event(cl.VICTORY, self.current_enemy.name, self.last_xp)
+        # Loot de l'étage vaincu (tranche d'étages et type de boss)
+        self.last_loot = generate_loot(self.stream("loot"), self.stage, self.current_enemy.boss_type)
+        self.stage += 1
+        
+        self.apply_loot(self.last_loot)
+        
+        # FIX DE L'ERREUR CRITIQUE : Appeler check_level_up sur l'objet player
+        self.leveled_up = self.player.check_level_up() 
+        if self.leveled_up:
+            self.log_event(cl.LEVEL_UP, self.player.name, self.player.level)
+        
+        self.player.clear_temp_bonus() # Réinitialiser le bonus après le combat
+        
+        # Correction: On passe en état 'victory_screen' et on attend le clic pour la suite.
+        self.state = "victory_screen"
+        
+    def handle_flee(self):
+        if not self.player or not self.current_enemy: return
+        
+        flee_chance = 0.5
+        if self.player.char_class == "Mage": 
+            flee_chance = 0.6
+        
+        ok = self.rng.random() < flee_chance
+            
+        if ok:
+            self.log(f"[{self.player.name}]: \"Ce combat n'en vaut pas la peine. Je me replie !\"")
+            self.log("Fuite reussie ! (Appuyez sur A)") 
+            self.player.clear_temp_bonus() # Réinitialiser le bonus après la fuite
+            self.state = "flee_success"
+        else:
+            self.log(f"[{self.player.name}]: \"Oups, l'ennemi m'a bloque !\"")
+            self.log("Fuite echouee ! L'ennemi attaque...")
+            self.enemy_turn() 
+            self.defending = False 
+
+    def equip_item(self, item_index: int) -> str:
+        """Equipe l'objet d'index item_index de l'inventaire (journalisé)."""
+        if not self.player: return ""
+        self.record("equip", item_index)
+        message = self.player.equip_item(self.player.inventory["items"][item_index], index_in_inventory=item_index)
+        self.log(message)
+        return message
+
+    def unequip_item(self, slot: str) -> str:
+        """Retire l'objet du slot et le remet dans l'inventaire (journalisé)."""
+        if not self.player: return ""
+        self.record("unequip", slot)
+        message = self.player.unequip_item(slot)
+        self.log(message)
+        return message
+
+    def use_potion(self):
+        """Boit une potion (ne termine pas le tour)."""
+        if not self.player: return 0
+        
+        healed = self.player.use_potion()
+        if healed > 0:
+            self.events.emit("heal", target="player", amount=healed)
+        self.log_event(cl.POTION, self.player.name, healed, self.player.inventory.get("potion", 0))
+        return healed
+
+    def take_turn(self, action: str):
+        """Joue une action de combat du joueur ("attack", "defend", "potion", "flee") et la riposte de l'ennemi."""
+        if not self.player or not self.current_enemy: return
+
+        self.record("turn", action)
+        telemetry = self.telemetry
+        if telemetry is None:
+            self.resolve_turn(action)
+            return
+
+        # Télémétrie : état avant le tour, le détail est relu dans le journal de combat
+        enemy, mark = self.current_enemy, self.combat_log.count
+        player_hp, enemy_hp, potions = self.player.hp, enemy.hp, self.player.inventory.get("potion", 0)
+        self.last_enemy_move = ""
+        self.resolve_turn(action)
+        telemetry.on_turn(self, action, enemy, mark, player_hp, enemy_hp, potions)
+
+    def resolve_turn(self, action: str):
+        player_turn_over = False
+
+        if action == "attack":
+            self.player_attack()
+            player_turn_over = True
+        elif action == "defend":
+            self.defending=True
+            self.log_event(cl.DEFEND)
+            
+            # Astuce de jeu : Si l'ennemi charge, la défense est une excellente contre-attaque.
+            if self.current_enemy.charging:
+                 self.log_event(cl.DEFEND_TIP)
+                 
+            player_turn_over = True 
+
+        elif action == "potion":
+            if self.player.inventory.get("potion",0) > 0:
+                self.use_potion()
+            else:
+                self.log_event(cl.NO_POTION)
+            return
+            
+        elif action == "flee":
+            self.handle_flee()
+
+        if player_turn_over and self.state == "battle": 
+            if self.current_enemy.is_alive():
+                self.enemy_turn() 
+            else:
+                # L'ennemi est mort. Appeler la gestion de la victoire.
+                self.handle_victory() 
+
+        if self.player and not self.player.is_alive():
+            self.log_event(cl.DEATH, self.player.name)
+            self.state="gameover"
+            self.current_enemy = None
+
+
+def get_all_saves():
+    """Lit tous les fichiers save_*.json et retourne le nom du joueur, niveau, et stage."""
+    saves = []
+    if not os.path.isdir(SAVE_DIR):
+        return saves
+    for filename in os.listdir(SAVE_DIR):
+        if filename.startswith("save_") and filename.endswith("json"):
+            filepath = os.path.join(SAVE_DIR, filename)
+            try:
+                with open(filepath, 'r') as f:
+                    data = json.load(f)
+                saves.append({
+                    "filename": filename,
+                    "name": data.get("name", "Inconnu"),
+                    "level": data.get("level", 1),
+                    "stage": data.get("stage", 1),
+                })
+            except Exception:
+                pass
+    return saves
+
+# CLASSES DE PERSONNAGE : (nom, avatar, description), lues dans le pack de contenu
+CLASSES = CONTENT.classes
@@ -0,0 +1,123 @@
+"""
+Ecriture des sauvegardes : atomique (fichier temporaire, fsync, rename) et hors du thread de rendu.
+
+GameEngine.save_game prend un instantané des données en mémoire et le confie à un SaveWriter :
+la sérialisation JSON et l'écriture se font sur son thread. Plusieurs demandes pour le même
+fichier avant qu'il ne soit écrit sont fusionnées (seul le dernier instantané est écrit). Un
+arrêt brutal pendant l'écriture laisse l'ancienne sauvegarde intacte.
+
+La boucle principale appelle apply_pending() une fois par frame pour publier les sauvegardes
+terminées (on_done, sur le thread de rendu).
+
+Exemple :
+    saver = SaveWriter(on_done=engine.save_finished)
+    saver.start()
+    engine.saver = saver
+    ...
+    saver.apply_pending() # dans la boucle principale
+    saver.close()         # en quittant : écrit ce qui reste
+"""
+import json, os, queue, threading
+from typing import Optional, Dict, Any, Callable, Tuple
+
+def write_atomic(path: str, text: str):
+    """Remplace path par text sans jamais laisser de fichier à moitié écrit (temp + fsync + rename)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Le renommage lui-même doit survivre à une coupure (POSIX ; sans effet ailleurs)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_save(path: str, data: Dict[str, Any]):
+    write_atomic(path, json.dumps(data, indent=4))
+
+class SaveWriter(threading.Thread):
+    """Ecrit les instantanés de sauvegarde sur son propre thread, le plus récent par fichier.
+
+    - on_done(chemin, erreur) : appelé par apply_pending sur le thread de rendu (erreur None si réussite)
+    """
+    def __init__(self, on_done: Optional[Callable[[str, Optional[Exception]], None]] = None):
+        super().__init__(name="save-writer", daemon=True)
+        self.on_done = on_done
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.done: "queue.SimpleQueue[Tuple[str, Optional[Exception]]]" = queue.SimpleQueue()
+        self.writes = 0
+        self.coalesced = 0
+
+    def submit(self, path: str, data: Dict[str, Any]):
+        """Met en attente un instantané (ne bloque pas) ; remplace celui qui attendait pour le même fichier."""
+        with self.cond:
+            if path in self.pending:
+                self.coalesced += 1
+            self.pending[path] = data
+            self.cond.notify()
+
+    def busy(self) -> bool:
+        with self.cond:
+            return bool(self.pending)
+
+    # -----------------------
+    # Thread d'écriture
+    # -----------------------
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopping:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                path, data = self.pending.popitem()
+            try:
+                write_save(path, data)
+                error = None
+            except Exception as e:
+                # Toute erreur est signalée (le thread continue) : une sauvegarde ne reste jamais "en cours"
+                error = e
+            self.writes += 1
+            self.done.put((path, error))
+
+    def close(self, timeout: Optional[float] = None):
+        """Ecrit les sauvegardes encore en attente puis arrête le thread."""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    # -----------------------
+    # Thread de rendu
+    # -----------------------
+    def apply_pending(self) -> int:
+        """Publie les sauvegardes terminées ; retourne leur nombre. À appeler entre deux frames."""
+        finished = 0
+        while True:
+            try:
+                path, error = self.done.get_nowait()
+            except queue.Empty:
+                return finished
+            finished += 1
+            if self.on_done:
+                self.on_done(path, error)
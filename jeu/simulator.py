@@ -0,0 +1,318 @@
+"""
+Simulateur Monte Carlo d'équilibrage : joue des parties complètes sans affichage.
+
+Les parties utilisent les vraies règles de rpg_core (generate_enemy, player_attack, enemy_turn,
+handle_victory, generate_loot, boutique) pilotées par une politique scriptée.
+
+Exemple :
+    python simulator.py --runs 2000 --max-stage 30 --policy cautious
+    python simulator.py --classes Tank Mage --potion-below 0.5 --json
+    python simulator.py --runs 5000 --max-stage 100 --policy attack defend_charge cautious --workers 8 --seed 1
+    python simulator.py --loot-report 1000000
+    python simulator.py --runs 10000 --telemetry telemetry
+"""
+import argparse, json, os, random, sys, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from rpg_core import ARMOR_SLOTS, CLASSES, LOOT_TABLES, SHOP_ITEMS_ALL, GameEngine, ensure_content
+from auto_battle import ExpectimaxAgent
+from telemetry import TELEMETRY_LOG_CAPACITY, CombatTelemetry, TelemetryWriter, close_shared_writers, shared_writer
+
+# Nombre maximal d'actions par combat (sécurité contre les boucles infinies)
+MAX_ACTIONS_PER_FIGHT = 500
+
+# Parties par tâche de la ferme de simulation (découpage fixe, indépendant du nombre de processus)
+SHARD_RUNS = 50
+
+# -----------------------
+# Politiques scriptées
+# -----------------------
+class ScriptedPolicy:
+    """Choisit l'action du joueur et gère l'inventaire/la boutique entre deux combats.
+
+    - potion_below : boit une potion si PV/PV max passe sous ce ratio (0 = jamais)
+    - defend_on_charge : se défend quand l'ennemi prépare une attaque chargée
+    - equip_loot : équipe les objets trouvés/achetés s'ils améliorent l'équipement
+    - shop : achète des potions (jusqu'à potion_stock) et des équipements plus forts
+    """
+    def __init__(self, potion_below: float = 0.0, defend_on_charge: bool = False,
+                 equip_loot: bool = True, shop: bool = True, potion_stock: int = 3):
+        self.potion_below = potion_below
+        self.defend_on_charge = defend_on_charge
+        self.equip_loot = equip_loot
+        self.shop = shop
+        self.potion_stock = potion_stock
+
+    def choose(self, engine: GameEngine) -> str:
+        player = engine.player
+        if (self.potion_below > 0 and player.hp < player.max_hp * self.potion_below
+                and player.inventory.get("potion", 0) > 0):
+            return "potion"
+        if self.defend_on_charge and engine.current_enemy.charging:
+            return "defend"
+        return "attack"
+
+    def between_fights(self, engine: GameEngine):
+        if self.shop:
+            self.go_shopping(engine)
+        if self.equip_loot:
+            equip_upgrades(engine)
+
+    def go_shopping(self, engine: GameEngine):
+        engine.unlock_shop_items()
+        player = engine.player
+        for item in SHOP_ITEMS_ALL:
+            if item["type"] == "potion":
+                while player.inventory.get("potion", 0) < self.potion_stock and engine.buy_item(item):
+                    pass
+            elif item_power(item) > item_power(player.equipment[item["type"]]) and not owns_item(player, item):
+                engine.buy_item(item)
+
+class AgentPolicy(ScriptedPolicy):
+    """Boutique/équipement scriptés, actions de combat choisies par l'agent expectimax (auto_battle).
+
+    Profondeur fixe sans budget de temps : les résultats restent reproductibles avec une graine.
+    """
+    def __init__(self, max_depth: int = 2, **kwargs):
+        super().__init__(**kwargs)
+        self.agent = ExpectimaxAgent(node_budget=None, max_depth=max_depth, allow_flee=False)
+
+    def choose(self, engine: GameEngine) -> str:
+        return self.agent.choose(engine)
+
+POLICIES = {
+    "attack": lambda: ScriptedPolicy(),
+    "defend_charge": lambda: ScriptedPolicy(defend_on_charge=True),
+    "potion": lambda: ScriptedPolicy(potion_below=0.35),
+    "cautious": lambda: ScriptedPolicy(potion_below=0.35, defend_on_charge=True),
+    "expectimax": lambda: AgentPolicy(),
+}
+
+def item_power(item: Optional[Dict[str, Any]]) -> int:
+    if not item:
+        return 0
+    return item.get("attack", 0) if item["type"] == "weapon" else item.get("defense", 0)
+
+def owns_item(player, item: Dict[str, Any]) -> bool:
+    return any(owned["name"] == item["name"] for owned in player.inventory["items"])
+
+def equip_upgrades(engine: GameEngine):
+    """Équipe, slot par slot, le meilleur objet de l'inventaire s'il bat l'objet équipé."""
+    player = engine.player
+    for slot in ["weapon"] + ARMOR_SLOTS:
+        best_index, best_power = None, item_power(player.equipment[slot])
+        for index, item in enumerate(player.inventory["items"]):
+            if item["type"] == slot and item_power(item) > best_power:
+                best_index, best_power = index, item_power(item)
+        if best_index is not None:
+            engine.equip_item(best_index)
+
+# -----------------------
+# Statistiques
+# -----------------------
+class ClassStats:
+    """Agrégats d'une classe (et d'une politique) : combats, tours, potions, or par étage et étage de mort."""
+    def __init__(self, char_class: str, policy: str = ""):
+        self.char_class = char_class
+        self.policy = policy
+        self.runs = 0
+        self.cleared_runs = 0
+        self.fights = 0
+        self.wins = 0
+        self.turns = 0
+        self.potions = 0
+        self.timeouts = 0
+        self.death_stages: Counter = Counter()
+        self.gold_sum: Counter = Counter() # étage -> somme de l'or au début du combat
+        self.gold_count: Counter = Counter()
+
+    def merge(self, other: "ClassStats"):
+        self.runs += other.runs
+        self.cleared_runs += other.cleared_runs
+        self.fights += other.fights
+        self.wins += other.wins
+        self.turns += other.turns
+        self.potions += other.potions
+        self.timeouts += other.timeouts
+        self.death_stages.update(other.death_stages)
+        self.gold_sum.update(other.gold_sum)
+        self.gold_count.update(other.gold_count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        fights = max(1, self.fights)
+        return {
+            "class": self.char_class,
+            "policy": self.policy,
+            "runs": self.runs,
+            "cleared_runs": self.cleared_runs,
+            "fights": self.fights,
+            "win_rate": self.wins / fights,
+            "turns_per_fight": self.turns / fights,
+            "potions_per_fight": self.potions / fights,
+            "timeouts": self.timeouts,
+            "death_stages": dict(sorted(self.death_stages.items())),
+            "gold_curve": {stage: self.gold_sum[stage] / self.gold_count[stage] for stage in sorted(self.gold_count)},
+        }
+
+# -----------------------
+# Simulation
+# -----------------------
+def simulate_run(char_class: str, policy: ScriptedPolicy, max_stage: int, stats: ClassStats, seed=None,
+                 telemetry: Optional[TelemetryWriter] = None):
+    """Joue une partie complète (jusqu'à la mort ou max_stage) et l'ajoute à stats (et à telemetry si fourni)."""
+    if telemetry is None:
+        engine = GameEngine(log_capacity=0) # journal jamais lu en simulation : seul le compteur avance
+    else:
+        engine = GameEngine(log_capacity=TELEMETRY_LOG_CAPACITY)
+        engine.telemetry = CombatTelemetry(telemetry)
+    avatar = next((avatar for name, avatar, _ in CLASSES if name == char_class), "hero1.png")
+    engine.new_game("Sim", char_class, chosen_avatar=avatar, seed=seed)
+    stats.runs += 1
+
+    while True:
+        stats.fights += 1
+        stats.gold_sum[engine.stage] += engine.player.gold
+        stats.gold_count[engine.stage] += 1
+
+        actions = 0
+        while engine.state == "battle" and actions < MAX_ACTIONS_PER_FIGHT:
+            action = policy.choose(engine)
+            if action == "potion":
+                stats.potions += 1
+            else:
+                stats.turns += 1
+            engine.take_turn(action)
+            actions += 1
+
+        if engine.state == "victory_screen":
+            stats.wins += 1
+            if engine.stage > max_stage:
+                stats.cleared_runs += 1
+                return
+            policy.between_fights(engine)
+            engine.spawn_enemy()
+        elif engine.state == "gameover":
+            stats.death_stages[engine.stage] += 1
+            return
+        else:
+            # Combat interminable ou fuite : la partie s'arrête là
+            stats.timeouts += 1
+            return
+
+def format_report(results: Dict[str, ClassStats]) -> str:
+    lines = []
+    for stats in results.values():
+        d = stats.to_dict()
+        lines.append(f"=== {d['class']} ({d['policy']}) ===" if d["policy"] else f"=== {d['class']} ===")
+        lines.append(f"Parties: {d['runs']} (terminées: {d['cleared_runs']}) | Combats: {d['fights']} | Victoires: {d['win_rate']:.1%}")
+        lines.append(f"Tours/combat: {d['turns_per_fight']:.2f} | Potions/combat: {d['potions_per_fight']:.3f} | Combats interrompus: {d['timeouts']}")
+        deaths = ", ".join(f"{stage}: {count}" for stage, count in d["death_stages"].items()) or "-"
+        lines.append(f"Morts par étage: {deaths}")
+        gold = ", ".join(f"{stage}: {value:.0f}" for stage, value in d["gold_curve"].items())
+        lines.append(f"Or moyen par étage: {gold}")
+        lines.append("")
+    return "\n".join(lines)
+
+def loot_report(draws: int, seed: Optional[int] = None) -> str:
+    """Taux de drop observés de chaque table de loot, sur draws tirages par table (tirage par lots)."""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for key, first, last in LOOT_TABLES.all_bands():
+        drops = Counter(item.name for item in LOOT_TABLES.draw_many(draws, first, key, rng))
+        label = {"": "Sbires", "*": "Boss (autres)"}.get(key, f"Boss {key}")
+        lines.append(f"=== {label}, étages {first}-{'' if last == float('inf') else last} ===")
+        lines.extend(f"{name:<26} {count / draws:.2%}" for name, count in drops.most_common())
+        lines.append("")
+    return "\n".join(lines)
+
+# -----------------------
+# Ferme de simulation (multi-processus)
+# -----------------------
+def make_policy(policy_name: str, potion_below: Optional[float] = None) -> ScriptedPolicy:
+    policy = POLICIES[policy_name]()
+    if potion_below is not None:
+        policy.potion_below = potion_below
+    return policy
+
+def simulate_shard(char_class: str, policy_name: str, potion_below: Optional[float],
+                   first_run: int, runs: int, max_stage: int, seed: int,
+                   telemetry_dir: Optional[str] = None) -> ClassStats:
+    """Joue les parties [first_run, first_run + runs) ; chaque partie a sa graine dérivée de (seed, classe, politique, n°)."""
+    stats = ClassStats(char_class, policy_name)
+    policy = make_policy(policy_name, potion_below)
+    telemetry = shared_writer(telemetry_dir) if telemetry_dir else None
+    for run in range(first_run, first_run + runs):
+        simulate_run(char_class, policy, max_stage, stats, f"{seed}:{char_class}:{policy_name}:{run}", telemetry)
+    if telemetry:
+        telemetry.flush() # fin de tâche : un worker peut être arrêté sans prévenir
+    return stats
+
+def run_farm(classes: List[str], policy_names: List[str], runs: int, max_stage: int, seed: Optional[int] = None,
+             workers: Optional[int] = None, potion_below: Optional[float] = None,
+             shard_runs: int = SHARD_RUNS, telemetry_dir: Optional[str] = None) -> Dict[Tuple[str, str], ClassStats]:
+    """Répartit les parties (classe x politique) en tâches de shard_runs parties sur un ProcessPoolExecutor.
+
+    Les agrégats sont fusionnés au fil de l'eau. Le découpage et les graines ne dépendent que de
+    (seed, classe, politique, n° de partie) : le résultat est identique quel que soit le nombre de processus.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    results = {(char_class, policy_name): ClassStats(char_class, policy_name)
+               for char_class in classes for policy_name in policy_names}
+    shards = [(char_class, policy_name, potion_below, first_run, min(shard_runs, runs - first_run), max_stage, seed, telemetry_dir)
+              for char_class in classes for policy_name in policy_names
+              for first_run in range(0, runs, shard_runs)]
+
+    if workers == 1:
+        for shard in shards:
+            stats = simulate_shard(*shard)
+            results[(stats.char_class, stats.policy)].merge(stats)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(simulate_shard, *shard) for shard in shards]):
+            stats = future.result()
+            results[(stats.char_class, stats.policy)].merge(stats)
+    return results
+
+def main(argv=None):
+    ensure_content() # classes proposées par défaut, tables de loot
+    parser = argparse.ArgumentParser(description="Simulateur Monte Carlo d'équilibrage (sans affichage).")
+    parser.add_argument("--runs", type=int, default=1000, help="Parties par classe et par politique")
+    parser.add_argument("--max-stage", type=int, default=20, help="Étage à atteindre pour terminer une partie")
+    parser.add_argument("--classes", nargs="+", default=[name for name, _, _ in CLASSES])
+    parser.add_argument("--policy", nargs="+", choices=sorted(POLICIES), default=["cautious"])
+    parser.add_argument("--potion-below", type=float, default=None, help="Seuil de PV (ratio) pour boire une potion")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processus de simulation (1 = sans sous-processus)")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON au lieu du rapport texte")
+    parser.add_argument("--loot-report", type=int, default=0, metavar="K",
+                        help="Affiche les taux de drop de chaque table de loot sur K tirages, sans simuler de parties")
+    parser.add_argument("--telemetry", default=None, metavar="DIR",
+                        help="Exporte chaque tour et chaque combat en JSONL dans DIR (voir telemetry.py)")
+    args = parser.parse_args(argv)
+
+    if args.loot_report:
+        print(loot_report(args.loot_report, args.seed))
+        return
+
+    start = time.perf_counter()
+    results = run_farm(args.classes, args.policy, args.runs, args.max_stage, args.seed,
+                       workers=args.workers, potion_below=args.potion_below, telemetry_dir=args.telemetry)
+    close_shared_writers()
+    elapsed = time.perf_counter() - start
+    fights = sum(stats.fights for stats in results.values())
+
+    if args.json:
+        print(json.dumps({"elapsed_s": elapsed, "fights": fights, "workers": args.workers,
+                          "classes": [stats.to_dict() for stats in results.values()]}, indent=2))
+    else:
+        print(format_report(results))
+        print(f"{fights} combats en {elapsed:.2f} s ({fights / max(elapsed, 1e-9) * 60:,.0f} combats/min, {args.workers} processus)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
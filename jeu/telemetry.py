@@ -0,0 +1,227 @@
+"""
+Télémétrie de combat : chaque tour et chaque fin de combat deviennent une ligne JSON (JSONL).
+
+Les lignes sont des tableaux compacts qui commencent par leur type ("t" = tour, "f" = combat) ;
+la première ligne de chaque fichier est un en-tête qui donne le nom des colonnes suivantes. Le moteur ne fait
+qu'empiler des tuples (CombatTelemetry.on_turn) : la sérialisation et l'écriture par lots se font
+sur le thread de TelemetryWriter, vidé toutes les FLUSH_INTERVAL secondes, avec rotation des
+fichiers au-delà de ROTATE_BYTES.
+
+Le détail d'un tour est relu dans le journal de combat (combat_log) : le moteur doit donc garder
+au moins TELEMETRY_LOG_CAPACITY événements.
+
+Exemple :
+    writer = TelemetryWriter("telemetry")
+    writer.start()
+    engine.telemetry = CombatTelemetry(writer)
+    ...
+    writer.close()
+"""
+import json, os, threading, time
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
+
+from combat_log import ATTACK, BLOCK, CHARGED_HIT, CRIT, DEFEND_HIT, ENEMY_HIT, HEAVY_HIT, POTION, RIPOSTE
+
+# Dossier des fichiers de télémétrie (RPG_TELEMETRY pour l'interface, --telemetry pour le simulateur)
+TELEMETRY_DIR = "telemetry"
+
+SCHEMA_NAME = "rpg-combat-telemetry"
+SCHEMA_VERSION = 1
+
+# Colonnes des lignes de tour ("t") et de fin de combat ("f")
+TURN_FIELDS = ("run", "fight", "turn", "stage", "class", "level", "boss_type", "enemy", "action",
+               "damage", "crit", "enemy_move", "damage_taken", "blocked", "riposte", "healed",
+               "potion_used", "player_hp_before", "player_hp_after", "player_max_hp", "enemy_hp_before", "enemy_hp_after")
+FIGHT_FIELDS = ("run", "fight", "stage", "class", "level", "boss_type", "enemy", "outcome", "turns",
+                "damage_dealt", "damage_taken", "riposte", "potions", "player_hp", "player_max_hp", "cause")
+
+# Issue d'un combat selon l'état du moteur à la fin du tour
+OUTCOMES = {"victory_screen": "victory", "gameover": "death", "flee_success": "flee"}
+
+# Evénements du journal (combat_log) qui portent les dégâts reçus par le joueur
+HIT_KINDS = frozenset((DEFEND_HIT, CHARGED_HIT, HEAVY_HIT, ENEMY_HIT))
+
+# Evénements gardés par le journal du moteur pour relire un tour complet
+TELEMETRY_LOG_CAPACITY = 16
+
+# Ecriture : intervalle de vidage (s), lignes sérialisées par écriture, taille d'un fichier
+FLUSH_INTERVAL = 1.0
+WRITE_BATCH_ROWS = 4096
+ROTATE_BYTES = 64 * 1024 * 1024
+
+# Lignes en attente au-delà desquelles les nouvelles sont abandonnées (disque trop lent)
+MAX_PENDING_ROWS = 1_000_000
+
+def schema_header(session: str) -> Dict[str, Any]:
+    return {"schema": SCHEMA_NAME, "version": SCHEMA_VERSION, "session": session,
+            "rows": {"t": list(TURN_FIELDS), "f": list(FIGHT_FIELDS)}}
+
+# -----------------------
+# Ecriture (thread dédié)
+# -----------------------
+class TelemetryWriter(threading.Thread):
+    """Ecrit les lignes en attente par lots, sur son propre thread, dans directory/prefix-session-NNNN.jsonl.
+
+    write() ne fait qu'un append sur une deque : il ne bloque jamais l'appelant. flush() écrit
+    tout ce qui est en attente depuis n'importe quel thread (fin de lot de simulation, fermeture).
+    """
+    def __init__(self, directory: str = TELEMETRY_DIR, prefix: str = "combat", max_bytes: int = ROTATE_BYTES,
+                 flush_interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING_ROWS):
+        super().__init__(name="telemetry", daemon=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.session = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+        self.pending: "deque[Tuple]" = deque()
+        self.lock = threading.Lock() # fichier courant (thread d'écriture ou flush explicite)
+        self.stopping = threading.Event()
+        self.file = None
+        self.file_bytes = 0
+        self.files: List[str] = []
+        self.rows_written = 0
+        self.dropped = 0
+
+    def write(self, row: Tuple):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append(row)
+
+    # -----------------------
+    # Thread d'écriture
+    # -----------------------
+    def run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self, timeout: Optional[float] = None):
+        """Arrête le thread après un dernier vidage et ferme le fichier courant."""
+        self.stopping.set()
+        if self.is_alive():
+            self.join(timeout)
+        else:
+            self.flush()
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            while pending:
+                batch = []
+                try:
+                    for _ in range(WRITE_BATCH_ROWS):
+                        batch.append(pending.popleft())
+                except IndexError:
+                    pass
+                self.write_batch(batch)
+            if self.file:
+                self.file.flush()
+
+    def write_batch(self, batch: List[Tuple]):
+        dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+        chunk = "".join([dumps(row) + "\n" for row in batch]).encode("utf-8")
+        if self.file is None or self.file_bytes + len(chunk) > self.max_bytes:
+            self.rotate()
+        self.file.write(chunk)
+        self.file_bytes += len(chunk)
+        self.rows_written += len(batch)
+
+    def rotate(self):
+        """Ferme le fichier courant et en ouvre un nouveau, qui commence par l'en-tête de schéma."""
+        if self.file:
+            self.file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.prefix}-{self.session}-{len(self.files) + 1:04d}.jsonl")
+        self.file = open(path, "wb")
+        header = (json.dumps(schema_header(self.session), separators=(",", ":")) + "\n").encode("utf-8")
+        self.file.write(header)
+        self.file_bytes = len(header)
+        self.files.append(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": len(self.files), "rows": self.rows_written, "pending": len(self.pending), "dropped": self.dropped}
+
+# Un écrivain par processus (ferme de simulation : un par worker)
+_SHARED_WRITERS: Dict[str, TelemetryWriter] = {}
+
+def shared_writer(directory: str = TELEMETRY_DIR) -> TelemetryWriter:
+    writer = _SHARED_WRITERS.get(directory)
+    if writer is None:
+        writer = _SHARED_WRITERS[directory] = TelemetryWriter(directory)
+        writer.start()
+    return writer
+
+def close_shared_writers():
+    while _SHARED_WRITERS:
+        _SHARED_WRITERS.popitem()[1].close()
+
+# -----------------------
+# Lignes de tour et de combat
+# -----------------------
+class CombatTelemetry:
+    """Transforme les tours joués par un GameEngine en lignes de télémétrie (voir GameEngine.take_turn)."""
+    __slots__ = ("writer", "fights", "enemy", "stage", "level", "turns", "damage_dealt", "damage_taken",
+                 "riposte", "potions", "last_move")
+
+    def __init__(self, writer: TelemetryWriter):
+        self.writer = writer
+        self.fights = 0
+        self.enemy = None
+
+    def start_fight(self, engine, enemy):
+        self.fights += 1
+        self.enemy = enemy
+        self.stage = engine.stage
+        self.level = engine.player.level
+        self.turns = self.damage_dealt = self.damage_taken = self.riposte = self.potions = 0
+        self.last_move = ""
+
+    def on_turn(self, engine, action: str, enemy, mark: int, player_hp: int, enemy_hp: int, potions: int):
+        """Un tour vient d'être joué : enemy est l'ennemi du tour, mark le compteur du journal avant le tour,
+        potions le nombre de potions avant le tour."""
+        if enemy is not self.enemy:
+            self.start_fight(engine, enemy)
+        damage = crit = taken = blocked = riposte = healed = 0
+        for record in engine.combat_log.since(mark):
+            kind = record[0]
+            if kind == ATTACK or kind == CRIT:
+                damage, crit = record[2], int(kind == CRIT)
+            elif kind in HIT_KINDS:
+                taken = record[2]
+            elif kind == BLOCK:
+                blocked = 1
+            elif kind == RIPOSTE:
+                riposte = record[1]
+            elif kind == POTION:
+                healed = record[2]
+
+        player = engine.player
+        run = engine.seed
+        self.turns += 1
+        self.damage_dealt += damage
+        self.damage_taken += taken
+        self.riposte += riposte
+        # Potion consommée même si elle ne soigne rien (PV pleins) : healed reste une colonne à part
+        potion_used = max(0, potions - player.inventory.get("potion", 0))
+        self.potions += potion_used
+        move = engine.last_enemy_move
+        if move:
+            self.last_move = move
+        self.writer.write(("t", run, self.fights, self.turns, self.stage, player.char_class, self.level,
+                           enemy.boss_type, enemy.name, action, damage, crit, move, taken, blocked, riposte, healed,
+                           potion_used, player_hp, player.hp, player.max_hp, enemy_hp, enemy.hp))
+
+        outcome = OUTCOMES.get(engine.state)
+        if outcome:
+            self.writer.write(("f", run, self.fights, self.stage, player.char_class, self.level, enemy.boss_type,
+                               enemy.name, outcome, self.turns, self.damage_dealt, self.damage_taken, self.riposte,
+                               self.potions, player.hp, player.max_hp, self.last_move if outcome == "death" else ""))
+            self.enemy = None
@@ -0,0 +1,296 @@
+"""
+Analyse en flux des fichiers de télémétrie (telemetry.py) : agrégats par classe et par étage en CSV.
+
+Les fichiers sont lus ligne à ligne par des générateurs ; la mémoire ne dépend que du nombre de
+groupes (classe x étage), pas de la taille des fichiers. Moyennes et écarts-types sont incrémentaux
+(Welford), et les fenêtres glissantes de --window combats par classe sont écrites au fil de l'eau.
+
+Tables écrites dans --out :
+    by_class_stage.csv : dégâts par tour, critiques, blocages, ripostes, tours pour tuer, potions par (classe, étage)
+    by_class.csv       : les mêmes agrégats, tous étages confondus
+    deaths.csv         : causes de mort (dernier coup de l'ennemi) par type de boss et par classe
+    windows.csv        : taux de victoire, tours et dégâts par tour par fenêtre de --window combats d'une classe
+
+Exemple :
+    python telemetry_report.py telemetry --out reports --window 1000
+"""
+import argparse, csv, glob, json, math, os, sys, time
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Iterable
+
+from telemetry import SCHEMA_NAME, SCHEMA_VERSION, TELEMETRY_DIR
+
+# Combats par fenêtre (windows.csv)
+WINDOW_FIGHTS = 1000
+
+# Décimales des valeurs écrites dans les CSV
+CSV_DIGITS = 4
+
+# Coups de l'ennemi qui peuvent être bloqués en défense (GameEngine.enemy_turn)
+BLOCKABLE_MOVES = frozenset(("normal", "heavy"))
+
+# -----------------------
+# Lecture en flux
+# -----------------------
+def telemetry_files(paths: Iterable[str]) -> List[str]:
+    """Fichiers .jsonl désignés par paths (fichiers ou dossiers), dans l'ordre d'écriture."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))))
+        else:
+            files.append(path)
+    return files
+
+def read_rows(files: Iterable[str], errors: Optional[Counter] = None) -> Iterator[Tuple[Dict[str, int], list]]:
+    """(colonnes, ligne) de chaque ligne de données ; colonnes : nom -> index, d'après l'en-tête du fichier.
+
+    Une ligne illisible (fichier tronqué par un arrêt brutal) est comptée dans errors et ignorée.
+    """
+    loads = json.loads
+    for path in files:
+        with open(path, "rb") as f:
+            header = loads(f.readline() or b"{}")
+            if header.get("schema") != SCHEMA_NAME or header.get("version") != SCHEMA_VERSION:
+                raise ValueError(f"{path}: en-tête de télémétrie inconnu ({header.get('schema')} v{header.get('version')})")
+            # Chaque ligne commence par son type : les colonnes de l'en-tête démarrent à l'index 1
+            columns = {kind: {name: i for i, name in enumerate(names, 1)} for kind, names in header["rows"].items()}
+            for line in f:
+                try:
+                    row = loads(line)
+                    yield columns[row[0]], row
+                except (ValueError, KeyError, IndexError):
+                    if errors is not None:
+                        errors[path] += 1
+
+# -----------------------
+# Statistiques incrémentales
+# -----------------------
+class RunningStats:
+    """Moyenne et variance en une passe (Welford) ; merge combine deux séries (Chan)."""
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other: "RunningStats"):
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+def ratio(a: float, b: float) -> float:
+    return a / b if b else 0.0
+
+class GroupStats:
+    """Agrégats d'un groupe de combats (une classe à un étage, ou une classe entière)."""
+    COUNTERS = ("fights", "victories", "deaths", "flees", "turns", "attacks", "damage", "crits",
+                "defended_hits", "blocks", "ripostes", "riposte_damage", "damage_taken", "potions")
+    __slots__ = COUNTERS + ("kill_turns", "fight_damage", "potion_hp", "potion_turn")
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.kill_turns = RunningStats()   # tours des combats gagnés
+        self.fight_damage = RunningStats() # dégâts infligés par tour, par combat
+        self.potion_hp = RunningStats()    # ratio de PV au moment de boire
+        self.potion_turn = RunningStats()  # n° du tour où la potion est bue
+
+    def merge(self, other: "GroupStats"):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in ("kill_turns", "fight_damage", "potion_hp", "potion_turn"):
+            getattr(self, name).merge(getattr(other, name))
+
+    def row(self) -> List[Any]:
+        return [self.fights, self.victories, self.deaths, self.flees, ratio(self.victories, self.fights),
+                ratio(self.damage + self.riposte_damage, self.turns), self.fight_damage.std,
+                ratio(self.crits, self.attacks), ratio(self.blocks, self.defended_hits),
+                self.ripostes, ratio(self.riposte_damage, self.ripostes),
+                ratio(self.damage_taken, self.turns), self.kill_turns.mean, self.kill_turns.std,
+                self.potions, self.potion_hp.mean, self.potion_turn.mean]
+
+GROUP_COLUMNS = ["fights", "victories", "deaths", "flees", "win_rate", "damage_per_turn", "damage_per_turn_std",
+                 "crit_rate", "block_rate", "ripostes", "riposte_avg", "damage_taken_per_turn", "turns_to_kill",
+                 "turns_to_kill_std", "potions", "potion_hp_ratio", "potion_turn"]
+
+class Window:
+    """Fenêtre de combats consécutifs d'une classe (windows.csv)."""
+    __slots__ = ("index", "fights", "victories", "turns", "damage")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.fights = self.victories = self.turns = self.damage = 0
+
+WINDOW_COLUMNS = ["class", "window", "fights", "win_rate", "turns_per_fight", "damage_per_turn"]
+
+# -----------------------
+# Agrégation
+# -----------------------
+class TelemetryReport:
+    """Consomme les lignes de read_rows en une passe ; window_writer reçoit les fenêtres terminées."""
+    def __init__(self, window: int = WINDOW_FIGHTS, window_writer=None):
+        self.window = window
+        self.window_writer = window_writer
+        self.groups: Dict[Tuple[str, int], GroupStats] = {}
+        self.deaths: Counter = Counter() # (type de boss, cause, classe) -> morts
+        self.windows: Dict[str, Window] = {}
+        self.turn_rows = 0
+        self.fight_rows = 0
+
+    def group(self, char_class: str, stage: int) -> GroupStats:
+        group = self.groups.get((char_class, stage))
+        if group is None:
+            group = self.groups[(char_class, stage)] = GroupStats()
+        return group
+
+    def consume(self, rows: Iterable[Tuple[Dict[str, int], list]]):
+        for columns, row in rows:
+            if row[0] == "t":
+                self.add_turn(columns, row)
+            else:
+                self.add_fight(columns, row)
+
+    def add_turn(self, c: Dict[str, int], row: list):
+        self.turn_rows += 1
+        g = self.group(row[c["class"]], row[c["stage"]])
+        action = row[c["action"]]
+        if action == "potion":
+            if row[c["potion_used"]]:
+                g.potions += 1
+                g.potion_hp.add(row[c["player_hp_before"]] / row[c["player_max_hp"]])
+                g.potion_turn.add(row[c["turn"]])
+            return
+        g.turns += 1
+        g.damage_taken += row[c["damage_taken"]]
+        if action == "attack":
+            g.attacks += 1
+            g.damage += row[c["damage"]]
+            g.crits += row[c["crit"]]
+        elif action == "defend" and row[c["enemy_move"]] in BLOCKABLE_MOVES:
+            g.defended_hits += 1
+            g.blocks += row[c["blocked"]]
+        riposte = row[c["riposte"]]
+        if riposte:
+            g.ripostes += 1
+            g.riposte_damage += riposte
+
+    def add_fight(self, c: Dict[str, int], row: list):
+        self.fight_rows += 1
+        char_class = row[c["class"]]
+        g = self.group(char_class, row[c["stage"]])
+        outcome, turns = row[c["outcome"]], row[c["turns"]]
+        damage = row[c["damage_dealt"]] + row[c["riposte"]]
+        g.fights += 1
+        if turns:
+            g.fight_damage.add(damage / turns)
+        if outcome == "victory":
+            g.victories += 1
+            g.kill_turns.add(turns)
+        elif outcome == "death":
+            g.deaths += 1
+            self.deaths[(row[c["boss_type"]] or "sbire", row[c["cause"]] or "inconnue", char_class)] += 1
+        else:
+            g.flees += 1
+
+        window = self.windows.get(char_class)
+        if window is None:
+            window = self.windows[char_class] = Window(0)
+        window.fights += 1
+        window.victories += outcome == "victory"
+        window.turns += turns
+        window.damage += damage
+        if window.fights >= self.window:
+            self.close_window(char_class, window)
+            self.windows[char_class] = Window(window.index + 1)
+
+    def close_window(self, char_class: str, window: Window):
+        if self.window_writer and window.fights:
+            self.window_writer.writerow(rounded([char_class, window.index, window.fights, ratio(window.victories, window.fights),
+                                                 ratio(window.turns, window.fights), ratio(window.damage, window.turns)]))
+
+    def finish(self):
+        """Ecrit les fenêtres en cours (incomplètes)."""
+        for char_class, window in self.windows.items():
+            self.close_window(char_class, window)
+        self.windows.clear()
+
+    def by_class(self) -> Dict[str, GroupStats]:
+        totals: Dict[str, GroupStats] = {}
+        for (char_class, _), group in self.groups.items():
+            totals.setdefault(char_class, GroupStats()).merge(group)
+        return totals
+
+# -----------------------
+# Sorties CSV
+# -----------------------
+def rounded(values: List[Any]) -> List[Any]:
+    return [round(v, CSV_DIGITS) if isinstance(v, float) else v for v in values]
+
+def write_tables(report: TelemetryReport, out_dir: str) -> List[str]:
+    """Ecrit by_class_stage.csv, by_class.csv et deaths.csv ; retourne leurs chemins."""
+    paths = []
+    def table(name: str, header: List[str], rows: Iterable[List[Any]]):
+        path = os.path.join(out_dir, name)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rounded(row) for row in rows)
+        paths.append(path)
+
+    table("by_class_stage.csv", ["class", "stage"] + GROUP_COLUMNS,
+          ([char_class, stage] + group.row() for (char_class, stage), group in sorted(report.groups.items())))
+    table("by_class.csv", ["class"] + GROUP_COLUMNS,
+          ([char_class] + group.row() for char_class, group in sorted(report.by_class().items())))
+    table("deaths.csv", ["boss_type", "cause", "class", "deaths"],
+          ([boss_type, cause, char_class, count] for (boss_type, cause, char_class), count in sorted(report.deaths.items())))
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrège en flux des fichiers de télémétrie de combat (JSONL) en tables CSV.")
+    parser.add_argument("paths", nargs="*", default=[TELEMETRY_DIR], help="Fichiers .jsonl ou dossiers")
+    parser.add_argument("--out", default="reports", help="Dossier des tables CSV")
+    parser.add_argument("--window", type=int, default=WINDOW_FIGHTS, help="Combats par fenêtre (windows.csv)")
+    args = parser.parse_args(argv)
+
+    files = telemetry_files(args.paths)
+    if not files:
+        print(f"Aucun fichier de télémétrie dans {', '.join(args.paths)}")
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    errors: Counter = Counter()
+    windows_path = os.path.join(args.out, "windows.csv")
+    with open(windows_path, "w", newline="") as f:
+        window_writer = csv.writer(f)
+        window_writer.writerow(WINDOW_COLUMNS)
+        report = TelemetryReport(max(1, args.window), window_writer)
+        report.consume(read_rows(files, errors))
+        report.finish()
+    paths = write_tables(report, args.out) + [windows_path]
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(files)} fichier(s), {report.turn_rows} tours et {report.fight_rows} combats lus en {elapsed:.2f} s")
+    if errors:
+        print(f"Lignes illisibles ignorées : {sum(errors.values())}")
+    print("\n".join(paths))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))